@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Throughput, memory, import time and call counts of the client, offline
+
+Every measure runs against the mock API of benchmarks/mock_paas.py, in
+process by default or over HTTP on localhost with --http, so regressions of
+the hot paths can be caught without credentials nor a live service.
+
+Usage: python3 benchmarks/bench_api.py [--certs 100000] [--latency 0.005] [--error-rate 0.01] [--http]
+"""
+
+import argparse
+import gc
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import tracemalloc  # noqa: E402
+
+import ppaas  # noqa: E402
+from ppaas.fleet import Fleet  # noqa: E402
+from mock_paas import MockPaaS, MockServer, MockTransport, make_client  # noqa: E402
+
+
+class Setup(object):
+    """A mock API and a client talking to it"""
+    def __init__(self, args, certs=None, **kwargs):
+        options = dict(masters=args.masters, certs=args.certs if certs is None else certs,
+                       latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+        options.update(kwargs)
+        self.paas = MockPaaS(**options)
+        self.server = None
+        if args.http:
+            self.server = MockServer(self.paas).start()
+            self.client = make_client(ppaas.Transport(pool_size=args.workers), self.server.endpoint)
+        else:
+            self.client = make_client(MockTransport(self.paas))
+        self.calls = 0
+        self.client.add_hook(after=self.count)
+
+    def count(self, info):
+        self.calls += 1
+
+    def master(self, index=0):
+        return ppaas.Master.get_masters(self.client)[index]
+
+    def close(self):
+        if self.server is not None:
+            self.server.stop()
+
+
+def import_time(repeat=5):
+    """Returns the best cold start time of `import ppaas`, in milliseconds"""
+    code = "import time; t = time.time(); import ppaas; print(time.time() - t)"
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+        timings.append(float(output))
+    return min(timings) * 1000
+
+
+def call_counts(args):
+    """Returns the number of HTTP requests of the high level operations"""
+    setup = Setup(args, certs=20, latency=0, jitter=0, error_rate=0)
+    master = setup.master()
+    hostnames = sorted(setup.paas.certs[master.uuid])
+    # Built beforehand so that only the operation itself is counted
+    certificates = dict((cert.hostname, cert) for cert in master.get_certificates())
+    operations = [
+        ('Master.get_masters()', lambda: ppaas.Master.get_masters(setup.client)),
+        ('Master.get_master(name)', lambda: ppaas.Master.get_master(master.name, setup.client)),
+        ('Master(uuid)', lambda: ppaas.Master(master.uuid, client=setup.client)),
+        ('master.get_certificates()', lambda: master.get_certificates()),
+        ('list(master.iter_certificates())', lambda: list(master.iter_certificates())),
+        ('master.certificate(hostname)', lambda: master.certificate(hostnames[0])),
+        ('certificate.sign()', lambda: certificates[hostnames[1]].sign()),
+        ('certificate.sign(reload=False)', lambda: certificates[hostnames[2]].sign(reload=False)),
+        ('certificate.revoke()', lambda: certificates[hostnames[1]].revoke()),
+        ('certificate.delete()', lambda: certificates[hostnames[3]].delete()),
+        ('master.sign_certificates(5 hosts)', lambda: master.sign_certificates(hostnames[4:9])),
+        ('master.crl', lambda: master.crl),
+        ('master.crl (again)', lambda: master.crl),
+        ('master.environments', lambda: master.environments),
+        ('master.last_update', lambda: master.last_update),
+        ('master.refresh()', lambda: master.refresh()),
+        ('DeployKey.get_deploy_keys()', lambda: ppaas.DeployKey.get_deploy_keys(setup.client)),
+        # Last, the lookups still in flight on the other masters finish in the background
+        ('Fleet().find_certificate(hostname)', lambda: Fleet(client=setup.client).find_certificate(hostnames[10])),
+    ]
+    counts = []
+    for name, operation in operations:
+        setup.calls = 0
+        operation()
+        counts.append((name, setup.calls))
+    setup.close()
+    return counts
+
+
+def listing_throughput(args):
+    """Returns the certificates listed per second by the listing methods"""
+    results = []
+    listings = [
+        ('master.get_certificates()', lambda master: len(master.get_certificates())),
+        ('master.iter_certificates()', lambda master: sum(1 for _ in master.iter_certificates())),
+        ('master.get_inventory()', lambda master: len(master.get_inventory(reload=True))),
+    ]
+    setup = Setup(args)
+    master = setup.master()
+    for name, listing in listings:
+        setup.client.cache.invalidate()
+        started = time.time()
+        count = listing(master)
+        results.append((name, count / (time.time() - started)))
+    setup.close()
+    return results
+
+
+def mutation_throughput(args):
+    """Returns the certificates signed then revoked per second, and the failures"""
+    setup = Setup(args)
+    master = setup.master()
+    results = []
+    for name, operation in [('sign_certificates()', master.sign_certificates),
+                            ('revoke_certificates()', master.revoke_certificates)]:
+        started = time.time()
+        report = operation(max_workers=args.workers)
+        results.append((name, len(report.succeeded) / (time.time() - started), len(report.failed)))
+    setup.close()
+    return results
+
+
+def memory_per_certificate(args):
+    """Returns the bytes retained per ppaas.Certificate built from a listing"""
+    setup = Setup(args, latency=0, jitter=0, error_rate=0)
+    master = setup.master()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    certificates = master.get_certificates()
+    setup.client.cache.invalidate()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    setup.close()
+    return float(after - before) / len(certificates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--masters', type=int, default=2)
+    parser.add_argument('--certs', type=int, default=10000, help="Certificates per master")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latency of every request, in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random extra latency, in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of the requests failing with a 5xx")
+    parser.add_argument('--workers', type=int, default=8, help="Workers of the bulk operations")
+    parser.add_argument('--http', action='store_true', help="Serve the mock over HTTP on localhost")
+    args = parser.parse_args(argv)
+
+    print("Mock: %d masters x %d certificates, latency %.3fs (+%.3fs), error rate %.1f%%, %s" % (
+        args.masters, args.certs, args.latency, args.jitter, args.error_rate * 100,
+        'HTTP' if args.http else 'in process'))
+
+    print("\nCold start: import ppaas in %.1f ms" % import_time())
+
+    print("\n%-40s %s" % ('HTTP requests per operation', 'calls'))
+    for name, count in call_counts(args):
+        print("%-40s %5d" % (name, count))
+
+    print("\n%-40s %s" % ('Listing', 'certs/s'))
+    for name, rate in listing_throughput(args):
+        print("%-40s %12.0f" % (name, rate))
+
+    print("\n%-40s %s" % ('Bulk mutations', 'certs/s   failed'))
+    for name, rate, failed in mutation_throughput(args):
+        print("%-40s %12.0f %8d" % (name, rate, failed))
+
+    print("\nMemory: %.0f bytes per ppaas.Certificate" % memory_per_certificate(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Memory and attribute access cost of the certificate objects
+
+Compares the former representation of a certificate (the raw JSON dict kept
+in `cached_data`, read through __getattr__) with the __slots__ records.
+
+Usage: python3 benchmarks/bench_records.py [number of certificates]
+"""
+
+import gc
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import tracemalloc  # noqa: E402
+
+from ppaas.records import CertificateRecord  # noqa: E402
+
+
+class LegacyCertificate(object):
+    """The dict + __getattr__ pattern the records replaced"""
+    def __init__(self, master, hostname, cached_data):
+        self.client = None
+        self.master = master
+        self.hostname = hostname
+        self.cached_data = cached_data
+
+    def __getattr__(self, name):
+        if name in self.cached_data:
+            return self.cached_data[name]
+        raise AttributeError(name)
+
+
+def certificate_data(i):
+    return {
+        u"created_at": u"2015-12-07T13:28:28",
+        u"fingerprint": u"A7:DA:BE:17:09:9E:18:7D:E6:24:25:7C:65:48:EF:%02X" % (i % 256),
+        u"hostname": u"web%d.domain.tld" % i,
+        u"revoked_at": None,
+        u"serial_number": i,
+        u"signed_at": u"2015-12-07T13:30:00",
+        u"status": {u"code": 1, u"message": u"SIGNED"},
+    }
+
+
+def measure_memory(build, count):
+    """Returns the number of bytes retained per object built
+
+    The decoded JSON payloads are allocated while tracing: the legacy objects
+    keep them alive, the records only keep the parsed fields.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(certificate_data(i)) for i in range(count)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(objects) == count
+    return float(after - before) / count
+
+
+def measure_access(obj, attribute, number=1000000):
+    """Returns the cost of an attribute read, in nanoseconds"""
+    timer = timeit.Timer('obj.%s' % attribute, globals={'obj': obj})
+    return min(timer.repeat(3, number)) / number * 1e9
+
+
+def main(count=50000):
+    builders = [
+        ('legacy dict', lambda data: LegacyCertificate(None, data[u'hostname'], data)),
+        ('slots record', CertificateRecord.from_dict),
+    ]
+    print("%d certificates" % count)
+    print("%-14s %14s %14s %14s" % ('', 'bytes/object', 'fingerprint ns', 'hostname ns'))
+    for name, build in builders:
+        memory = measure_memory(build, count)
+        obj = build(certificate_data(0))
+        print("%-14s %14.0f %14.1f %14.1f" % (
+            name,
+            memory,
+            measure_access(obj, 'fingerprint'),
+            measure_access(obj, 'hostname'),
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Offline mock of the Puppet as a Service API
+
+MockPaaS keeps the state of an account (masters, certificates, deploy keys)
+and answers the requests of the /masters, /certs, /deploy-keys, /crl,
+/environments and /last-update endpoints, with a configurable latency,
+error rate and dataset size. It is exposed either:
+  * in process, with MockTransport, a drop-in ppaas.Transport which never
+    touches the network, to measure the client itself
+  * over HTTP, with MockServer, to measure the whole stack (requests,
+    connection pool, JSON decoding)
+
+Usage:
+>>> paas = MockPaaS(masters=2, certs=100000, latency=0.005, error_rate=0.01)
+>>> client = make_client(MockTransport(paas))
+>>> ppaas.Master.get_masters(client)
+"""
+
+import base64
+import datetime
+import gzip
+import io
+import json
+import random
+import re
+import threading
+import time
+
+try:
+    from urllib.parse import parse_qsl, urlsplit
+except ImportError:
+    from urlparse import parse_qsl, urlsplit
+
+try:
+    import ConfigParser
+except ImportError:
+    import configparser as ConfigParser
+
+from requests.models import PreparedRequest, Response
+from requests.structures import CaseInsensitiveDict
+
+
+ENDPOINT = 'http://mock.ppaas.test'
+
+# Statuses returned when a request is picked to fail, all of them are
+# retried by the default scheduler for idempotent methods.
+ERROR_STATUSES = (500, 502, 503)
+
+
+def certificate_data(master, i, status=0):
+    messages = {0: u"SIGNATURE PENDING", 1: u"SIGNED", 2: u"REVOKED"}
+    return {
+        u"hostname": u"agent%d.%s.mock" % (i, master),
+        u"fingerprint": u"A7:DA:BE:17:09:9E:18:7D:E6:24:25:7C:65:48:%02X:%02X" % ((i >> 8) % 256, i % 256),
+        u"created_at": u"2015-12-07T13:28:28",
+        u"signed_at": u"2015-12-07T13:30:00" if status else None,
+        u"revoked_at": u"2015-12-08T09:00:00" if status == 2 else None,
+        u"serial_number": i + 2 if status else None,
+        u"status": {u"code": status, u"message": messages[status]},
+    }
+
+
+def _big_endian(value, size):
+    return bytearray((value >> (8 * i)) & 0xff for i in reversed(range(size)))
+
+
+def _der(tag, content):
+    length = len(content)
+    if length < 0x80:
+        header = bytearray([tag, length])
+    else:
+        size = (length.bit_length() + 7) // 8
+        header = bytearray([tag, 0x80 | size]) + _big_endian(length, size)
+    return bytes(header) + content
+
+
+def _der_integer(value):
+    return _der(0x02, bytes(_big_endian(value, value.bit_length() // 8 + 1)))
+
+
+def _utc_time(date):
+    return (date[2:4] + date[5:7] + date[8:10] + date[11:13] + date[14:16] + date[17:19] + 'Z').encode('ascii')
+
+
+def crl_pem(revoked, number):
+    """Builds an unsigned, but well formed, PEM CRL revoking some serials
+
+    :param revoked: The revoked serial numbers, with their ISO 8601 revocation dates
+    :param number: The CRL number
+    """
+    now = _der(0x17, b'160101000000Z')
+    algorithm = _der(0x30, _der(0x06, b'\x2a\x86\x48\x86\xf7\x0d\x01\x01\x0b') + b'\x05\x00')
+    issuer = _der(0x30, _der(0x31, _der(0x30, _der(0x06, b'\x55\x04\x03') + _der(0x0c, b'Puppet CA'))))
+    entries = b''.join(_der(0x30, _der_integer(serial) + _der(0x17, _utc_time(date)))
+                       for serial, date in sorted(revoked))
+    extension = _der(0x30, _der(0x06, b'\x55\x1d\x14') + _der(0x04, _der_integer(number)))
+    tbs = _der(0x30, _der_integer(1) + algorithm + issuer + now + now +
+               (_der(0x30, entries) if entries else b'') + _der(0xa0, _der(0x30, extension)))
+    der = _der(0x30, tbs + algorithm + _der(0x03, b'\x00' + b'\x00' * 32))
+    body = base64.b64encode(der).decode('ascii')
+    lines = [body[i:i + 64] for i in range(0, len(body), 64)]
+    return u"-----BEGIN X509 CRL-----\n%s\n-----END X509 CRL-----\n" % u"\n".join(lines)
+
+
+def master_data(uuid, name, deploy_key=u"mock"):
+    return {
+        u"id": uuid,
+        u"name": name,
+        u"hostname": u"%s.user.puppet.mock" % name,
+        u"source": u"git@github.com:mock/%s.git" % name,
+        u"deploy_key": deploy_key,
+        u"type": u"standard",
+        u"nb": 1,
+        u"vars": {},
+        u"hierarchy": [],
+        u"hieras": [],
+        u"servers": {},
+        u"allowed_networks": [u"0.0.0.0/0"],
+        u"ca_certificate": u"-----BEGIN CERTIFICATE-----",
+        u"token": u"mock-token",
+        u"status": {u"code": 1, u"msg": u"Master running"},
+        u"created_at": u"2015-12-07T13:28:28",
+    }
+
+
+class MockPaaS(object):
+    """State and request handling of the mock API
+
+    :param masters: Number of masters of the account
+    :param certs: Number of certificates per master
+    :param pending_ratio: Share of the certificates waiting for their signature, the others are signed
+    :param latency: Time taken by every request, in seconds
+    :param jitter: Random extra time taken by every request, up to this many seconds
+    :param error_rate: Probability for a request to fail with a 5xx status
+    :param seed: Seed of the random generator, for reproducible runs
+    :param action_duration: Time a refresh or restart keeps a master deploying, in seconds
+    """
+    def __init__(self, masters=2, certs=1000, pending_ratio=0.5, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=0, action_duration=0.0):
+        self.latency = latency
+        self.action_duration = action_duration
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = []
+        self.masters = {}
+        self.certs = {}
+        self.versions = {}
+        self.last_updates = {}
+        self.busy_until = {}
+        self.deploy_keys = {u"mock": {u"name": u"mock", u"fingerprint": u"mock-fingerprint",
+                                      u"public": u"ssh-rsa AAAA mock", u"created_at": u"2015-12-07T13:28:28"}}
+        pending = int(certs * pending_ratio)
+        for m in range(masters):
+            self.add_master(u"master%d" % m, [0 if i < pending else 1 for i in range(certs)])
+        self.serial = certs + 2
+        self.routes = [
+            (re.compile(r'^/masters/?$'), self.masters_collection),
+            (re.compile(r'^/masters/([^/]+)/?$'), self.master),
+            (re.compile(r'^/masters/([^/]+)/certs/?$'), self.certs_collection),
+            (re.compile(r'^/masters/([^/]+)/certs/([^/]+)/(sign|revoke)$'), self.certificate_action),
+            (re.compile(r'^/masters/([^/]+)/certs/([^/]+)$'), self.certificate),
+            (re.compile(r'^/masters/([^/]+)/(refresh|restart)$'), self.master_action),
+            (re.compile(r'^/masters/([^/]+)/crl$'), self.crl),
+            (re.compile(r'^/masters/([^/]+)/environments$'), self.environments),
+            (re.compile(r'^/masters/([^/]+)/last-update$'), self.last_update),
+            (re.compile(r'^/deploy-keys/?$'), self.deploy_keys_collection),
+            (re.compile(r'^/deploy-keys/([^/]+)$'), self.deploy_key),
+        ]
+
+    def add_master(self, name, statuses=()):
+        uuid = u"00000000-0000-4000-8000-%012d" % len(self.masters)
+        self.masters[uuid] = master_data(uuid, name)
+        certs = [certificate_data(name, i, status) for i, status in enumerate(statuses)]
+        self.certs[uuid] = dict((cert[u"hostname"], cert) for cert in certs)
+        self.versions[uuid] = 0
+        self.last_updates[uuid] = u"2015-12-07T13:28:28"
+        return uuid
+
+    def handle(self, method, path, query=None, headers=None, body=None):
+        """Answers a request
+
+        :return: The status, headers and body of the response
+        :rtype: tuple
+        """
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            self.calls.append((method, path))
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.random.choice(ERROR_STATUSES), {}, {u"message": u"Mock failure"}
+            for regex, handler in self.routes:
+                match = regex.match(path)
+                if match:
+                    try:
+                        return handler(method, headers or {}, body, *match.groups())
+                    except KeyError:
+                        return 404, {}, {u"message": u"The requested resource could not be found."}
+            return 404, {}, {u"message": u"The requested resource could not be found."}
+
+    def _touch(self, uuid):
+        self.versions[uuid] += 1
+
+    def masters_collection(self, method, headers, body):
+        if method == 'POST':
+            body = body or {}
+            uuid = self.add_master(body[u"name"])
+            self.masters[uuid].update((key, value) for key, value in body.items() if value is not None)
+            return 200, {}, self.masters[uuid]
+        return 200, {}, {u"masters": list(self.masters.values())}
+
+    def _settle(self, uuid):
+        """Ends the refresh or restart of a master once its duration elapsed"""
+        busy_until = self.busy_until.get(uuid)
+        if busy_until is not None and time.time() >= busy_until:
+            del self.busy_until[uuid]
+            self.masters[uuid][u"status"] = {u"code": 1, u"msg": u"Master running"}
+            self.last_updates[uuid] = datetime.datetime.utcnow().strftime(u"%Y-%m-%dT%H:%M:%S.%f")
+
+    def master(self, method, headers, body, uuid):
+        if method == 'DELETE':
+            del self.masters[uuid]
+            return 200, {}, None
+        self._settle(uuid)
+        return 200, {}, self.masters[uuid]
+
+    def certs_collection(self, method, headers, body, uuid):
+        etag = '"certs-%s-%d"' % (uuid, self.versions[uuid])
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, None
+        return 200, {'ETag': etag}, {u"certs": list(self.certs[uuid].values())}
+
+    def certificate(self, method, headers, body, uuid, hostname):
+        certs = self.certs[uuid]
+        if method == 'DELETE':
+            del certs[hostname]
+            self._touch(uuid)
+            return 200, {}, None
+        return 200, {}, certs[hostname]
+
+    def certificate_action(self, method, headers, body, uuid, hostname, action):
+        cert = self.certs[uuid][hostname]
+        if action == 'sign':
+            self.serial += 1
+            cert[u"status"] = {u"code": 1, u"message": u"SIGNED"}
+            cert[u"signed_at"] = u"2016-01-01T00:00:00"
+            cert[u"serial_number"] = self.serial
+        else:
+            cert[u"status"] = {u"code": 2, u"message": u"REVOKED"}
+            cert[u"revoked_at"] = u"2016-01-01T00:00:00"
+        self._touch(uuid)
+        return 200, {}, None
+
+    def master_action(self, method, headers, body, uuid, action):
+        self.masters[uuid][u"status"] = {u"code": 0, u"msg": u"Deploying server"}
+        self.busy_until[uuid] = time.time() + self.action_duration
+        return 200, {}, None
+
+    def crl(self, method, headers, body, uuid):
+        etag = '"crl-%s-%d"' % (uuid, self.versions[uuid])
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, None
+        revoked = [(cert[u"serial_number"], cert[u"revoked_at"])
+                   for cert in self.certs[uuid].values() if cert[u"status"][u"code"] == 2]
+        return 200, {'ETag': etag}, {u"crl": crl_pem(revoked, self.versions[uuid] + 1)}
+
+    def environments(self, method, headers, body, uuid):
+        self.masters[uuid]
+        return 200, {}, {u"environments": {u"production": {u"manifest": u"environments/production/manifests"}}}
+
+    def last_update(self, method, headers, body, uuid):
+        self.masters[uuid]
+        self._settle(uuid)
+        return 200, {}, {u"result": self.last_updates[uuid]}
+
+    def deploy_keys_collection(self, method, headers, body):
+        if method == 'POST':
+            name = (body or {})[u"name"]
+            self.deploy_keys[name] = {u"name": name, u"fingerprint": u"%s-fingerprint" % name,
+                                      u"public": u"ssh-rsa AAAA %s" % name, u"created_at": u"2016-01-01T00:00:00"}
+            return 200, {}, self.deploy_keys[name]
+        return 200, {}, {u"deploy_keys": list(self.deploy_keys.values())}
+
+    def deploy_key(self, method, headers, body, name):
+        if method == 'DELETE':
+            del self.deploy_keys[name]
+            return 200, {}, None
+        return 200, {}, self.deploy_keys[name]
+
+    def reset_calls(self):
+        with self.lock:
+            calls, self.calls = self.calls, []
+        return calls
+
+
+def decode_body(data, headers):
+    """Decodes a JSON request body, gzipped or not"""
+    if not data:
+        return None
+    if isinstance(data, (dict, list)):
+        return data
+    if hasattr(data, 'read'):
+        data = data.read()
+    elif not isinstance(data, (bytes, str)):
+        data = b''.join(data)
+    if (headers or {}).get('Content-Encoding') == 'gzip':
+        data = gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data) if data.strip() else None
+
+
+class MockTransport(object):
+    """In process replacement of ppaas.Transport answering from a MockPaaS"""
+    def __init__(self, paas):
+        self.paas = paas
+
+    def request(self, method, url, params=None, json=None, data=None, headers=None, **kwargs):
+        started = time.time()
+        headers = CaseInsensitiveDict(headers or {})
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        query.update(params or {})
+        body = decode_body(json if json is not None else data, headers)
+        status, response_headers, result = self.paas.handle(method, parts.path, query, headers, body)
+
+        request = PreparedRequest()
+        request.method = method
+        request.url = url
+        request.headers = headers
+        request.body = data if isinstance(data, bytes) else None
+        response = Response()
+        response.status_code = status
+        response.url = url
+        response.request = request
+        response.headers = CaseInsensitiveDict(response_headers)
+        response._content = b'' if result is None else _dumps(result).encode('utf-8')
+        response._content_consumed = True
+        response.raw = io.BytesIO(response._content)
+        response.elapsed = datetime.timedelta(seconds=time.time() - started)
+        return response
+
+    def close(self):
+        pass
+
+
+_dumps = json.dumps
+
+
+def make_client(transport, endpoint=ENDPOINT, **kwargs):
+    """Builds an ApiClient talking to a mock, without any configuration file
+
+    :rtype: ppaas.ApiClient
+    """
+    from ppaas import ApiClient
+
+    conf = ConfigParser.ConfigParser()
+    conf.add_section('auth')
+    conf.set('auth', 'user', 'mock')
+    conf.set('auth', 'pass', 'mock')
+    conf.add_section('api')
+    conf.set('api', 'endpoint', endpoint)
+    return ApiClient(transport=transport, conf=conf, **kwargs)
+
+
+class MockServer(object):
+    """Serves a MockPaaS over HTTP on localhost, from a background thread
+
+    :Example:
+    >>> with MockServer(MockPaaS()) as server:
+    ...     client = make_client(ppaas.Transport(), server.endpoint)
+    """
+    def __init__(self, paas, port=0):
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_any(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                data = self.rfile.read(length) if length else None
+                headers = dict(self.headers.items())
+                status, response_headers, result = paas.handle(
+                    self.command, parts.path, dict(parse_qsl(parts.query)), headers,
+                    decode_body(data, headers))
+                content = b'' if result is None else _dumps(result).encode('utf-8')
+                self.send_response(status)
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_any
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.httpd = Server(('127.0.0.1', port), Handler)
+        self.endpoint = 'http://127.0.0.1:%d' % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-paas')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -19,7 +19,72 @@ __license__ = """
   0. You just DO WHAT THE FUCK YOU WANT TO.
 """
 
-from .master import Master
-from .certificate import Certificate
-from .deploy_key import DeployKey
-from .client import ApiClient
+import sys
+
+# Public names and the submodule defining them. On Python 3.7+ submodules
+# are only imported when one of their names is first used (PEP 562), so
+# `import ppaas` stays cheap for short lived scripts and the command line.
+_EXPORTS = {
+    'Master': 'master',
+    'Certificate': 'certificate',
+    'DeployKey': 'deploy_key',
+    'DeployKeyRegistry': 'registry',
+    'CertificateInventory': 'inventory',
+    'Fleet': 'fleet',
+    'SnapshotStore': 'snapshot',
+    'CertificateWatcher': 'watcher',
+    'AutoSigner': 'autosign',
+    'ApiClient': 'client',
+    'ResponseCache': 'cache',
+    'CrlIndex': 'crl',
+    'Job': 'jobs',
+    'JobTracker': 'jobs',
+    'Rollout': 'rollout',
+    'Reconciler': 'reconcile',
+    'MetricsRecorder': 'metrics',
+    'RetryPolicy': 'scheduler',
+    'Scheduler': 'scheduler',
+    'TokenBucket': 'scheduler',
+    'Transport': 'transport',
+}
+if sys.version_info >= (3, 7):
+    _EXPORTS['AsyncApiClient'] = 'aio'
+
+__all__ = sorted(_EXPORTS)
+
+if sys.version_info >= (3, 7):
+    import importlib
+
+    def __getattr__(name):
+        module = _EXPORTS.get(name, name)
+        try:
+            module = importlib.import_module('.' + module, __name__)
+        except ImportError:
+            if name in _EXPORTS:
+                raise
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+        value = module if module.__name__ == '%s.%s' % (__name__, name) else getattr(module, name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_EXPORTS))
+else:
+    from .master import Master
+    from .certificate import Certificate
+    from .deploy_key import DeployKey
+    from .registry import DeployKeyRegistry
+    from .inventory import CertificateInventory
+    from .fleet import Fleet
+    from .snapshot import SnapshotStore
+    from .watcher import CertificateWatcher
+    from .autosign import AutoSigner
+    from .client import ApiClient
+    from .cache import ResponseCache
+    from .crl import CrlIndex
+    from .jobs import Job, JobTracker
+    from .rollout import Rollout
+    from .reconcile import Reconciler
+    from .metrics import MetricsRecorder
+    from .scheduler import RetryPolicy, Scheduler, TokenBucket
+    from .transport import Transport
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import ApiClient
+from .transport import Transport
+from .master import Master
+from .deploy_key import DeployKey
+
+
+DEFAULT_CONCURRENCY = 32
+
+# Every request in flight holds a worker thread, more than this many mostly
+# adds threads and connections for the API to throttle
+MAX_CONCURRENCY = 64
+
+
+class AsyncApiClient(object):
+    """Asyncio interface to the API.
+
+    The I/O is not asynchronous: every call is offloaded to a pool of worker
+    threads running the regular, blocking, ApiClient. The event loop is
+    never blocked, but each request in flight holds a thread.
+
+    This class has the following behavior:
+      * Errors are mapped exactly like ApiClient.call does (Forbidden,
+        ResourceNotFoundError, BadParametersError...)
+      * At most `concurrency` requests are in flight at the same time, the
+        others wait for a slot without holding a thread. It is capped to
+        MAX_CONCURRENCY, and the connection pool of the client created when
+        none is given is sized accordingly.
+      * The high level operations return the regular ppaas.Master,
+        ppaas.Certificate and ppaas.DeployKey objects of the client (see
+        ppaas.identity.IdentityMap), so they can be used from synchronous
+        code afterwards.
+
+    .. note:: Only available on Python 3.7+
+
+    :Example:
+    >>> async def main():
+    ...     async with ppaas.AsyncApiClient(concurrency=64) as client:
+    ...         masters = await client.get_masters()
+    ...         return await asyncio.gather(*[client.get_certificates(m) for m in masters])
+    >>> asyncio.run(main())
+    """
+    def __init__(self, client=None, concurrency=DEFAULT_CONCURRENCY):
+        """Creates a new asynchronous client
+
+        :param client: The ApiClient to run the calls with, if empty one with a pool of `concurrency` connections is created
+        :type client: ppaas.ApiClient
+        :param concurrency: Maximum number of requests in flight, and of worker threads, up to MAX_CONCURRENCY
+        :type concurrency: int
+        """
+        if concurrency < 1:
+            raise ValueError("The concurrency must be at least 1, not %r" % (concurrency,))
+        concurrency = min(concurrency, MAX_CONCURRENCY)
+        if client is None:
+            client = ApiClient(transport=Transport(pool_size=concurrency, pool_block=True))
+        self.client = client
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking callable on a worker thread
+
+        :param func: The callable to run, usually a method of a ppaas object
+        :type func: callable
+
+        :return: Whatever `func` returns, exceptions are propagated
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs))
+
+    async def call(self, method, path, data=None, params=None):
+        """Asynchronous version of ApiClient.call"""
+        return await self.run(self.client.call, method, path, data=data, params=params)
+
+    async def get(self, url, params=None):
+        """Asynchronous version of ApiClient.get"""
+        return await self.run(self.client.get, url, params=params)
+
+    async def post(self, url, data=None, params=None):
+        """Asynchronous version of ApiClient.post"""
+        return await self.run(self.client.post, url, data=data, params=params)
+
+    async def put(self, url, data, params=None):
+        """Asynchronous version of ApiClient.put"""
+        return await self.run(self.client.put, url, data, params=params)
+
+    async def delete(self, url, params=None):
+        """Asynchronous version of ApiClient.delete"""
+        return await self.run(self.client.delete, url, params=params)
+
+    async def get_masters(self):
+        """Asynchronous version of Master.get_masters"""
+        return await self.run(Master.get_masters, self.client)
+
+    async def get_master(self, name):
+        """Asynchronous version of Master.get_master"""
+        return await self.run(Master.get_master, name, self.client)
+
+    async def master(self, uuid):
+        """Asynchronous version of Master.resolve"""
+        return await self.run(Master.resolve, uuid, self.client)
+
+    async def create_master(self, name, source, deploy_key, **kwargs):
+        """Asynchronous version of Master.create_master"""
+        return await self.run(Master.create_master, name, source, deploy_key, client=self.client, **kwargs)
+
+    async def refresh(self, master):
+        """Asynchronous version of Master.refresh"""
+        return await self.run(master.refresh)
+
+    async def restart(self, master):
+        """Asynchronous version of Master.restart"""
+        return await self.run(master.restart)
+
+    async def wait_jobs(self, jobs, timeout=None):
+        """Waits for refresh or restart jobs without blocking the event loop
+
+        Jobs can also be awaited one by one, `await job`.
+
+        :param jobs: The jobs returned by refresh() or restart()
+        :type jobs: iterable of ppaas.jobs.Job
+        :param timeout: Maximum number of seconds to wait, forever if empty
+        :type timeout: float
+
+        :return: The finished jobs and the pending ones
+        :rtype: tuple of (set, set)
+        """
+        jobs = dict((asyncio.wrap_future(job.future), job) for job in jobs)
+        if not jobs:
+            return set(), set()
+        done, pending = await asyncio.wait(list(jobs), timeout=timeout)
+        return set(jobs[future] for future in done), set(jobs[future] for future in pending)
+
+    async def get_certificates(self, master, status=None):
+        """Asynchronous version of Master.get_certificates"""
+        return await self.run(master.get_certificates, status)
+
+    async def certificate(self, master, hostname):
+        """Asynchronous version of Master.certificate"""
+        return await self.run(master.certificate, hostname)
+
+    async def sign(self, certificate):
+        """Asynchronous version of Certificate.sign"""
+        return await self.run(certificate.sign)
+
+    async def revoke(self, certificate):
+        """Asynchronous version of Certificate.revoke"""
+        return await self.run(certificate.revoke)
+
+    async def delete_certificate(self, certificate):
+        """Asynchronous version of Certificate.delete"""
+        return await self.run(certificate.delete)
+
+    async def get_deploy_keys(self):
+        """Asynchronous version of DeployKey.get_deploy_keys"""
+        return await self.run(DeployKey.get_deploy_keys, self.client)
+
+    async def deploy_key(self, name):
+        """Asynchronous version of DeployKey.resolve"""
+        return await self.run(DeployKey.resolve, name, self.client)
+
+    async def create_deploy_key(self, name):
+        """Asynchronous version of DeployKey.create_deploy_key"""
+        return await self.run(DeployKey.create_deploy_key, name, self.client)
+
+    async def delete_deploy_key(self, key):
+        """Asynchronous version of DeployKey.delete"""
+        return await self.run(key.delete)
+
+    def close(self):
+        """Releases the workers"""
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def watch(self, watcher):
+        """Iterates asynchronously over the events of a certificate watcher
+
+        The watcher is started in the background if it is not running yet.
+        Must be called from a coroutine, the events are handed to its loop.
+
+        :param watcher: The watcher
+        :type watcher: ppaas.CertificateWatcher
+
+        :rtype: ppaas.aio.WatcherEvents
+
+        :Example:
+        >>> async for event in client.watch(ppaas.CertificateWatcher(masters)):
+        ...     print(event)
+        """
+        events = WatcherEvents(watcher)
+        if not watcher.running:
+            watcher.start()
+        return events
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Async Api Client concurrency=%d>" % self.concurrency
+
+
+class WatcherEvents(object):
+    """Asynchronous iterator over the events of a ppaas.CertificateWatcher
+
+    Events are handed from the polling thread to the event loop the iterator
+    was created in, it must be created from a coroutine.
+    """
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        watcher.subscribe(self._push)
+
+    def _push(self, event):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def close(self):
+        """Stops receiving the events of the watcher"""
+        self.watcher.unsubscribe(self._push)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
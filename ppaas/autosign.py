@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import argparse
+import heapq
+import importlib
+import itertools
+import re
+import sys
+import threading
+import time
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from .bulk import DEFAULT_MAX_WORKERS, run_bulk
+from .certificate import Certificate
+from .master import Master
+from .watcher import ADDED, CHANGED, REMOVED, CertificateWatcher
+
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_WINDOW = 0.2
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_MAX_ATTEMPTS = 3
+# Seconds before the first retry of a failed signature, doubled at each attempt
+DEFAULT_RETRY_DELAY = 1
+
+
+class HostnamePolicy(object):
+    """Accepts the certificates whose hostname matches a regex"""
+    def __init__(self, pattern):
+        self.regex = re.compile(pattern)
+
+    def __call__(self, master, certificate):
+        return self.regex.match(certificate.hostname) is not None
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Hostname Policy %s>" % self.regex.pattern
+
+
+class FingerprintPolicy(object):
+    """Accepts the certificates whose fingerprint is in an allowlist"""
+    def __init__(self, fingerprints):
+        self.fingerprints = frozenset(fingerprint.strip().upper() for fingerprint in fingerprints)
+
+    def __call__(self, master, certificate):
+        return (certificate.fingerprint or '').upper() in self.fingerprints
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Fingerprint Policy %d fingerprints>" % len(self.fingerprints)
+
+
+class AutosignStats(object):
+    """Throughput and latency counters of an AutoSigner
+
+    The latency of a certificate is the time between the moment it was
+    seen pending and the moment its signature was accepted by the API.
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.seen = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.signed = 0
+        self.failed = 0
+        self.batches = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._lock = threading.Lock()
+
+    def incr(self, counter, value=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + value)
+
+    def record_signature(self, latency):
+        with self._lock:
+            self.signed += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def to_dict(self):
+        """Returns the counters, with the derived throughput and mean latency
+
+        :rtype: dict
+        """
+        with self._lock:
+            uptime = max(time.time() - self.started_at, 1e-9)
+            return {
+                'uptime': uptime,
+                'seen': self.seen,
+                'duplicates': self.duplicates,
+                'rejected': self.rejected,
+                'signed': self.signed,
+                'failed': self.failed,
+                'batches': self.batches,
+                'signed_per_second': self.signed / uptime,
+                'latency_mean': self.latency_total / self.signed if self.signed else 0.0,
+                'latency_max': self.latency_max,
+            }
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Autosign Stats %(signed)d signed, %(rejected)d rejected, %(failed)d failed, " \
+               "%(latency_mean).3fs mean latency>" % self.to_dict()
+
+
+class AutoSigner(object):
+    """Signs the pending certificates accepted by a set of policies.
+
+    This class has the following behavior:
+      * Pending certificates are reported by a ppaas.CertificateWatcher and
+        checked against the policies, a certificate is signed when one of
+        them accepts it (or all of them if `require_all` is set). A policy
+        is any callable taking a master and a certificate record.
+      * Accepted certificates go to a bounded queue. When it is full the
+        watcher thread blocks, so a burst of agents slows the polling down
+        instead of growing memory.
+      * The signing thread coalesces what arrives within `batch_window`
+        seconds (up to `batch_size` certificates) into parallel sign calls
+        per master, without the reload of every certificate.
+      * A certificate (master, hostname, fingerprint) is only decided once
+        while it is pending, it is forgotten once signed or removed
+      * Failed signatures are retried up to `max_attempts` times, after
+        `retry_delay` seconds doubled at each attempt. Retries are kept
+        aside by the signing thread, never put back in the queue it is the
+        only one to drain.
+
+    :Example:
+    >>> signer = ppaas.AutoSigner(ppaas.Master.get_masters(),
+    ...                           [ppaas.autosign.HostnamePolicy(r'^web\\d+\\.maurice\\.fr$')])
+    >>> signer.start()
+    >>> signer.stats
+    <Autosign Stats 42 signed, 1 rejected, 0 failed, 0.734s mean latency>
+    """
+    def __init__(self, masters, policies, require_all=False, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_window=DEFAULT_BATCH_WINDOW, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_workers=DEFAULT_MAX_WORKERS, max_attempts=DEFAULT_MAX_ATTEMPTS, watcher=None,
+                 retry_delay=DEFAULT_RETRY_DELAY):
+        """Creates a new signer
+
+        :param masters: The masters to sign the certificates of
+        :type masters: iterable of ppaas.Master
+        :param policies: The policies deciding which certificates are signed
+        :type policies: list of callable
+        :param require_all: Whether every policy has to accept a certificate
+        :type require_all: bool
+        :param batch_size: Maximum number of certificates signed in a batch
+        :type batch_size: int
+        :param batch_window: How long to wait for more certificates before signing a batch, in seconds
+        :type batch_window: float
+        :param queue_size: Maximum number of accepted certificates waiting for their signature
+        :type queue_size: int
+        :param max_workers: Maximum number of signatures running at the same time
+        :type max_workers: int
+        :param max_attempts: Maximum number of signature attempts of a certificate
+        :type max_attempts: int
+        :param watcher: The watcher reporting the certificates, a default one if empty
+        :type watcher: ppaas.CertificateWatcher
+        :param retry_delay: Seconds before the first retry of a failed signature
+        :type retry_delay: float
+        """
+        self.policies = list(policies)
+        self.require_all = require_all
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stats = AutosignStats()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.watcher = watcher or CertificateWatcher(masters)
+        self.watcher.subscribe(self.on_event)
+        # (master uuid, hostname) -> fingerprint of the pending certificates already decided
+        self._decided = {}
+        # Heap of (due time, sequence, item), only used by the signing thread
+        self._retries = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def accepts(self, master, certificate):
+        """Whether the policies accept to sign a certificate
+
+        :rtype: bool
+        """
+        check = all if self.require_all else any
+        return check(policy(master, certificate) for policy in self.policies)
+
+    def on_event(self, event):
+        """Handles an event of the watcher, blocks when the queue is full"""
+        certificate = event.certificate
+        if event.kind in (ADDED, CHANGED) and certificate.status == "SIGNATURE PENDING":
+            self.submit(event.master, certificate)
+        elif event.kind in (CHANGED, REMOVED):
+            # No longer pending, nothing to remember about it
+            with self._lock:
+                self._decided.pop((event.master.uuid, event.hostname), None)
+
+    def submit(self, master, certificate):
+        """Submits a pending certificate to the policies
+
+        :param master: The master of the certificate
+        :type master: ppaas.Master
+        :param certificate: The certificate
+        :type certificate: ppaas.records.CertificateRecord
+
+        :return: Whether the certificate was queued for signature
+        :rtype: bool
+        """
+        self.stats.incr('seen')
+        key = (master.uuid, certificate.hostname)
+        with self._lock:
+            if key in self._decided and self._decided[key] == certificate.fingerprint:
+                self.stats.incr('duplicates')
+                return False
+            self._decided[key] = certificate.fingerprint
+        if not self.accepts(master, certificate):
+            self.stats.incr('rejected')
+            return False
+        self.queue.put((master, certificate, time.time(), 1))
+        return True
+
+    def _due_retries(self, limit):
+        batch = []
+        now = time.time()
+        while self._retries and len(batch) < limit and self._retries[0][0] <= now:
+            batch.append(heapq.heappop(self._retries)[2])
+        return batch
+
+    def _next_batch(self):
+        batch = self._due_retries(self.batch_size)
+        if not batch:
+            timeout = 0.5
+            if self._retries:
+                timeout = max(0, min(timeout, self._retries[0][0] - time.time()))
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                return self._due_retries(self.batch_size)
+        deadline = time.time() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def sign_batch(self, batch):
+        """Signs a batch of queued certificates, failures are retried later
+
+        :param batch: Tuples of (master, certificate record, time seen, attempt)
+        :type batch: list
+        """
+        self.stats.incr('batches')
+        items = dict(((master.uuid, record.hostname), (master, record, seen, attempt))
+                     for master, record, seen, attempt in batch)
+
+        def sign(key):
+            master, record, _, _ = items[key]
+            return Certificate.resolve(master, record.hostname, record.to_dict()).sign(reload=False)
+
+        report = run_bulk('sign', list(items), sign, max_workers=self.max_workers)
+        for result in report:
+            master, record, seen, attempt = items[result.key]
+            if result.ok:
+                self.stats.record_signature(time.time() - seen)
+            elif attempt < self.max_attempts:
+                due = time.time() + self.retry_delay * 2 ** (attempt - 1)
+                heapq.heappush(self._retries, (due, next(self._sequence), (master, record, seen, attempt + 1)))
+            else:
+                self.stats.incr('failed')
+        return report
+
+    def run(self):
+        """Signs the queued certificates until stop() is called"""
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self.sign_batch(batch)
+
+    def start(self):
+        """Starts the watcher and the signing thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='ppaas-autosign')
+        self._thread.daemon = True
+        self._thread.start()
+        if not self.watcher.running:
+            self.watcher.start()
+
+    def stop(self, timeout=None):
+        """Stops the watcher and the signing thread"""
+        self.watcher.stop(timeout)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Auto Signer %d policies>" % len(self.policies)
+
+
+def load_hook(spec):
+    """Loads a policy hook given as "package.module:function"
+
+    :rtype: callable
+    """
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def build_parser(parser=None):
+    """Builds the command line parser of the autosign service"""
+    if parser is None:
+        parser = argparse.ArgumentParser(prog='ppaas autosign', description=
+                                         "Signs the pending agent certificates matching policies")
+    parser.add_argument('--master', action='append', default=[],
+                        help="Name of a master to watch, every master if omitted (repeatable)")
+    parser.add_argument('--hostname', action='append', default=[], metavar='REGEX',
+                        help="Sign the hostnames matching this regex (repeatable)")
+    parser.add_argument('--fingerprints', metavar='FILE',
+                        help="Sign the fingerprints listed in this file, one per line")
+    parser.add_argument('--hook', action='append', default=[], metavar='MODULE:FUNCTION',
+                        help="Sign when hook(master, certificate) is true (repeatable)")
+    parser.add_argument('--require-all', action='store_true',
+                        help="Require every policy to accept a certificate instead of one")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_BATCH_WINDOW)
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--min-interval', type=float, default=1)
+    parser.add_argument('--max-interval', type=float, default=30)
+    parser.add_argument('--stats-interval', type=float, default=60,
+                        help="Print the counters every this many seconds")
+    return parser
+
+
+def run(args, client=None):
+    """Runs the autosign service described by parsed command line arguments"""
+    policies = [HostnamePolicy(pattern) for pattern in args.hostname]
+    if args.fingerprints:
+        with open(args.fingerprints) as f:
+            policies.append(FingerprintPolicy(line for line in f if line.strip()))
+    policies.extend(load_hook(spec) for spec in args.hook)
+    if not policies:
+        sys.stderr.write("No policy given, refusing to sign anything\n")
+        return 2
+
+    masters = Master.get_masters(client)
+    if args.master:
+        masters = [master for master in masters if master.name in args.master]
+    watcher = CertificateWatcher(masters, min_interval=args.min_interval, max_interval=args.max_interval)
+    signer = AutoSigner(masters, policies, require_all=args.require_all, batch_size=args.batch_size,
+                        batch_window=args.batch_window, queue_size=args.queue_size,
+                        max_workers=args.workers, watcher=watcher)
+    signer.start()
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            sys.stdout.write("%r\n" % signer.stats)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signer.stop()
+    return 0
+
+
+def main(argv=None):
+    """Entry point of `python -m ppaas.autosign`"""
+    return run(build_parser().parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
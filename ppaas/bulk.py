@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class BulkResult(object):
+    """Outcome of a bulk operation for a single item
+
+    Either `result` is set and `error` is None, or `error` holds the
+    exception raised for this item (ppaas.client.ResourceNotFoundError,
+    ppaas.client.Forbidden...)
+    """
+    def __init__(self, key, result=None, error=None):
+        self.key = key
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        """Whether the operation succeeded for this item"""
+        return self.error is None
+
+    def __repr__(self):
+        """String representation of the object"""
+        if self.ok:
+            return "<Bulk Result %s ok>" % self.key
+        return "<Bulk Result %s %s>" % (self.key, type(self.error).__name__)
+
+
+class BulkReport(object):
+    """Per item report of a bulk operation
+
+    :Example:
+    >>> report = master.sign_certificates(lambda cert: cert.hostname.endswith('.web'))
+    >>> report
+    <Bulk sign report: 41 succeeded, 1 failed>
+    >>> report.failed
+    {u'db.web': ResourceNotFoundError({u'message': u'The requested resource could not be found.'},)}
+    """
+    def __init__(self, action):
+        self.action = action
+        self.results = OrderedDict()
+
+    def add(self, result):
+        """Records the result of one item
+
+        :param result: The result to record
+        :type result: ppaas.bulk.BulkResult
+        """
+        self.results[result.key] = result
+
+    @property
+    def succeeded(self):
+        """Keys of the items the operation succeeded for
+
+        :rtype: list
+        """
+        return [key for key, result in self.results.items() if result.ok]
+
+    @property
+    def failed(self):
+        """Errors of the items the operation failed for
+
+        :return: A dictionary of key -> exception
+        :rtype: dict
+        """
+        return dict((key, result.error) for key, result in self.results.items() if not result.ok)
+
+    def __getitem__(self, key):
+        return self.results[key]
+
+    def __iter__(self):
+        return iter(self.results.values())
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Bulk %s report: %d succeeded, %d failed>" % (
+            self.action, len(self.succeeded), len(self.failed))
+
+
+def iter_bulk(items, operation, key=None, max_workers=DEFAULT_MAX_WORKERS):
+    """Applies an operation to items on a bounded pool of workers, lazily
+
+    Results are yielded as soon as they are available, in completion order.
+    Exceptions raised by `operation` do not stop the other items, they are
+    yielded as failed results instead. Closing the generator early cancels
+    the operations which have not started yet.
+
+    :param items: The items to process
+    :type items: iterable
+    :param operation: Callable applied to every item
+    :type operation: callable
+    :param key: Callable giving the key of an item in the results, the item itself by default
+    :type key: callable
+    :param max_workers: Maximum number of operations running at the same time
+    :type max_workers: int
+
+    :return: The result of every item
+    :rtype: generator of ppaas.bulk.BulkResult
+    """
+    if key is None:
+        key = lambda item: item
+    items = list(items)
+    if not items:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    futures = dict((executor.submit(operation, item), item) for item in items)
+    try:
+        for future in as_completed(futures):
+            item_key = key(futures[future])
+            try:
+                result = BulkResult(item_key, result=future.result())
+            except Exception as error:
+                result = BulkResult(item_key, error=error)
+            yield result
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def run_bulk(action, items, operation, key=None, max_workers=DEFAULT_MAX_WORKERS, report=None):
+    """Applies an operation to items on a bounded pool of workers
+
+    Exceptions raised by `operation` do not stop the other items, they are
+    collected in the report instead.
+
+    :param action: Name of the operation, for the report
+    :type action: str
+    :param items: The items to process
+    :type items: iterable
+    :param operation: Callable applied to every item
+    :type operation: callable
+    :param key: Callable giving the key of an item in the report, the item itself by default
+    :type key: callable
+    :param max_workers: Maximum number of operations running at the same time
+    :type max_workers: int
+    :param report: A report to complete, if empty a new one is created
+    :type report: ppaas.bulk.BulkReport
+
+    :return: The per item report
+    :rtype: ppaas.bulk.BulkReport
+    """
+    if report is None:
+        report = BulkReport(action)
+    for result in iter_bulk(items, operation, key, max_workers):
+        report.add(result)
+    return report
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import itertools
+import re
+import threading
+import time
+
+from collections import OrderedDict
+
+
+# Time to live, in seconds, of the GET responses per endpoint. A `*`
+# matches a single path segment. Other endpoints are not cached unless
+# the server sends validators (ETag or Last-Modified).
+DEFAULT_TTLS = OrderedDict([
+    ('/masters/*/crl', 60),
+    ('/masters/*/environments', 60),
+    ('/masters/*/last-update', 5),
+    ('/masters/*/certs', 5),
+])
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def copy_response(value):
+    """Copies the dictionaries and lists of a decoded response
+
+    Cached responses are shared by every caller, this gives one which can
+    be modified freely.
+    """
+    kind = type(value)
+    if kind is dict:
+        return dict((key, copy_response(item) if type(item) in (dict, list) else item)
+                    for key, item in value.items())
+    if kind is list:
+        return [copy_response(item) if type(item) in (dict, list) else item for item in value]
+    return value
+
+
+def mutation_scope(path):
+    """Returns whether a path may have been changed by a mutation on `path`
+
+    A mutation on /masters/<masterId>/... may change anything below that
+    master, as well as the /masters listing.
+
+    :param path: The path of the mutating request
+    :type path: str
+
+    :return: A predicate taking a path
+    :rtype: callable
+    """
+    segments = path.strip('/').split('/')
+    prefix = '/' + '/'.join(segments[:2])
+    collection = '/' + segments[0] if len(segments) > 1 else None
+
+    def matches(other):
+        other = other.rstrip('/') or '/'
+        return other == prefix or other.startswith(prefix + '/') or other == collection
+    return matches
+
+
+def compile_endpoint(pattern):
+    """Compiles an endpoint pattern like /masters/*/crl to a regex
+
+    :param pattern: The pattern, a `*` matches a single path segment
+    :type pattern: str
+
+    :rtype: regex
+    """
+    return re.compile('^%s$' % re.escape(pattern).replace(r'\*', '[^/]+'))
+
+
+class CacheEntry(object):
+    """A cached API response"""
+    def __init__(self, result, status, expires, etag=None, last_modified=None):
+        self.result = result
+        self.status = status
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def fresh(self):
+        """Whether the entry can be served without asking the server"""
+        return time.time() < self.expires
+
+    def validators(self):
+        """Headers to revalidate the entry with a conditional request
+
+        :rtype: dict
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """LRU cache of decoded GET responses used by the ApiClient.
+
+    This class has the following behavior:
+      * Responses are kept for the TTL of their endpoint (see DEFAULT_TTLS)
+      * Once expired, an entry which has an ETag or Last-Modified validator
+        is revalidated with a conditional request, and a 304 answer from the
+        server renews it without transferring the body again
+      * When more than `max_entries` responses are cached the least
+        recently used ones are evicted
+      * The ApiClient invalidates the related entries whenever it sends a
+        mutating request (POST, PUT, DELETE). Every path has a generation,
+        bumped by the invalidations covering it: a response fetched while
+        its path was invalidated is not stored, see generation()
+      * A cached response is returned as is to every caller, it must be
+        treated as read-only (see copy_response()). The library never
+        modifies them, and the methods handing raw responses to the user,
+        like master.certificates, return copies.
+
+    :Example:
+    >>> cache = ppaas.ResponseCache(ttls={'/masters/*/crl': 300})
+    >>> client = ppaas.ApiClient(cache=cache)
+    >>> client.get('/masters/%s/crl' % uuid, cache=False)  # bypass
+    >>> cache.invalidate('/masters/%s' % uuid)
+    """
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """Creates a new cache
+
+        :param ttls: Time to live in seconds per endpoint pattern, DEFAULT_TTLS if empty
+        :type ttls: dict
+        :param max_entries: Maximum number of cached responses
+        :type max_entries: int
+        """
+        if ttls is None:
+            ttls = DEFAULT_TTLS
+        self.ttls = [(compile_endpoint(pattern), ttl) for pattern, ttl in ttls.items()]
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, params=None):
+        """Computes the cache key of a request
+
+        :rtype: tuple
+        """
+        if params:
+            return (path, tuple(sorted(params.items())))
+        return (path, ())
+
+    def ttl(self, path):
+        """Returns the time to live of the responses of an endpoint
+
+        :param path: The path of the endpoint, like /masters/<masterId>/crl
+        :type path: str
+
+        :return: The TTL in seconds, 0 if the endpoint is not cached
+        :rtype: int
+        """
+        for regex, ttl in self.ttls:
+            if regex.match(path):
+                return ttl
+        return 0
+
+    def generation(self, path):
+        """Returns the current generation of a path
+
+        Read it before fetching a response and give it to store(): if the
+        path was invalidated in the meantime, by a mutation sent while the
+        request was in flight, the response is not stored.
+
+        :param path: The path of the endpoint
+        :type path: str
+
+        :rtype: int
+        """
+        with self._lock:
+            generation = self._generations.get(path)
+            if generation is None:
+                if len(self._generations) >= 4 * self.max_entries:
+                    # Forgetting the generations only makes the fetches in
+                    # flight skip their store()
+                    self._generations.clear()
+                generation = self._generations[path] = next(self._counter)
+            return generation
+
+    def _bump(self, matches):
+        for path in list(self._generations):
+            if matches(path):
+                self._generations[path] = next(self._counter)
+
+    def get(self, key):
+        """Gets an entry, fresh or not
+
+        :return: The entry or None
+        :rtype: ppaas.cache.CacheEntry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Move it back to the most recently used end
+                del self._entries[key]
+                self._entries[key] = entry
+            return entry
+
+    def store(self, key, result, status, headers=None, generation=None):
+        """Stores a response
+
+        Responses of endpoints without a TTL are only kept if they can be
+        revalidated later on.
+
+        :param key: The key, as returned by key()
+        :param result: The decoded response
+        :param status: The HTTP status
+        :param headers: The headers of the response
+        :type headers: dict
+        :param generation: The generation of the path read before the request, the response is
+                           dropped if the path was invalidated since
+        :type generation: int
+        """
+        headers = headers or {}
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        ttl = self.ttl(key[0])
+        if ttl <= 0 and not etag and not last_modified:
+            return
+        with self._lock:
+            if generation is not None and self._generations.get(key[0]) != generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = CacheEntry(result, status, time.time() + ttl, etag, last_modified)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def renew(self, key, entry):
+        """Marks an entry as fresh again after a successful revalidation"""
+        entry.expires = time.time() + self.ttl(key[0])
+
+    def invalidate(self, prefix=None):
+        """Drops the cached responses of a path and everything below it
+
+        :param prefix: A path like /masters/<masterId>, every entry is dropped if empty
+        :type prefix: str
+        """
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                self._generations.clear()
+                return
+            prefix = prefix.rstrip('/')
+
+            def matches(path):
+                return path == prefix or path.startswith(prefix + '/')
+
+            for key in list(self._entries):
+                if matches(key[0]):
+                    del self._entries[key]
+            self._bump(matches)
+
+    def invalidate_related(self, path):
+        """Drops the entries a mutation on `path` may have changed
+
+        A mutation on /masters/<masterId>/... invalidates everything cached
+        for that master, as well as the /masters listing, see
+        mutation_scope().
+
+        :param path: The path of the mutating request
+        :type path: str
+        """
+        matches = mutation_scope(path)
+        with self._lock:
+            for key in list(self._entries):
+                if matches(key[0]):
+                    del self._entries[key]
+            self._bump(matches)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Response Cache %d/%d>" % (len(self._entries), self.max_entries)
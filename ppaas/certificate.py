@@ -13,23 +13,25 @@
   0. You just DO WHAT THE FUCK YOU WANT TO.
 """
 
-from .client import ApiClient
+import time
 
+from .identity import CERTIFICATES, get_identity_map
+from .records import CertificateRecord, CertificateStatus
 
-class Certificate(object):
+
+class Certificate(CertificateRecord):
     """Interface for the /masters/<masterId>/certs endpoints.
 
     This class allows you to interract with your agent certificates.
 
     This class has the following behavior:
-      * When loaded it will cache some data in self.cached_data (it will
-        cache its json representation according to the API)
+      * When loaded the fields of its json representation according to the API
+        are parsed once and stored in slots (see ppaas.records.CertificateRecord)
       * Everytime you want to get data from the object, like certificate.fingerprint,
-        the cache will be used, so make sure to call reload_datas if updates has been done.
-      * Dictionnary lookup is done via the __getattr__ overloaded method. It
-        is a bit hacky but it does the job. For instance to get the fingerprint
-        of your certificate, you can type `cert.fingerprint`, this will query the
-        cached value in the object
+        the loaded value will be used, so make sure to call reload_data if updates has been done.
+      * `status` is a ppaas.records.CertificateStatus, which still compares equal
+        to its message and can be indexed like a dictionary (cert.status['message']),
+        and the `*_at` fields are datetimes
 
     An example json representation of what this class may look like :
     .. code-block:: json
@@ -46,7 +48,9 @@ class Certificate(object):
             }
         }
     """
-    def __init__(self, master, hostname, cached_data=None):
+    __slots__ = ('client', 'master', 'inventory', 'loaded_at', '__weakref__')
+
+    def __init__(self, master, hostname, cached_data=None, client=None):
         """Creates a new object representing an *existing* agent certificate
 
         :param master: The Master the wanted certificate is attached to
@@ -55,6 +59,8 @@ class Certificate(object):
         :type hostname: str
         :param cached_data: Cached data to instantiate the master
         :type cached_data: dict
+        :param client: The ApiClient to use, if empty the one of the master is used
+        :type client: ppaas.ApiClient
 
         :Example:
         >>> ppaas.Master.get_masters()
@@ -67,29 +73,33 @@ class Certificate(object):
                   ppaas.Master.certificate() method instead
         .. seealso:: get_certificates(), ppaas.Master.certificate()
         """
-        self.client = ApiClient()
+        self.client = client or master.client
         self.hostname = hostname
         self.master = master
+        self.inventory = None
         self.reload_data(cached_data)
 
     def reload_data(self, refreshed_datas=None):
-        """Reloads datas in the cached_data properties of a certificate
+        """Reloads the fields of a certificate
 
-        :param refreshed_datas: Data to use to reload cached_data property of certificate
+        :param refreshed_datas: Data to reload the certificate from, if empty it is fetched from the API
         :type refreshed_datas: dict
 
         """
-        if refreshed_datas:
-            self.cached_data = refreshed_datas
-        else:
-            self.cached_data, _ = self.client.get('/masters/%s/certs/%s' % (self.master.uuid, self.hostname))
+        self.loaded_at = time.time()
+        if not refreshed_datas:
+            refreshed_datas, _ = self.client.get('/masters/%s/certs/%s' % (self.master.uuid, self.hostname))
+        hostname = self.hostname
+        self.load(refreshed_datas)
+        if self.hostname is None:
+            self.hostname = hostname
 
     @staticmethod
     def get_certificates(master, client=None):
         """Returns all the agent certificates for a Master
 
         :param master: The master in question
-        :param client: The ApiClient to use
+        :param client: The ApiClient to use, if empty the one of the master is used
         :type master: ppaas.Master
         :type client: ppaas.ApiClient
 
@@ -105,16 +115,35 @@ class Certificate(object):
                   shipped with the Master class I guess.
         """
         if not client:
-            client = ApiClient()
+            client = master.client
+        fetched_at = time.time()
         result, status = client.get('/masters/%s/certs' % master.uuid)
-        certificates = []
-        for certificate in result['certs']:
-            certificates.append(Certificate(master, certificate['hostname'], certificate))
-        return certificates
+        return [Certificate.resolve(master, certificate['hostname'], certificate, client, fetched_at)
+                for certificate in result['certs']]
+
+    @staticmethod
+    def resolve(master, hostname, cached_data=None, client=None, fetched_at=None):
+        """Returns the single Certificate object of a hostname on a master
+
+        The certificate already known (see ppaas.identity.IdentityMap) is
+        returned, or a new one is built from `cached_data`. `cached_data` is
+        only loaded into a known certificate when `fetched_at`, the time it
+        was requested from the API, is given and more recent than the data
+        the certificate holds.
 
-    def to_dict(self):
+        :rtype: ppaas.Certificate
+        """
+        client = client or master.client
+        return get_identity_map(client).resolve(
+            CERTIFICATES, (master.uuid, hostname),
+            lambda: Certificate(master, hostname, cached_data, client), cached_data, fetched_at)
+
+    def to_dict(self, reload=False):
         """Returns the JSON representation of the object"
 
+        :param reload: Whether to fetch it again from the API instead of using the loaded data
+        :type reload: bool
+
         :return: A dictionary containing the object as served by the API
         :rtype: dict
 
@@ -123,8 +152,25 @@ class Certificate(object):
         >>> ppaas.Certificate(master, 'machine.maurice.fr').to_dict()
         {u'revoked_at': None, u'signed_at': None, u'created_at': u'2016-02-21T11:21:58', u'hostname': u'machine.maurice.fr', u'status': {u'message': u'SIGNATURE PENDING', u'code': 0}, u'fingerprint': u'9F:1F:B2:C6:8F:D2:62:26:7B:A3:49:00:45:6F:D6:81:3A:28:D8:ED:42:C4:23:F6:FF:82:64:F9:60:7F:36:9B', u'serial_number': None}
         """
-        result, status = self.client.get('/masters/%s/certs/%s' % (self.master.uuid, self.hostname))
-        return result
+        if reload:
+            self.reload_data()
+        return super(Certificate, self).to_dict()
+
+    def _mutate(self, method, action, reload):
+        """Sends a mutation of the certificate, through the batcher of the client if it has one
+
+        :return: The decoded response, and the new data of the certificate
+                 when it was reloaded by the batch (None otherwise)
+        :rtype: tuple
+        """
+        path = '/masters/%s/certs/%s%s' % (self.master.uuid, self.hostname, action)
+        if self.client.batcher is not None:
+            return self.client.batcher.submit(self.master.uuid, method, path, self.hostname, reload).result()
+        if method == 'DELETE':
+            result, _ = self.client.delete(path)
+        else:
+            result, _ = self.client.post(path)
+        return result, None
 
     def delete(self):
         """Deletes a certificate.
@@ -134,53 +180,52 @@ class Certificate(object):
         :return: None, or raises an exception
         :rtype: None
         """
-        result, status = self.client.delete('/masters/%s/certs/%s' % (self.master.uuid, self.hostname))
+        result, _ = self._mutate('DELETE', '', False)
+        get_identity_map(self.client).forget(CERTIFICATES, (self.master.uuid, self.hostname))
+        if self.inventory is not None:
+            self.inventory.remove(self.hostname)
         return result
 
-    def revoke(self):
+    def revoke(self, reload=True):
         """Revokes a certificate.
 
+        :param reload: Whether to reload the certificate afterwards (costs a GET, shared by
+                       the whole batch when the client groups mutations), if False only the
+                       status is updated locally
+        :type reload: bool
+
         :return: None, or raises an exception
         :rtype: None
         """
-        result, status = self.client.post('/masters/%s/certs/%s/revoke' % (self.master.uuid, self.hostname))
-        self.reload_data()
+        result, data = self._mutate('POST', '/revoke', reload)
+        if reload:
+            self.reload_data(data)
+        else:
+            self.status = CertificateStatus.REVOKED
+        if self.inventory is not None:
+            self.inventory.update(self)
         return result
 
-    def sign(self):
+    def sign(self, reload=True):
         """Signes a certificate.
 
+        :param reload: Whether to reload the certificate afterwards (costs a GET, shared by
+                       the whole batch when the client groups mutations), if False only the
+                       status is updated locally
+        :type reload: bool
+
         :return: None, or raises an exception
         :rtype: None
         """
-        result, status = self.client.post('/masters/%s/certs/%s/sign' % (self.master.uuid, self.hostname))
-        self.reload_data()
+        result, data = self._mutate('POST', '/sign', reload)
+        if reload:
+            self.reload_data(data)
+        else:
+            self.status = CertificateStatus.SIGNED
+        if self.inventory is not None:
+            self.inventory.update(self)
         return result
 
     def __repr__(self):
         """String representation of the object"""
         return "<Agent Certificate %s@%s>" % (self.hostname, self.master.uuid)
-
-    def __getattr__(self, name):
-        """Retrieves an attribute of the class.
-
-        This is kind of a hack. We use the __getattr__ method to access fields of the
-        json representation of the class. For instance if my class is represented by
-
-        {
-            "foo": "bar",
-            "lel": true
-        }
-
-        Then obj.foo will return be "bar" eventough the property has not been defined
-        in an explicit way.
-
-        :param name: Name of the attribute you want to retrieve
-        :type name: str
-
-        :return: The value of the field
-        :rtype: Any primitive type
-        """
-        if name in self.cached_data:
-            return self.cached_data[name]
-        return super(Certificate, self).__getattr__(name)
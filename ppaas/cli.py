@@ -0,0 +1,509 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+# This module is the `ppaas` command. It only imports the standard library
+# at load time: the API modules (and requests) are imported by the commands
+# which need them, and not at all when the command is forwarded to a daemon.
+import argparse
+import errno
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+SOCKET_ENVIRONMENT_VARIABLE = 'PPAAS_SOCKET'
+
+# Commands never forwarded to a daemon: they run for a long time
+LOCAL_COMMANDS = ('daemon', 'autosign')
+
+_streams = threading.local()
+
+
+def _stdout():
+    return getattr(_streams, 'stdout', None) or sys.stdout
+
+
+def _stderr():
+    return getattr(_streams, 'stderr', None) or sys.stderr
+
+
+class _Exit(Exception):
+    def __init__(self, status):
+        Exception.__init__(self, status)
+        self.status = status
+
+
+class _Parser(argparse.ArgumentParser):
+    """Writes to the streams of the current invocation and never exits the process"""
+    def _print_message(self, message, file=None):
+        if message:
+            (_stderr() if file is sys.stderr else _stdout()).write(message)
+
+    def exit(self, status=0, message=None):
+        if message:
+            _stderr().write(message)
+        raise _Exit(status)
+
+
+def _print(line=''):
+    _stdout().write(u'%s\n' % line)
+
+
+def _print_json(data):
+    _print(json.dumps(data, sort_keys=True, indent=2))
+
+
+def _master(name):
+    from .client import ResourceNotFoundError
+    from .master import Master
+
+    master = Master.get_master(name)
+    if master is None:
+        # Not a name, maybe an uuid
+        try:
+            master = Master(name)
+        except ResourceNotFoundError:
+            raise ResourceNotFoundError({'message': 'No master named %s' % name})
+    return master
+
+
+def _print_report(report):
+    for result in report:
+        if result.ok:
+            _print(u'%s: ok' % result.key)
+        else:
+            _print(u'%s: %s %s' % (result.key, type(result.error).__name__, result.error))
+    return 1 if report.failed else 0
+
+
+def command_list(args):
+    """Lists the masters, or the certificates of a master"""
+    if args.master is None:
+        from .master import Master
+
+        masters = Master.get_masters()
+        if args.json:
+            _print_json([master.to_dict() for master in masters])
+            return 0
+        for master in masters:
+            _print(u'%-24s %s %s' % (master.name, master.uuid, master.hostname))
+        return 0
+    certificates = _master(args.master).get_certificates(args.status)
+    if args.json:
+        _print_json([certificate.to_dict() for certificate in certificates])
+        return 0
+    for certificate in certificates:
+        _print(u'%-40s %-18s %s' % (certificate.hostname, certificate.status.message, certificate.fingerprint))
+    return 0
+
+
+def command_sign(args):
+    """Signs certificates"""
+    return _print_report(_master(args.master).sign_certificates(args.hostnames or None))
+
+
+def command_revoke(args):
+    """Revokes certificates"""
+    return _print_report(_master(args.master).revoke_certificates(args.hostnames))
+
+
+def command_refresh(args):
+    """Refreshes masters"""
+    from .fleet import Fleet
+
+    report = Fleet([_master(name) for name in args.masters]).refresh(args.wait, args.timeout)
+    return _print_report(report)
+
+
+def command_restart(args):
+    """Restarts masters"""
+    from .fleet import Fleet
+
+    report = Fleet([_master(name) for name in args.masters]).restart(args.wait, args.timeout)
+    return _print_report(report)
+
+
+def command_rollout(args):
+    """Refreshes or restarts masters in waves"""
+    from .fleet import Fleet
+
+    def progress(result):
+        if result.ok:
+            _print(u'%s: ok in %.1fs' % (result.key.name, result.result.duration))
+        else:
+            _print(u'%s: %s %s' % (result.key.name, type(result.error).__name__, result.error))
+
+    if args.masters:
+        fleet = Fleet([_master(name) for name in args.masters])
+    else:
+        fleet = Fleet().filter(source=args.source)
+    report = fleet.rollout('restart' if args.restart else 'refresh', concurrency=args.concurrency,
+                           wave_size=args.wave_size, max_failures=args.max_failures, timeout=args.timeout,
+                           on_result=progress)
+    for master in report.skipped:
+        _print(u'%s: skipped' % master.name)
+    _stderr().write("%r\n" % report)
+    return 1 if report.failed or report.skipped else 0
+
+
+def command_reconcile(args):
+    """Converges the masters to a desired state file"""
+    from .reconcile import CREATE_KEY, DRIFT, Reconciler
+
+    reconciler = Reconciler.from_file(args.file)
+    plan = reconciler.plan()
+    for change in plan:
+        if change.action == DRIFT:
+            for field, (current, desired) in sorted(change.fields.items()):
+                _print(u'%s: drift %s is %s, wants %s' % (change.name, field, json.dumps(current), json.dumps(desired)))
+        else:
+            _print(u'%s: %s' % (change.name, 'create deploy key' if change.action == CREATE_KEY else change.action))
+    _stderr().write("%r\n" % plan)
+    if args.dry_run or plan.empty:
+        return 0
+    report = reconciler.apply(plan, args.wait, args.timeout)
+    for result in report:
+        if not result.ok:
+            _print(u'%s: %s %s' % (result.key.name, type(result.error).__name__, result.error))
+    _stderr().write("%r\n" % report)
+    return 1 if report.failed else 0
+
+
+def command_deploy_keys(args):
+    """Lists, creates or deletes deploy keys"""
+    from .deploy_key import DeployKey
+
+    if args.action == 'create':
+        key = DeployKey.create_deploy_key(args.name)
+        _print(key.public)
+        return 0
+    if args.action == 'delete':
+        DeployKey(args.name).delete()
+        return 0
+    keys = DeployKey.get_deploy_keys()
+    if args.json:
+        _print_json([key.to_dict() for key in keys])
+        return 0
+    for key in keys:
+        _print(u'%-24s %s' % (key.name, key.fingerprint))
+    return 0
+
+
+def command_autosign(args):
+    """Runs the autosign service"""
+    from .autosign import main
+
+    return main(args.arguments)
+
+
+def command_daemon(args):
+    """Serves the commands of other invocations from a warm process"""
+    from .client import get_default_client
+
+    # Pay the cold start once: configuration, client, connection pool
+    get_default_client()
+    try:
+        server = Daemon(args.socket)
+    except socket.error as error:
+        _stderr().write("ppaas daemon: %s\n" % (error.strerror or error))
+        return 1
+    _stderr().write("Serving on %s\n" % args.socket)
+    if args.idle_timeout:
+        watchdog = threading.Thread(target=server.shutdown_when_idle, args=(args.idle_timeout,))
+        watchdog.daemon = True
+        watchdog.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def build_parser():
+    """Builds the parser of the `ppaas` command line"""
+    default_socket = os.environ.get(SOCKET_ENVIRONMENT_VARIABLE)
+    parser = _Parser(prog='ppaas', description="Manage your Puppet as a Service masters")
+    parser.add_argument('--json', action='store_true', help="JSON output, when listing")
+    parser.add_argument('--socket', default=default_socket,
+                        help="Socket of a `ppaas daemon` to run the command in (default: $%s)"
+                        % SOCKET_ENVIRONMENT_VARIABLE)
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('list', help="List the masters, or the certificates of a master")
+    command.add_argument('master', nargs='?', help="Name or uuid of the master")
+    command.add_argument('--status', help='Only list the certificates with this status, like "SIGNED"')
+    command.add_argument('--json', action='store_true', default=argparse.SUPPRESS, help="JSON output")
+    command.set_defaults(run=command_list)
+
+    command = commands.add_parser('sign', help="Sign certificates, every pending one if no hostname is given")
+    command.add_argument('master', help="Name or uuid of the master")
+    command.add_argument('hostnames', nargs='*')
+    command.set_defaults(run=command_sign)
+
+    command = commands.add_parser('revoke', help="Revoke certificates")
+    command.add_argument('master', help="Name or uuid of the master")
+    command.add_argument('hostnames', nargs='+')
+    command.set_defaults(run=command_revoke)
+
+    for name, run in (('refresh', command_refresh), ('restart', command_restart)):
+        command = commands.add_parser(name, help="%s masters" % name.capitalize())
+        command.add_argument('masters', nargs='+', help="Names or uuids of the masters")
+        command.add_argument('--wait', action='store_true', help="Wait for the masters to apply it")
+        command.add_argument('--timeout', type=float, help="Maximum number of seconds to wait")
+        command.set_defaults(run=run)
+
+    command = commands.add_parser('rollout', help="Refresh (or restart) masters in waves")
+    command.add_argument('masters', nargs='*', help="Names or uuids of the masters, in order")
+    command.add_argument('--source', help="Roll out to every master pulling this git repository")
+    command.add_argument('--restart', action='store_true', help="Restart the masters instead of refreshing them")
+    command.add_argument('--concurrency', type=int, default=4, help="Masters refreshing at the same time")
+    command.add_argument('--wave-size', type=int, help="Masters per wave, a single wave by default")
+    command.add_argument('--max-failures', type=int, help="Abort once more masters failed, 0 to fail fast")
+    command.add_argument('--timeout', type=float, help="Seconds a master has to finish")
+    command.set_defaults(run=command_rollout)
+
+    command = commands.add_parser('reconcile', help="Create, refresh and restart masters to match a desired state")
+    command.add_argument('file', help="YAML or JSON desired state")
+    command.add_argument('--dry-run', action='store_true', help="Only print the plan")
+    command.add_argument('--wait', action='store_true', help="Wait for the masters to apply the refreshes and restarts")
+    command.add_argument('--timeout', type=float, help="Maximum number of seconds to wait")
+    command.set_defaults(run=command_reconcile)
+
+    command = commands.add_parser('deploy-keys', help="List, create or delete deploy keys")
+    command.add_argument('action', nargs='?', choices=('list', 'create', 'delete'), default='list')
+    command.add_argument('name', nargs='?')
+    command.add_argument('--json', action='store_true', default=argparse.SUPPRESS, help="JSON output, when listing")
+    command.set_defaults(run=command_deploy_keys)
+
+    command = commands.add_parser('autosign', add_help=False, help="Sign the pending certificates matching policies")
+    command.add_argument('arguments', nargs=argparse.REMAINDER)
+    command.set_defaults(run=command_autosign)
+
+    command = commands.add_parser('daemon', help="Serve the commands from a warm process")
+    command.add_argument('--socket', default=argparse.SUPPRESS, help="Socket to serve on")
+    command.add_argument('--idle-timeout', type=float, default=0,
+                         help="Stop after this many seconds without command, 0 to never stop")
+    command.set_defaults(run=command_daemon)
+    return parser
+
+
+def run(argv, stdout=None, stderr=None):
+    """Runs a command in this process
+
+    :param argv: The arguments, without the program name
+    :type argv: list of str
+    :param stdout: Where the output goes, sys.stdout if empty
+    :param stderr: Where the errors go, sys.stderr if empty
+
+    :return: The exit status
+    :rtype: int
+    """
+    _streams.stdout, _streams.stderr = stdout, stderr
+    try:
+        args = build_parser().parse_args(argv)
+        if args.command == 'deploy-keys' and args.action != 'list' and not args.name:
+            _stderr().write("ppaas deploy-keys %s: a name is required\n" % args.action)
+            return 2
+        if args.command == 'rollout' and not (args.masters or args.source):
+            _stderr().write("ppaas rollout: masters or --source are required\n")
+            return 2
+        if args.command == 'daemon' and not args.socket:
+            _stderr().write("ppaas daemon: --socket or $%s is required\n" % SOCKET_ENVIRONMENT_VARIABLE)
+            return 2
+        return args.run(args)
+    except _Exit as exit:
+        return exit.status
+    except Exception as error:
+        from .client import APIError
+
+        if not isinstance(error, APIError):
+            raise
+        _stderr().write(u"%s: %s\n" % (type(error).__name__, error))
+        return 1
+    finally:
+        _streams.stdout = _streams.stderr = None
+
+
+def _recv_line(connection):
+    chunks = []
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b'\n'):
+            break
+    return b''.join(chunks)
+
+
+def forward(path, argv):
+    """Runs a command in a `ppaas daemon`
+
+    :param path: The socket of the daemon
+    :type path: str
+    :param argv: The arguments, without the program name
+    :type argv: list of str
+
+    :return: The exit status, None if the daemon could not be reached or
+             refused the command, which can then safely run locally
+    :rtype: int
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            connection.connect(path)
+        except socket.error:
+            return None
+        # From here on the daemon may have run the command: never run it a second time
+        request = {'argv': argv, 'cwd': os.getcwd(), 'home': os.environ.get('HOME', '')}
+        try:
+            connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            response = json.loads(_recv_line(connection).decode('utf-8'))
+            status = response['status']
+        except (socket.error, ValueError, KeyError, TypeError) as error:
+            sys.stderr.write("ppaas: no valid answer from the daemon on %s, the command may or may not "
+                             "have run: %s %s\n" % (path, type(error).__name__, error))
+            return 1
+    finally:
+        connection.close()
+    if status is None:
+        return None
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return status
+
+
+class _Buffer(object):
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        self.parts.append(text)
+
+    def getvalue(self):
+        return u''.join(self.parts)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.touch()
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            argv = request['argv']
+        except (ValueError, KeyError, TypeError):
+            return
+        if not self.server.serves(request.get('cwd'), request.get('home')):
+            # Answered before running anything, the caller runs it itself
+            self.wfile.write(json.dumps({'status': None}).encode('utf-8') + b'\n')
+            return
+        stdout, stderr = _Buffer(), _Buffer()
+        try:
+            status = run(argv, stdout, stderr)
+        except Exception as error:
+            stderr.write(u"%s: %s\n" % (type(error).__name__, error))
+            status = 1
+        response = {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.server.touch()
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Runs the commands of other `ppaas` invocations with a warm client
+
+    The configuration, the shared client, its response cache and its
+    connection pool stay loaded between commands. The socket is only
+    accessible to the user running the daemon. Commands of a caller whose
+    working directory and home resolve to another configuration file than
+    the daemon's are refused, and run by the caller itself. A socket left
+    behind by a daemon which did not stop cleanly is replaced, but one a
+    daemon still serves on is not.
+    """
+    daemon_threads = True
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise socket.error(errno.EEXIST, "%s exists and is not a socket" % path)
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except socket.error:
+                os.unlink(path)
+            else:
+                raise socket.error(errno.EADDRINUSE, "A daemon already serves on %s" % path)
+            finally:
+                probe.close()
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+        self.path = path
+        self.last_activity = time.time()
+
+    def touch(self):
+        self.last_activity = time.time()
+
+    def serves(self, cwd, home):
+        """Whether a caller uses the same configuration file as the daemon"""
+        from .client import find_config
+
+        return find_config(cwd, home) == find_config()
+
+    def shutdown_when_idle(self, idle_timeout):
+        while time.time() - self.last_activity < idle_timeout:
+            time.sleep(min(idle_timeout, 1))
+        self.shutdown()
+
+    def close(self):
+        self.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def main(argv=None):
+    """Entry point of the `ppaas` command"""
+    if argv is None:
+        argv = sys.argv[1:]
+    path = os.environ.get(SOCKET_ENVIRONMENT_VARIABLE)
+    for index, arg in enumerate(argv):
+        if arg == '--socket' and index + 1 < len(argv):
+            path = argv[index + 1]
+        elif arg.startswith('--socket='):
+            path = arg[len('--socket='):]
+    commands = [arg for arg in argv if not arg.startswith('-') and arg != path]
+    if path and commands and commands[0] not in LOCAL_COMMANDS:
+        status = forward(path, argv)
+        if status is not None:
+            return status
+    return run(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
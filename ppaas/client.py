@@ -13,11 +13,26 @@
   0. You just DO WHAT THE FUCK YOU WANT TO.
 """
 
-import ConfigParser
-import requests
 import os
+import threading
 
-from requests.compat import urljoin
+try:
+    import ConfigParser
+except ImportError:
+    import configparser as ConfigParser
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+from .cache import ResponseCache, mutation_scope
+from .codec import Body, loads
+from .coalesce import MutationBatcher, SingleFlight
+from .identity import IdentityMap
+from .metrics import RequestInfo
+from .scheduler import DEFAULT_TIMEOUT, RetryPolicy, Scheduler, TokenBucket
+from .transport import Transport, get_default_transport, network_errors
 
 
 class APIError(Exception):
@@ -44,60 +59,387 @@ class Forbidden(APIError):
     """Raised when there is a permission issue"""
 
 
+class JobTimeout(APIError):
+    """Raised when a refresh or a restart did not finish in time"""
+
+
 class ConfigurationNotFoundException(APIError):
     """Raised when there is an error from network layer."""
 
 
+def config_paths(cwd=None, home=None):
+    """Returns the pathes the configuration is looked up in, by order of preference
+
+    :param cwd: The working directory to look in, the current one if empty
+    :type cwd: str
+    :param home: The home directory to look in, $HOME if empty
+    :type home: str
+
+    :return: The candidate configuration files
+    :rtype: list of str
+    """
+    if home is None:
+        home = os.environ.get('HOME', "")
+    return [
+        os.path.join(cwd, "ppaas.conf") if cwd else "ppaas.conf",
+        os.path.join(home, ".ppaas.conf"),
+        "/etc/ppaas.conf"
+    ]
+
+
+def find_config(cwd=None, home=None):
+    """Returns the configuration file load_config() would read
+
+    :param cwd: The working directory to look in, the current one if empty
+    :type cwd: str
+    :param home: The home directory to look in, $HOME if empty
+    :type home: str
+
+    :return: The absolute path of the file, None if there is none
+    :rtype: str
+    """
+    for path in config_paths(cwd, home):
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+
+_config_cache = {}
+_config_lock = threading.Lock()
+
+
+def load_config():
+    """Loads the configuration, from cache if the file did not change
+
+    The parsed configuration is kept per file and only parsed again when the
+    modification time of the file changes.
+
+    :return: The parsed configuration
+    :rtype: ConfigParser.ConfigParser
+    """
+    for path in config_paths():
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        with _config_lock:
+            cached = _config_cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            conf = ConfigParser.ConfigParser()
+            conf.read(path)
+            _config_cache[path] = (mtime, conf)
+            return conf
+    raise ConfigurationNotFoundException
+
+
+def scheduler_from_config(conf):
+    """Builds the request scheduler described by the [api] section
+
+    :param conf: The configuration
+    :type conf: ConfigParser.ConfigParser
+
+    :rtype: ppaas.Scheduler
+    """
+    def option(name, default, getter=conf.getfloat):
+        if conf.has_option('api', name):
+            return getter('api', name)
+        return default
+
+    rate_limiter = None
+    # A rate_limit of 0 does not limit the rate
+    if option('rate_limit', 0) > 0:
+        rate_limiter = TokenBucket(conf.getfloat('api', 'rate_limit'), option('burst', None, conf.getint))
+    return Scheduler(
+        retry=RetryPolicy(max_retries=option('max_retries', 3, conf.getint)),
+        rate_limiter=rate_limiter,
+        timeout=option('timeout', DEFAULT_TIMEOUT)
+    )
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Returns the process-wide ApiClient
+
+    The client is shared by every Master, Certificate and DeployKey which
+    is not given one explicitely. It is rebuilt if the configuration file
+    changed since it was created.
+
+    :return: The shared client
+    :rtype: ppaas.ApiClient
+    """
+    global _default_client
+    conf = load_config()
+    with _default_client_lock:
+        if _default_client is None or _default_client.conf is not conf:
+            _default_client = ApiClient(conf=conf)
+        return _default_client
+
+
 class ApiClient():
-    def __init__(self):
-        """We try to load the conf from  a set of defined pathes"""
-        conf_file = None
-        for path in [
-            "ppaas.conf",
-            os.path.join(os.environ.get('HOME', ""), ".ppaas.conf"),
-            "/etc/ppaas.conf"
-        ]:
-            if os.path.exists(path):
-                conf_file = path
-                break
-        if conf_file is None:
-            raise ConfigurationNotFoundException
-        conf = ConfigParser.ConfigParser()
-        conf.read(conf_file)
+    def __init__(self, transport=None, conf=None, cache=None, scheduler=None, batch_window=None,
+                 compress_threshold=None):
+        """We try to load the conf from  a set of defined pathes
+
+        Calls go through a pooled ppaas.Transport. Unless one is given, the
+        process-wide transport is used, or a dedicated one if `pool_size` is
+        set in the [api] section of the configuration.
+
+        :param transport: The transport to send the requests with
+        :type transport: ppaas.Transport
+        :param conf: An already parsed configuration, if empty the cached one is used
+        :type conf: ConfigParser.ConfigParser
+        :param cache: The cache of GET responses, a default one if empty, False to disable caching
+        :type cache: ppaas.ResponseCache
+        :param scheduler: Applies timeouts, retries and rate limiting, built from the configuration if empty
+        :type scheduler: ppaas.Scheduler
+        :param batch_window: Groups the certificate mutations of a master sent within this many seconds,
+                             the `batch_window` setting of the [api] section if empty, 0 to disable
+        :type batch_window: float
+        :param compress_threshold: Request bodies bigger than this many bytes are gzipped, the
+                                   `compress_threshold` setting of the [api] section if empty,
+                                   bodies are never compressed if neither is set
+        :type compress_threshold: int
+
+        The masters, certificates and deploy keys built through the client
+        are unique per uuid, hostname or name, see ppaas.identity.IdentityMap.
+
+        Concurrent identical GETs always share a single request, see
+        ppaas.coalesce.SingleFlight. Certificate mutations are only grouped
+        (see ppaas.coalesce.MutationBatcher) when a batch window is set.
+
+        The following optional settings of the [api] section are used to
+        build the scheduler: `timeout` (seconds), `max_retries`, `rate_limit`
+        (requests per second) and `burst`.
+        """
+        if conf is None:
+            conf = load_config()
+        self.conf = conf
         self.user = conf.get('auth', 'user')
         self.passw = conf.get('auth', 'pass')
         self.endpoint = conf.get('api', 'endpoint')
-        self.timeout = 10
+        if transport is None:
+            if conf.has_option('api', 'pool_size'):
+                transport = Transport(pool_size=conf.getint('api', 'pool_size'))
+            else:
+                transport = get_default_transport()
+        self.transport = transport
+        if cache is None:
+            cache = ResponseCache()
+        self.cache = cache if cache is not False else None
+        if scheduler is None:
+            scheduler = scheduler_from_config(conf)
+        self.scheduler = scheduler
+        if batch_window is None and conf.has_option('api', 'batch_window'):
+            batch_window = conf.getfloat('api', 'batch_window')
+        self.batcher = MutationBatcher(self, batch_window) if batch_window else None
+        if compress_threshold is None and conf.has_option('api', 'compress_threshold'):
+            compress_threshold = conf.getint('api', 'compress_threshold')
+        self.compress_threshold = compress_threshold
+        self.flights = SingleFlight()
+        self.identity = IdentityMap()
+        self.before_hooks = []
+        self.after_hooks = []
+
+    def add_hook(self, before=None, after=None):
+        """Registers instrumentation callbacks
+
+        Both are called with a ppaas.metrics.RequestInfo for every HTTP
+        request actually sent (each retry included, responses served from
+        the cache excluded): `before` right before sending it, `after` once
+        its response, or the network error, is received. When no hook is
+        registered requests are not instrumented at all.
+
+        :param before: Called before sending a request
+        :type before: callable
+        :param after: Called once a request is finished
+        :type after: callable
+        """
+        if before is not None:
+            self.before_hooks.append(before)
+        if after is not None:
+            self.after_hooks.append(after)
+
+    def remove_hook(self, before=None, after=None):
+        """Unregisters instrumentation callbacks"""
+        if before is not None:
+            self.before_hooks.remove(before)
+        if after is not None:
+            self.after_hooks.remove(after)
+
+    def get(self, url, params=None, cache=True, timeout=None):
+        """Performs a GET, served from the response cache when possible
+
+        :param url: The path of the endpoint
+        :type url: str
+        :param params: Query string parameters
+        :type params: dict
+        :param cache: Set to False to bypass the cache and fetch a fresh response, which is
+                      never shared with a request already in flight
+        :type cache: bool
+        :param timeout: Timeout of the call in seconds, the one of the endpoint if empty
+        :type timeout: float
+
+        .. note:: The result may be shared with the response cache and with
+                  concurrent callers, do not modify it, see
+                  ppaas.cache.copy_response()
+        """
+        if self.cache is None:
+            key = (url, tuple(sorted((params or {}).items())))
+
+            def fetch():
+                return self.call('GET', urljoin(self.endpoint, url), params=params, timeout=timeout)
+        else:
+            key = self.cache.key(url, params)
+            entry = self.cache.get(key)
+            if entry is not None and cache and entry.fresh:
+                return entry.result, entry.status
+
+            def fetch():
+                return self._fetch(key, url, params, timeout)
+        if not cache:
+            # A request in flight may have been sent before whatever made
+            # the caller ask for a fresh response
+            return fetch()
+        # Concurrent misses of the same response share a single request
+        return self.flights.do(key, fetch)
+
+    def _fetch(self, key, url, params, timeout):
+        # A mutation sent while the GET is in flight invalidates the path
+        # again, the response may predate it and must not be cached
+        generation = self.cache.generation(key[0])
+        entry = self.cache.get(key)
+        headers = entry.validators() if entry is not None else None
+        response = self.request('GET', urljoin(self.endpoint, url), params=params, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self.cache.renew(key, entry)
+            return entry.result, entry.status
+        result, status = self.decode(response)
+        self.cache.store(key, result, status, response.headers, generation)
+        return result, status
+
+    def stream(self, url, params=None, timeout=None):
+        """Performs a GET without reading the body of the response
+
+        The caller is responsible for closing the response. Errors are raised
+        like they are by call().
 
-    def get(self, url, params=None):
-        return self.call('GET', urljoin(self.endpoint, url), params=params)
+        :return: The response, its body can be read with iter_content()
+        :rtype: requests.Response
+        """
+        response = self.request('GET', urljoin(self.endpoint, url), params=params, timeout=timeout, stream=True)
+        if response.status_code >= 300:
+            self.decode(response)
+        return response
 
-    def post(self, url, data=None, params=None):
-        return self.call('POST', urljoin(self.endpoint, url), data=data)
+    def post(self, url, data=None, params=None, timeout=None):
+        try:
+            return self.call('POST', urljoin(self.endpoint, url), data=data, params=params, timeout=timeout)
+        finally:
+            self.invalidate(url)
+
+    def put(self, url, data, params=None, timeout=None):
+        try:
+            return self.call('PUT', urljoin(self.endpoint, url), data=data, params=params, timeout=timeout)
+        finally:
+            self.invalidate(url)
+
+    def delete(self, url, params=None, timeout=None):
+        try:
+            return self.call('DELETE', urljoin(self.endpoint, url), params=params, timeout=timeout)
+        finally:
+            self.invalidate(url)
+
+    def invalidate(self, url):
+        """Drops the cached responses a mutation on `url` may have changed
+
+        :param url: The path of the mutated resource
+        :type url: str
+        """
+        if self.cache is not None:
+            self.cache.invalidate_related(url)
+        # The GETs in flight may predate the mutation, the next callers send their own
+        matches = mutation_scope(url)
+        self.flights.detach(lambda key: matches(key[0]))
+
+    def call(self, method, path, data=None, params=None, timeout=None):
+        return self.decode(self.request(method, path, data=data, params=params, timeout=timeout))
+
+    def request(self, method, path, data=None, params=None, headers=None, timeout=None, stream=False):
+        """Sends a request through the scheduler and returns the raw response
+
+        Network errors are raised as NetworkError once the retries allowed
+        by the scheduler are exhausted.
+
+        :param data: The payload, JSON encoded once whatever the number of
+                     attempts, or an already encoded ppaas.codec.Body
+        :return: The response of the server
+        :rtype: requests.Response
+        """
+        body = None
+        if data is not None:
+            body = data if isinstance(data, Body) else Body(data, self.compress_threshold)
+            headers = dict(headers or {}, **body.headers)
+
+        def send(timeout):
+            return self.transport.request(
+                method,
+                path,
+                params=params,
+                auth=(self.user, self.passw),
+                data=body.data() if body is not None else None,
+                headers=headers,
+                timeout=timeout,
+                stream=stream
+            )
+
+        if self.before_hooks or self.after_hooks:
+            send = self._instrumented(method, path, send)
+
+        try:
+            return self.scheduler.run(method, path, send, timeout)
+        except network_errors() as error:
+            raise NetworkError(error)
 
-    def put(self, url, data, params=None):
-        return self.call('PUT', urljoin(self.endpoint, url), data=data, params=params)
+    def _instrumented(self, method, path, send):
+        def instrumented_send(timeout):
+            info = RequestInfo(method, path)
+            for hook in self.before_hooks:
+                hook(info)
+            try:
+                response = send(timeout)
+            except Exception as error:
+                info.finish(error=error)
+                for hook in self.after_hooks:
+                    hook(info)
+                raise
+            info.finish(response)
+            for hook in self.after_hooks:
+                hook(info)
+            return response
+        return instrumented_send
 
-    def delete(self, url, params=None):
-        return self.call('DELETE', urljoin(self.endpoint, url), params=params)
+    def decode(self, call_result):
+        """Decodes a response, or raises the matching exception
 
-    def call(self, method, path, data=None, params=None):
-        body = ''
+        :param call_result: The response of the server
+        :type call_result: requests.Response
 
-        call_result = requests.request(
-            method,
-            path,
-            params=params,
-            auth=(self.user, self.passw),
-            json=body,
-            timeout=self.timeout
-        )
+        :return: The decoded body and the HTTP status
+        :rtype: tuple
+        """
         status = call_result.status_code
         result = None
 
         try:
-            if call_result.text:
-                result = call_result.json()
+            # Decoded from the raw bytes: going through .text would first
+            # guess the charset of the whole body when the server sends none
+            content = call_result.content
+            if content:
+                result = loads(content)
         except ValueError as error:
             raise InvalidResponse("Failed to decode API response", error)
 
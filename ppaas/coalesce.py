@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+
+from concurrent.futures import Future
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+from .bulk import DEFAULT_MAX_WORKERS, iter_bulk
+
+
+DEFAULT_BATCH_WINDOW = 0.01
+DEFAULT_MAX_BATCH = 100
+
+
+class _Flight(object):
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Runs a single call at a time per key, concurrent callers share its outcome
+
+    The first caller of a key runs the call, the others arriving while it
+    is in flight wait for it and get the same result, or the same
+    exception, without sending anything. detach() makes the next callers
+    of some keys run a call of their own, when the one in flight may be
+    outdated.
+    """
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call):
+        """Runs `call`, unless a call for `key` is already in flight
+
+        :param key: Identifies the call, must be hashable
+        :param call: The callable to run
+        :type call: callable
+
+        :return: What `call` returned, for this caller or the one it joined
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = call()
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def detach(self, matches):
+        """Stops sharing the calls in flight for some keys
+
+        Their current callers still get their outcome, but the next callers
+        of these keys do not join them.
+
+        :param matches: Tells whether a key is to be detached
+        :type matches: callable
+        """
+        with self._lock:
+            for key in list(self._flights):
+                if matches(key):
+                    del self._flights[key]
+
+    def __len__(self):
+        return len(self._flights)
+
+
+class _Mutation(object):
+    __slots__ = ('method', 'path', 'hostname', 'reload', 'future')
+
+    def __init__(self, method, path, hostname, reload):
+        self.method = method
+        self.path = path
+        self.hostname = hostname
+        self.reload = reload
+        self.future = Future()
+
+
+class MutationBatcher(object):
+    """Groups the certificate mutations of a master into micro batches.
+
+    This class has the following behavior:
+      * The first mutation submitted for a master opens a batch, which
+        collects the other mutations of this master submitted during the
+        next `window` seconds (or until `max_batch` of them are waiting)
+      * The requests of a batch are sent concurrently, the cached responses
+        of the master are invalidated once, and the certificates which
+        asked for a reload are all reloaded from a single listing instead
+        of one GET each
+      * Every submission gets a future, failing with the exception of its
+        own request without affecting the others
+
+    It is used by ppaas.Certificate when the client has a batch window, see
+    ppaas.ApiClient.
+    """
+    def __init__(self, client, window=DEFAULT_BATCH_WINDOW, max_batch=DEFAULT_MAX_BATCH,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        """Creates a new batcher
+
+        :param client: The client to send the batches with
+        :type client: ppaas.ApiClient
+        :param window: How long a batch collects mutations, in seconds
+        :type window: float
+        :param max_batch: Number of waiting mutations sending a batch right away
+        :type max_batch: int
+        :param max_workers: Maximum number of requests of a batch sent at the same time
+        :type max_workers: int
+        """
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.max_workers = max_workers
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, master_uuid, method, path, hostname, reload=False):
+        """Queues a mutation of a certificate
+
+        :param master_uuid: The master of the certificate
+        :type master_uuid: str
+        :param method: The HTTP method, POST or DELETE
+        :type method: str
+        :param path: The path of the mutation, like /masters/<uuid>/certs/<hostname>/sign
+        :type path: str
+        :param hostname: The hostname of the certificate
+        :type hostname: str
+        :param reload: Whether the new data of the certificate is wanted
+        :type reload: bool
+
+        :return: A future of the decoded response and the new data of the
+                 certificate (None unless `reload` is set, or if it is gone)
+        :rtype: concurrent.futures.Future
+        """
+        mutation = _Mutation(method, path, hostname, reload)
+        flush_now = False
+        with self._lock:
+            batch = self._pending.get(master_uuid)
+            if batch is None:
+                batch = self._pending[master_uuid] = []
+                timer = threading.Timer(self.window, self._expire, (master_uuid, batch))
+                timer.daemon = True
+                timer.start()
+            batch.append(mutation)
+            if len(batch) >= self.max_batch:
+                del self._pending[master_uuid]
+                flush_now = True
+        if flush_now:
+            self._flush(master_uuid, batch)
+        return mutation.future
+
+    def _expire(self, master_uuid, batch):
+        with self._lock:
+            if self._pending.get(master_uuid) is not batch:
+                # Already sent because it was full
+                return
+            del self._pending[master_uuid]
+        self._flush(master_uuid, batch)
+
+    def _flush(self, master_uuid, batch):
+        batch = [mutation for mutation in batch if mutation.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            self._send(master_uuid, batch)
+        except Exception as error:
+            for mutation in batch:
+                if not mutation.future.done():
+                    mutation.future.set_exception(error)
+
+    def _send(self, master_uuid, batch):
+        client = self.client
+        results = dict((result.key, result) for result in iter_bulk(
+            batch, lambda mutation: client.call(mutation.method, urljoin(client.endpoint, mutation.path)),
+            max_workers=self.max_workers))
+        client.invalidate('/masters/%s/certs' % master_uuid)
+
+        reloaded = {}
+        if any(mutation.reload and results[mutation].ok for mutation in batch):
+            # Not through get(), which could join a listing started before the mutations
+            listing, _ = client.call('GET', urljoin(client.endpoint, '/masters/%s/certs' % master_uuid))
+            reloaded = dict((data['hostname'], data) for data in listing['certs'])
+        for mutation in batch:
+            result = results[mutation]
+            if not result.ok:
+                mutation.future.set_exception(result.error)
+            else:
+                mutation.future.set_result((result.result[0], reloaded.get(mutation.hostname)))
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Mutation Batcher window=%ss>" % self.window
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import io
+import json
+import sys
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Bodies bigger than this are streamed from a file object instead of being
+# written in a single call
+STREAM_THRESHOLD = 1024 * 1024
+
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def dumps(data):
+    """Encodes data as compact UTF-8 JSON
+
+    orjson is used when it is installed, the standard library otherwise.
+
+    :rtype: bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return _encoder.encode(data).encode('utf-8')
+
+
+def loads(data):
+    """Decodes a JSON document given as bytes or text
+
+    orjson is used when it is installed, the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes) and sys.version_info[:2] in ((3, 3), (3, 4), (3, 5)):
+        # json.loads only takes bytes from Python 3.6
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def json_backend():
+    """Returns the name of the JSON library in use, "orjson" or "json"
+
+    :rtype: str
+    """
+    return 'json' if orjson is None else 'orjson'
+
+
+def gzip_compress(data, level=6):
+    """Compresses bytes in the gzip format
+
+    :rtype: bytes
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class Body(object):
+    """An encoded request body, sent as is by every attempt of a request.
+
+    This class has the following behavior:
+      * The payload is encoded once, compact, and gzipped if it is bigger
+        than `compress_threshold`: retries send the same bytes again
+        instead of encoding the payload again
+      * A large body is given to requests as a file object over the encoded
+        bytes, which is written to the socket block by block. Since its
+        length is known, the request is still sent with a Content-Length
+        rather than with a chunked transfer encoding, which not every
+        server accepts.
+
+    :Example:
+    >>> body = Body({'name': 'web', 'hierarchy': hierarchy}, compress_threshold=4096)
+    >>> body.headers
+    {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+    >>> len(body)
+    18412
+    """
+    __slots__ = ('content', 'headers')
+
+    def __init__(self, data, compress_threshold=None):
+        """Encodes a payload
+
+        :param data: The payload, anything JSON serializable
+        :param compress_threshold: Size in bytes above which the body is gzipped, never if empty
+        :type compress_threshold: int
+        """
+        content = dumps(data)
+        self.headers = {'Content-Type': 'application/json'}
+        if compress_threshold is not None and len(content) > compress_threshold:
+            content = gzip_compress(content)
+            self.headers['Content-Encoding'] = 'gzip'
+        self.content = content
+
+    @property
+    def streamed(self):
+        """Whether the body is big enough to be sent in chunks
+
+        :rtype: bool
+        """
+        return len(self.content) > STREAM_THRESHOLD
+
+    def data(self):
+        """Returns what to give requests as the body of an attempt
+
+        Must be called for each attempt: a streamed body is read by the
+        attempt it is given to.
+
+        :return: The bytes, or a file object reading them when the body is streamed
+        :rtype: bytes or io.BytesIO
+        """
+        if self.streamed:
+            return io.BytesIO(self.content)
+        return self.content
+
+    def __len__(self):
+        return len(self.content)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Body %d bytes%s>" % (len(self.content), ' gzip' if 'Content-Encoding' in self.headers else '')
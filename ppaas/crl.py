@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import base64
+import binascii
+import datetime
+import re
+import threading
+
+from .client import InvalidResponse
+
+
+_PEM = re.compile(br'-----BEGIN X509 CRL-----(.*?)-----END X509 CRL-----', re.S)
+
+_INTEGER = 0x02
+_OBJECT_IDENTIFIER = 0x06
+_SEQUENCE = 0x30
+_UTC_TIME = 0x17
+_GENERALIZED_TIME = 0x18
+_EXTENSIONS = 0xa0
+
+# DER encoding of the id-ce-cRLNumber object identifier, 2.5.29.20
+_CRL_NUMBER = b'\x55\x1d\x14'
+
+
+class _Reader(object):
+    """Walks the TLV elements of a DER buffer without copying it"""
+    __slots__ = ('data', 'offset', 'end')
+
+    def __init__(self, data, offset=0, end=None):
+        self.data = data
+        self.offset = offset
+        self.end = len(data) if end is None else end
+
+    def peek(self):
+        """Returns the tag of the next element, None at the end"""
+        return self.data[self.offset] if self.offset < self.end else None
+
+    def next(self):
+        """Returns the tag, start and end of the content of the next element"""
+        data, offset = self.data, self.offset
+        if offset + 2 > self.end:
+            raise InvalidResponse("Truncated CRL")
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7f
+            length = 0
+            for byte in data[offset:offset + size]:
+                length = (length << 8) | byte
+            offset += size
+        if offset + length > self.end:
+            raise InvalidResponse("Truncated CRL")
+        self.offset = offset + length
+        return tag, offset, offset + length
+
+    def enter(self, expected):
+        """Returns a reader over the content of the next element, which must have the `expected` tag"""
+        tag, start, end = self.next()
+        if tag != expected:
+            raise InvalidResponse("Unexpected DER tag 0x%02x in CRL" % tag)
+        return _Reader(self.data, start, end)
+
+
+def _integer(data, start, end):
+    value = 0
+    for byte in data[start:end]:
+        value = (value << 8) | byte
+    if end > start and data[start] & 0x80:
+        value -= 1 << (8 * (end - start))
+    return value
+
+
+def _time(tag, data, start, end, cache=None):
+    raw = bytes(data[start:end])
+    if cache is not None and raw in cache:
+        return cache[raw]
+    text = raw.decode('ascii')
+    if tag == _UTC_TIME:
+        text = ('19' if int(text[:2]) >= 50 else '20') + text
+    value = datetime.datetime(int(text[0:4]), int(text[4:6]), int(text[6:8]),
+                              int(text[8:10]), int(text[10:12]), int(text[12:14]))
+    if cache is not None:
+        # Revocation dates repeat a lot, like every entry revoked by a batch
+        cache[raw] = value
+    return value
+
+
+def decode_crl(data):
+    """Returns the DER encoding of a CRL given in PEM or DER
+
+    :param data: The CRL, like the one of ppaas.Master.crl
+    :type data: str or bytes
+
+    :rtype: bytearray
+    """
+    if isinstance(data, bytearray):
+        data = bytes(data)
+    elif not isinstance(data, bytes):
+        data = data.encode('ascii')
+    match = _PEM.search(data)
+    if match is not None:
+        try:
+            data = base64.b64decode(b''.join(match.group(1).split()))
+        except (TypeError, binascii.Error) as error:
+            raise InvalidResponse("Invalid PEM CRL", error)
+    return bytearray(data)
+
+
+class RevocationList(object):
+    """A parsed certificate revocation list
+
+    Only what is needed to answer revocation queries is kept: the serial
+    numbers with their revocation dates, the update times and the CRL
+    number. The signature is not verified, the CRL comes from the
+    authenticated API.
+
+    `is_revoked()` is a set lookup, it does not allocate anything.
+    """
+    __slots__ = ('serials', 'revoked_at', 'this_update', 'next_update', 'number')
+
+    def __init__(self, revoked_at, this_update=None, next_update=None, number=None):
+        self.revoked_at = revoked_at
+        self.serials = frozenset(revoked_at)
+        self.this_update = this_update
+        self.next_update = next_update
+        self.number = number
+
+    @classmethod
+    def parse(cls, data):
+        """Parses a CRL given in PEM or DER
+
+        :param data: The CRL
+        :type data: str or bytes
+
+        :rtype: ppaas.crl.RevocationList
+        """
+        der = decode_crl(data)
+        tbs = _Reader(der).enter(_SEQUENCE).enter(_SEQUENCE)
+        if tbs.peek() == _INTEGER:
+            tbs.next()  # version
+        tbs.enter(_SEQUENCE)  # signature algorithm
+        tbs.enter(_SEQUENCE)  # issuer
+        tag, start, end = tbs.next()
+        this_update = _time(tag, der, start, end)
+        next_update = None
+        if tbs.peek() in (_UTC_TIME, _GENERALIZED_TIME):
+            tag, start, end = tbs.next()
+            next_update = _time(tag, der, start, end)
+
+        revoked_at = {}
+        dates = {}
+        if tbs.peek() == _SEQUENCE:
+            entries = tbs.enter(_SEQUENCE)
+            entry = _Reader(der)
+            while entries.peek() is not None:
+                _, entry.offset, entry.end = entries.next()
+                tag, start, end = entry.next()
+                serial = _integer(der, start, end)
+                tag, start, end = entry.next()
+                revoked_at[serial] = _time(tag, der, start, end, dates)
+
+        number = None
+        if tbs.peek() == _EXTENSIONS:
+            extensions = tbs.enter(_EXTENSIONS).enter(_SEQUENCE)
+            while extensions.peek() is not None:
+                extension = extensions.enter(_SEQUENCE)
+                tag, start, end = extension.next()
+                if tag == _OBJECT_IDENTIFIER and bytes(der[start:end]) == _CRL_NUMBER:
+                    tag, start, end = extension.next()
+                    if tag != 0x04:  # skip the critical flag
+                        tag, start, end = extension.next()
+                    value = _Reader(der, start, end)
+                    tag, start, end = value.next()
+                    number = _integer(der, start, end)
+        return cls(revoked_at, this_update, next_update, number)
+
+    def is_revoked(self, serial):
+        """Whether a serial number is revoked
+
+        :type serial: int
+        :rtype: bool
+        """
+        return serial in self.serials
+
+    def __contains__(self, serial):
+        return serial in self.serials
+
+    def __len__(self):
+        return len(self.serials)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Revocation List #%s %d serials>" % (self.number, len(self.serials))
+
+
+class CrlIndex(object):
+    """Parsed CRLs of many masters, for fast revocation checks.
+
+    This class has the following behavior:
+      * refresh() fetches the CRL of a master through the client, so it is
+        cached and revalidated with a conditional request, and only parses
+        it again when the server sent a new one
+      * The parsed list of a master is replaced in a single assignment, a
+        reader always sees either the previous or the new list, never a
+        partially updated one
+      * is_revoked() only reads the current list, it never calls the API
+        once the master was loaded, so it can be used at request rates
+
+    :Example:
+    >>> index = ppaas.CrlIndex()
+    >>> index.refresh(master)
+    <Revocation List #12 3 serials>
+    >>> index.is_revoked(master, 4)
+    True
+    >>> index.cross_check(master)
+    [(<Agent Certificate web2.maurice.fr@0e85...>, 'revoked but not in the CRL')]
+    """
+    def __init__(self):
+        self._lists = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, master):
+        """Fetches the CRL of a master and parses it if it changed
+
+        :type master: ppaas.Master
+
+        :return: The current revocation list of the master
+        :rtype: ppaas.crl.RevocationList
+        """
+        data, _ = master.client.get('/masters/%s/crl' % master.uuid)
+        with self._lock:
+            if self._responses.get(master.uuid) is data:
+                return self._lists[master.uuid]
+        revocations = RevocationList.parse(data['crl'])
+        with self._lock:
+            self._lists[master.uuid] = revocations
+            self._responses[master.uuid] = data
+        return revocations
+
+    def get(self, master):
+        """Returns the revocation list of a master, fetched on first use
+
+        :type master: ppaas.Master
+        :rtype: ppaas.crl.RevocationList
+        """
+        revocations = self._lists.get(master.uuid)
+        if revocations is None:
+            revocations = self.refresh(master)
+        return revocations
+
+    def is_revoked(self, master, serial):
+        """Whether a serial number is revoked on a master
+
+        :param master: The master
+        :type master: ppaas.Master
+        :param serial: The serial number of the certificate
+        :type serial: int
+
+        :rtype: bool
+        """
+        revocations = self._lists.get(master.uuid)
+        if revocations is None:
+            revocations = self.refresh(master)
+        return serial in revocations.serials
+
+    def cross_check(self, master, certificates=None):
+        """Compares the CRL of a master with the status of its certificates
+
+        :param master: The master
+        :type master: ppaas.Master
+        :param certificates: The certificates to check, all those of the master if empty
+        :type certificates: list of ppaas.Certificate
+
+        :return: The certificates which disagree with the CRL, and why
+        :rtype: list of (ppaas.Certificate, str)
+        """
+        revocations = self.get(master)
+        if certificates is None:
+            certificates = master.get_certificates()
+        mismatches = []
+        for certificate in certificates:
+            serial = certificate.serial_number
+            revoked = certificate.status == "REVOKED"
+            if serial is None:
+                if revoked:
+                    mismatches.append((certificate, 'revoked without serial number'))
+                continue
+            listed = revocations.revoked_at.get(serial)
+            if revoked and listed is None:
+                mismatches.append((certificate, 'revoked but not in the CRL'))
+            elif not revoked and listed is not None:
+                mismatches.append((certificate, 'in the CRL but not revoked'))
+            elif listed is not None and certificate.revoked_at is not None \
+                    and abs(listed - certificate.revoked_at) > datetime.timedelta(days=1):
+                mismatches.append((certificate, 'revocation dates differ'))
+        return mismatches
+
+    def invalidate(self, master=None):
+        """Forgets the CRL of a master, or of every master"""
+        with self._lock:
+            if master is None:
+                self._lists.clear()
+                self._responses.clear()
+            else:
+                self._lists.pop(master.uuid, None)
+                self._responses.pop(master.uuid, None)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<CRL Index %d masters>" % len(self._lists)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_crl_index(client):
+    """Returns the CRL index shared by the masters of the account a client is logged on
+
+    :param client: The client
+    :type client: ppaas.ApiClient
+
+    :rtype: ppaas.CrlIndex
+    """
+    key = (client.endpoint, client.user)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = CrlIndex()
+        return index
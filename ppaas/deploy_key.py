@@ -13,23 +13,24 @@
   0. You just DO WHAT THE FUCK YOU WANT TO.
 """
 
-from .client import ApiClient
+import time
 
+from .client import get_default_client
+from .identity import DEPLOY_KEYS, get_identity_map
+from .records import DeployKeyRecord
 
-class DeployKey(object):
+
+class DeployKey(DeployKeyRecord):
     """Interface for the /deploy-keys endpoints.
 
     This class allows you to interract with your deployments keys.
 
     This class has the following behavior:
-      * When loaded it will cache some data in self.cached_data (it will
-        cache its json representation according to the API)
+      * When loaded the fields of its json representation according to the API
+        are parsed once and stored in slots (see ppaas.records.DeployKeyRecord)
       * Everytime you want to get data from the object, like key.fingerprint,
-        the cache will be used, so make sure to call reload_datas if updates has been done.
-      * Dictionnary lookup is done via the __getattr__ overloaded method. It
-        is a bit hacky but it does the job. For instance to get the public part
-        of your key, you can type `key.public`, this will query the
-        cached value in the object
+        the loaded value will be used, so make sure to call reload_data if updates has been done.
+      * Fields unknown to the record class are still readable as attributes
 
     An example json representation of what this class may look like :
     .. code-block:: json
@@ -40,13 +41,17 @@ class DeployKey(object):
             "public": "ssh-rsa AAAAB3NzaC1yc2EAAAAD[...]XP1BmhOtTOw=="
         }
     """
-    def __init__(self, name, cached_data):
+    __slots__ = ('client', 'loaded_at', '__weakref__')
+
+    def __init__(self, name, cached_data=None, client=None):
         """Creates a new object representing an *existing* deploy key
 
         :param name: The name of the deploy key you want to load
         :type name: str
         :param cached_data: Cached data to instantiate the master
         :type cached_data: dict
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
 
         :Example:
 
@@ -67,27 +72,30 @@ class DeployKey(object):
 
         .. seealso:: get_deploy_keys(), create_deploy_key()
         """
-        self.client = ApiClient()
+        self.client = client or get_default_client()
         self.name = name
         self.reload_data(cached_data)
 
     def reload_data(self, refreshed_datas=None):
-        """Reloads datas in the cached_data properties of a deploy key
+        """Reloads the fields of a deploy key
 
-        :param refreshed_datas: Data to use to reload cached_data property of deploy key
+        :param refreshed_datas: Data to reload the key from, if empty it is fetched from the API
         :type refreshed_datas: dict
 
         """
-        if refreshed_datas:
-            self.cached_data = refreshed_datas
-        else:
-            self.cached_data, _ = self.client.get('/deploy-keys/%s' % (self.name))
+        self.loaded_at = time.time()
+        if not refreshed_datas:
+            refreshed_datas, _ = self.client.get('/deploy-keys/%s' % (self.name))
+        name = self.name
+        self.load(refreshed_datas)
+        if self.name is None:
+            self.name = name
 
     @staticmethod
     def get_deploy_keys(client=None):
         """Retrieves all your deployment keys.
 
-        :param client: A client object you want to pass, if empty a new one will be created
+        :param client: A client object you want to pass, if empty the shared one will be used
         :type client: ApiClient
 
         :return: The list of your deployment keys
@@ -99,19 +107,51 @@ class DeployKey(object):
         [<Deploy Key github>, <Deploy Key thomas>]
         """
         if not client:
-            client = ApiClient()
+            client = get_default_client()
+        fetched_at = time.time()
         result, status = client.get('/deploy-keys')
-        keys = []
-        for key in result['deploy_keys']:
-            keys.append(DeployKey(key['name'], key))
+        identity = get_identity_map(client)
+        keys = [identity.resolve(DEPLOY_KEYS, key['name'], lambda: DeployKey(key['name'], key, client),
+                                 key, fetched_at)
+                for key in result['deploy_keys']]
+        identity.deploy_keys_listed = True
         return keys
 
+    @staticmethod
+    def resolve(name, client=None):
+        """Returns the single DeployKey object of a name
+
+        The first key resolved lists every deploy key of the account with a
+        single API call, the next ones are served from memory, see
+        ppaas.identity.IdentityMap.
+
+        :param name: The name of the deploy key
+        :type name: str
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
+
+        :rtype: ppaas.DeployKey
+        """
+        if not client:
+            client = get_default_client()
+        identity = get_identity_map(client)
+        key = identity.get(DEPLOY_KEYS, name)
+        if key is None and not identity.deploy_keys_listed:
+            DeployKey.get_deploy_keys(client)
+            key = identity.get(DEPLOY_KEYS, name)
+        if key is None:
+            # Created since the listing, or does not exist (ResourceNotFoundError)
+            key = identity.resolve(DEPLOY_KEYS, name, lambda: DeployKey(name, None, client))
+        return key
+
     @staticmethod
     def create_deploy_key(name, client=None):
         """Creates a new deployment key with a given name.
 
         :param name: Name of the new key
         :type name: str
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
 
         :return: The newly created key
         :rtype: DeployKey
@@ -122,9 +162,11 @@ class DeployKey(object):
         <Deploy Key fookey>
         """
         if not client:
-            client = ApiClient()
+            client = get_default_client()
+        fetched_at = time.time()
         result, status = client.post('/deploy-keys', data={'name': name})
-        return DeployKey(name, result)
+        return get_identity_map(client).resolve(
+            DEPLOY_KEYS, name, lambda: DeployKey(name, result, client), result, fetched_at)
 
     def delete(self):
         """Deletes the current instance of DeployKey.
@@ -140,32 +182,9 @@ class DeployKey(object):
         .. warnings:: This action is irreversible.
         """
         result, status = self.client.delete('/deploy-keys/%s' % (self.name))
+        get_identity_map(self.client).forget(DEPLOY_KEYS, self.name)
         return result
 
     def __repr__(self):
         """String representation of the object"""
         return "<Deploy Key %s>" % (self.name)
-
-    def __getattr__(self, name):
-        """Retrieves an attribute of the class.
-
-        This is kind of a hack. We use the __getattr__ method to access fields of the
-        json representation of the class. For instance if my class is represented by
-
-        {
-            "foo": "bar",
-            "lel": true
-        }
-
-        Then obj.foo will return be "bar" eventough the property has not been defined
-        in an explicit way.
-
-        :param name: Name of the attribute you want to retrieve
-        :type name: str
-
-        :return: The value of the field
-        :rtype: Any primitive type
-        """
-        if name in self.cached_data:
-            return self.cached_data[name]
-        return super(DeployKey, self).__getattr__(name)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+from .bulk import DEFAULT_MAX_WORKERS, BulkReport, BulkResult, iter_bulk
+from .client import get_default_client, JobTimeout, ResourceNotFoundError
+from .jobs import wait_jobs
+from .master import Master
+
+
+class Fleet(object):
+    """A set of puppet masters operated on concurrently.
+
+    This class has the following behavior:
+      * Operations run on every master of the fleet at the same time, with
+        at most `max_workers` of them in flight
+      * imap() streams the per master results as they complete, map() and
+        the helpers built on it collect them in a ppaas.bulk.BulkReport keyed
+        by master, so a failure on one master does not stop the others
+      * filter() returns a sub fleet, without any API call
+
+    :Example:
+    >>> fleet = ppaas.Fleet()
+    >>> fleet
+    <Fleet of 40 masters>
+    >>> fleet.find_certificate('web1.maurice.fr')
+    <Agent Certificate web1.maurice.fr@0e85b81f-5a29-4e2b-a46c-e024049acb07>
+    >>> fleet.filter(source='git@github.com:puppet/puppet.git').refresh()
+    <Bulk refresh report: 12 succeeded, 0 failed>
+    """
+    def __init__(self, masters=None, client=None, max_workers=DEFAULT_MAX_WORKERS):
+        """Creates a new fleet
+
+        :param masters: The masters of the fleet, all your masters if empty
+        :type masters: list of ppaas.Master
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
+        :param max_workers: Maximum number of masters operated on at the same time
+        :type max_workers: int
+        """
+        if not client:
+            client = get_default_client()
+        if masters is None:
+            masters = Master.get_masters(client)
+        self.client = client
+        self.masters = list(masters)
+        self.max_workers = max_workers
+
+    def filter(self, predicate=None, **fields):
+        """Returns the fleet of the masters matching some criteria
+
+        :param predicate: Only keep the masters for which predicate(master) is true
+        :type predicate: callable
+        :param fields: Only keep the masters having these field values, like name='master1'
+        :type fields: dict
+
+        :rtype: ppaas.Fleet
+        """
+        masters = [
+            master for master in self.masters
+            if all(getattr(master, field, None) == value for field, value in fields.items())
+            and (predicate is None or predicate(master))
+        ]
+        return Fleet(masters, self.client, self.max_workers)
+
+    def imap(self, operation):
+        """Runs an operation on every master, yielding the results as they complete
+
+        Breaking out of the loop cancels the operations not started yet.
+
+        :param operation: Callable taking a ppaas.Master
+        :type operation: callable
+
+        :return: The results, keyed by master
+        :rtype: generator of ppaas.bulk.BulkResult
+        """
+        return iter_bulk(self.masters, operation, max_workers=self.max_workers)
+
+    def map(self, operation, action='map'):
+        """Runs an operation on every master and collects the results
+
+        :param operation: Callable taking a ppaas.Master
+        :type operation: callable
+        :param action: Name of the operation, for the report
+        :type action: str
+
+        :return: The per master report
+        :rtype: ppaas.bulk.BulkReport
+        """
+        report = BulkReport(action)
+        for result in self.imap(operation):
+            report.add(result)
+        return report
+
+    def find_certificate(self, hostname):
+        """Finds which master holds the certificate of an agent
+
+        Every master is asked for this single certificate, no listing is
+        downloaded, and the search stops at the first master holding it.
+
+        :param hostname: The hostname of the agent
+        :type hostname: str
+
+        :return: The certificate (its `master` attribute is the master), or None
+        :rtype: ppaas.Certificate
+        """
+        def lookup(master):
+            try:
+                return master.certificate(hostname)
+            except ResourceNotFoundError:
+                return None
+
+        results = self.imap(lookup)
+        try:
+            for result in results:
+                if result.ok and result.result is not None:
+                    return result.result
+        finally:
+            results.close()
+        return None
+
+    def get_certificates(self, status=None):
+        """Lists the certificates of every master
+
+        :param status: Only return the certificates with this status
+        :type status: str
+
+        :return: The per master report, results are lists of ppaas.Certificate
+        :rtype: ppaas.bulk.BulkReport
+        """
+        return self.map(lambda master: master.get_certificates(status), 'get_certificates')
+
+    def refresh(self, wait=False, timeout=None):
+        """Refreshes every master
+
+        :param wait: Whether to wait for every master to apply its refresh
+        :type wait: bool
+        :param timeout: When waiting, maximum number of seconds to wait for all of them
+        :type timeout: float
+
+        :return: The per master report, results are ppaas.jobs.Job. A master
+                 refusing the refresh is a failure, and when waiting so is a
+                 job which failed or did not finish in time (JobTimeout).
+        :rtype: ppaas.bulk.BulkReport
+        """
+        return self._run_jobs('refresh', lambda master: master.refresh(), wait, timeout)
+
+    def restart(self, wait=False, timeout=None):
+        """Restarts every master
+
+        :return: The per master report, results are ppaas.jobs.Job
+        :rtype: ppaas.bulk.BulkReport
+
+        .. seealso:: refresh()
+        """
+        return self._run_jobs('restart', lambda master: master.restart(), wait, timeout)
+
+    def rollout(self, action='refresh', **kwargs):
+        """Refreshes, or restarts, the masters of the fleet in waves
+
+        Takes the same arguments as ppaas.rollout.Rollout, see it for the
+        waves, concurrency and abort thresholds.
+
+        :rtype: ppaas.rollout.RolloutReport
+        """
+        from .rollout import Rollout
+        return Rollout(self.masters, action, **kwargs).run()
+
+    def _run_jobs(self, action, start, wait, timeout):
+        def submit(master):
+            job = start(master)
+            if not job:
+                raise job.error
+            return job
+
+        report = self.map(submit, action)
+        if not wait:
+            return report
+        # Every job is polled by the same tracker, waiting for all of them
+        # takes as long as the slowest master
+        started = [result.result for result in report if result.ok]
+        wait_jobs(started, timeout)
+        waited = BulkReport(action)
+        for result in report:
+            job = result.result
+            if not result.ok or job.error is None and job.done():
+                waited.add(result)
+            elif not job.done():
+                waited.add(BulkResult(result.key, error=JobTimeout(
+                    "%s of %s still running after %ss" % (action, result.key.uuid, timeout))))
+            else:
+                waited.add(BulkResult(result.key, error=job.error))
+        return waited
+
+    def environments(self):
+        """Gets the environments of every master
+
+        :return: The per master report, results are dictionaries
+        :rtype: ppaas.bulk.BulkReport
+        """
+        return self.map(lambda master: master.environments, 'environments')
+
+    def __iter__(self):
+        return iter(self.masters)
+
+    def __len__(self):
+        return len(self.masters)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Fleet of %d masters>" % len(self.masters)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import time
+import weakref
+
+
+MASTERS = 'masters'
+CERTIFICATES = 'certificates'
+DEPLOY_KEYS = 'deploy_keys'
+
+
+class IdentityMap(object):
+    """A single object per master, certificate and deploy key of an account.
+
+    This class has the following behavior:
+      * Master.get_masters(), Master.get_master(), master.certificate(),
+        Master.get_certificates(), DeployKey.get_deploy_keys()... return the
+        object already known for a uuid, a (master uuid, hostname) or a
+        name, instead of a new one. Data received from the API on the way
+        is loaded into it, so every holder sees the last known state, but
+        only when it was fetched after what the object already holds: data
+        from an older listing (like the index of Master.get_master()) never
+        overwrites a fresher reload_data().
+      * Masters and deploy keys are held as long as the map lives, there
+        are few of them. Certificates are only held while something else
+        (usually the inventory of their master, see Master.certs) holds
+        them, so tens of thousands of them do not stay in memory for ever.
+      * Objects built directly, like ppaas.Master(uuid), are not registered
+
+    Each ApiClient has its own map, returned by get_identity_map().
+    """
+    def __init__(self):
+        self._maps = {
+            MASTERS: {},
+            DEPLOY_KEYS: {},
+        }
+        # Per master, keyed by hostname: no key tuple per certificate
+        self._certificates = {}
+        self.deploy_keys_listed = False
+        self._lock = threading.Lock()
+
+    def _objects(self, kind, key):
+        if kind != CERTIFICATES:
+            return self._maps[kind], key
+        uuid, hostname = key
+        certificates = self._certificates.get(uuid)
+        if certificates is None:
+            with self._lock:
+                certificates = self._certificates.setdefault(uuid, weakref.WeakValueDictionary())
+        return certificates, hostname
+
+    def get(self, kind, key):
+        """Returns the known object of a kind, or None
+
+        :param kind: MASTERS, CERTIFICATES or DEPLOY_KEYS
+        :type kind: str
+        :param key: The uuid of a master, the (master uuid, hostname) of a certificate, the name of a deploy key
+        """
+        objects, key = self._objects(kind, key)
+        return objects.get(key)
+
+    def resolve(self, kind, key, create, data=None, fetched_at=None):
+        """Returns the known object of a kind, building it if there is none
+
+        :param kind: MASTERS, CERTIFICATES or DEPLOY_KEYS
+        :type kind: str
+        :param key: The uuid of a master, the (master uuid, hostname) of a certificate, the name of a deploy key
+        :param create: Builds the object, called without holding any lock since it may call the API
+        :type create: callable
+        :param data: A representation of the object, the one `create` builds it from
+        :type data: dict
+        :param fetched_at: When `data` was requested from the API. It is only loaded into the known
+                           object when it is not older than what the object was loaded from.
+        :type fetched_at: float
+
+        :return: The single object of this key
+        """
+        objects, key = self._objects(kind, key)
+        known = objects.get(key)
+        if known is None:
+            created = create()
+            if data is not None and fetched_at is not None:
+                created.loaded_at = fetched_at
+            with self._lock:
+                known = objects.get(key)
+                if known is None:
+                    objects[key] = created
+                    return created
+        if data is not None and fetched_at is not None:
+            with self._lock:
+                if fetched_at >= known.loaded_at:
+                    known.reload_data(data)
+                    known.loaded_at = fetched_at
+        return known
+
+    def forget(self, kind, key):
+        """Drops an object, after it was deleted"""
+        objects, key = self._objects(kind, key)
+        with self._lock:
+            objects.pop(key, None)
+
+    def clear(self):
+        """Drops every object, the next traversal builds new ones"""
+        with self._lock:
+            for objects in self._maps.values():
+                objects.clear()
+            self._certificates.clear()
+            self.deploy_keys_listed = False
+
+    def __len__(self):
+        return sum(len(objects) for objects in self._maps.values()) + self._count_certificates()
+
+    def _count_certificates(self):
+        return sum(len(certificates) for certificates in list(self._certificates.values()))
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Identity Map %d masters, %d certificates, %d deploy keys>" % (
+            len(self._maps[MASTERS]), self._count_certificates(), len(self._maps[DEPLOY_KEYS]))
+
+
+def get_identity_map(client):
+    """Returns the identity map of a client
+
+    Each client has its own, objects are bound to the client which built
+    them: the process-wide client (see ppaas.client.get_default_client())
+    shares a single map between every caller.
+
+    :param client: The client
+    :type client: ppaas.ApiClient
+
+    :rtype: ppaas.identity.IdentityMap
+    """
+    return client.identity
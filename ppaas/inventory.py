@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import bisect
+import threading
+
+from datetime import date, datetime, timedelta
+
+from .certificate import Certificate
+from .records import parse_timestamp
+
+
+def _parse_bound(value):
+    """Parses a bound of a time range
+
+    :return: The bound as a datetime, and whether it is a date alone
+    :rtype: tuple
+
+    :raises ValueError: When the bound is not a valid timestamp
+    """
+    if isinstance(value, datetime):
+        return value, False
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day), True
+    parsed = parse_timestamp(value)
+    if not isinstance(parsed, datetime):
+        raise ValueError("Invalid timestamp %r" % (value,))
+    return parsed, len(value) == len('YYYY-MM-DD')
+
+
+class CertificateInventory(object):
+    """Indexed, in memory view of the certificates of a master.
+
+    This class has the following behavior:
+      * It is built from a single GET of /masters/<masterId>/certs, then every
+        lookup (by hostname, status or fingerprint) is a dictionary lookup
+        and never hits the API
+      * Range queries on `created_at` and `signed_at` are answered from
+        sorted indexes
+      * The certificates it holds keep it up to date: a successful sign(),
+        revoke() or delete() updates the indexes in place
+      * invalidate() drops everything, the next lookup reloads the list
+
+    :Example:
+    >>> inventory = master.get_inventory()
+    >>> 'machine.maurice.fr' in inventory
+    True
+    >>> inventory.by_status("SIGNATURE PENDING")
+    [<Agent Certificate machine.maurice.fr@0e85b81f-5a29-4e2b-a46c-e024049acb07>]
+    >>> inventory.created_between("2016-02-01", "2016-03-01")
+    [<Agent Certificate machine.maurice.fr@0e85b81f-5a29-4e2b-a46c-e024049acb07>]
+    """
+    def __init__(self, master, client=None):
+        """Creates the inventory of a master, the list is loaded lazily
+
+        :param master: The master to index the certificates of
+        :type master: ppaas.Master
+        :param client: The ApiClient to use, if empty the one of the master is used
+        :type client: ppaas.ApiClient
+        """
+        self.master = master
+        self.client = client or master.client
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._by_hostname = {}
+        self._by_status_code = {}
+        self._by_status_message = {}
+        self._by_fingerprint = {}
+        self._ranges = {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        """(Re)loads the whole inventory with a single API call"""
+        certificates = Certificate.get_certificates(self.master, self.client)
+        with self._lock:
+            self._reset()
+            for certificate in certificates:
+                certificate.inventory = self
+                self._index(certificate)
+            self._loaded = True
+
+    def invalidate(self):
+        """Drops the indexes, the next lookup will reload the inventory"""
+        with self._lock:
+            self._loaded = False
+            self._reset()
+
+    def _index(self, certificate):
+        hostname = certificate.hostname
+        self._by_hostname[hostname] = certificate
+        status = certificate.status
+        if status is not None:
+            self._by_status_code.setdefault(status.code, {})[hostname] = certificate
+            self._by_status_message.setdefault(status.message, {})[hostname] = certificate
+        if certificate.fingerprint:
+            self._by_fingerprint[certificate.fingerprint] = certificate
+        self._ranges = {}
+
+    def _unindex(self, hostname):
+        certificate = self._by_hostname.pop(hostname, None)
+        if certificate is None:
+            return None
+        for index in (self._by_status_code, self._by_status_message):
+            for bucket in index.values():
+                bucket.pop(hostname, None)
+        fingerprint = certificate.fingerprint
+        if self._by_fingerprint.get(fingerprint) is certificate:
+            del self._by_fingerprint[fingerprint]
+        self._ranges = {}
+        return certificate
+
+    def update(self, certificate):
+        """Reindexes a certificate after its data changed
+
+        :param certificate: The certificate to reindex
+        :type certificate: ppaas.Certificate
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            self._unindex(certificate.hostname)
+            certificate.inventory = self
+            self._index(certificate)
+
+    def remove(self, hostname):
+        """Removes a certificate from the inventory
+
+        :param hostname: The hostname of the certificate
+        :type hostname: str
+        """
+        with self._lock:
+            self._unindex(hostname)
+
+    def get(self, hostname, default=None):
+        """Gets a certificate by hostname
+
+        :param hostname: The hostname of the agent
+        :type hostname: str
+
+        :return: The certificate, or `default`
+        :rtype: ppaas.Certificate
+        """
+        self._ensure_loaded()
+        return self._by_hostname.get(hostname, default)
+
+    def by_fingerprint(self, fingerprint):
+        """Gets a certificate by fingerprint
+
+        :param fingerprint: The fingerprint, like "A7:DA:BE:17:09:9E:18:7D:E6:24:25:7C:65:48:EF"
+        :type fingerprint: str
+
+        :return: The certificate, or None
+        :rtype: ppaas.Certificate
+        """
+        self._ensure_loaded()
+        return self._by_fingerprint.get(fingerprint)
+
+    def by_status(self, status):
+        """Gets the certificates with a given status
+
+        :param status: The status code (0, 1, 2) or message ("SIGNATURE PENDING", "SIGNED", "REVOKED")
+        :type status: int or str
+
+        :return: The matching certificates
+        :rtype: List of ppaas.Certificate
+        """
+        self._ensure_loaded()
+        index = self._by_status_code if isinstance(status, int) else self._by_status_message
+        return list(index.get(status, {}).values())
+
+    def _range(self, field, start, end):
+        self._ensure_loaded()
+        with self._lock:
+            entries = self._ranges.get(field)
+            if entries is None:
+                entries = sorted(
+                    (getattr(cert, field), hostname)
+                    for hostname, cert in self._by_hostname.items()
+                    if isinstance(getattr(cert, field), datetime)
+                )
+                self._ranges[field] = entries
+            low = 0 if start is None else bisect.bisect_left(entries, (_parse_bound(start)[0],))
+            if end is None:
+                high = len(entries)
+            else:
+                end, whole_day = _parse_bound(end)
+                if whole_day:
+                    high = bisect.bisect_left(entries, (end + timedelta(days=1),))
+                else:
+                    # "\xff" sorts after every hostname, so the upper bound is inclusive
+                    high = bisect.bisect_right(entries, (end, u'\xff'))
+            return [self._by_hostname[hostname] for _, hostname in entries[low:high]]
+
+    def created_between(self, start=None, end=None):
+        """Gets the certificates created in a time range, bounds included
+
+        A date alone, like "2016-02-01", starts at the beginning of that day
+        as a lower bound, and lasts until the end of that day as an upper one.
+
+        :param start: Lower bound, or None for no bound
+        :type start: str, datetime.date or datetime.datetime
+        :param end: Upper bound, or None for no bound
+        :type end: str, datetime.date or datetime.datetime
+
+        :return: The matching certificates, oldest first
+        :rtype: List of ppaas.Certificate
+
+        :raises ValueError: When a bound is not a valid timestamp
+        """
+        return self._range('created_at', start, end)
+
+    def signed_between(self, start=None, end=None):
+        """Gets the certificates signed in a time range, bounds included
+
+        .. seealso:: created_between()
+        """
+        return self._range('signed_at', start, end)
+
+    def __contains__(self, hostname):
+        self._ensure_loaded()
+        return hostname in self._by_hostname
+
+    def __getitem__(self, hostname):
+        self._ensure_loaded()
+        return self._by_hostname[hostname]
+
+    def __iter__(self):
+        self._ensure_loaded()
+        return iter(list(self._by_hostname.values()))
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._by_hostname)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Certificate Inventory %s>" % self.master.uuid
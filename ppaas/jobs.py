@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import heapq
+import threading
+import time
+
+from concurrent.futures import ALL_COMPLETED, Future, wait as wait_futures
+
+from .bulk import DEFAULT_MAX_WORKERS, iter_bulk
+from .client import JobTimeout, ResourceNotFoundError
+
+
+REFRESH = 'refresh'
+RESTART = 'restart'
+
+# Status code of a master applying a refresh or a restart
+DEPLOYING = 0
+
+DEFAULT_MIN_INTERVAL = 0.5
+DEFAULT_MAX_INTERVAL = 10
+DEFAULT_BACKOFF = 1.5
+DEFAULT_MAX_DURATION = 900
+
+
+class Job(object):
+    """A refresh or a restart of a master, done once the master applied it.
+
+    This class has the following behavior:
+      * A refresh or a restart is done once the master stopped deploying
+        after either its last update moved past the one read before asking
+        for it, or it was seen deploying: a refresh finding nothing new to
+        deploy leaves the last update as it was.
+      * The job is followed by a ppaas.jobs.JobTracker, it never calls the
+        API itself: wait() and result() block on its future
+      * It can be awaited from asyncio, and is true if the API accepted
+        the action, like the boolean Master.refresh() used to return
+
+    :Example:
+    >>> job = master.refresh()
+    >>> job
+    <Job refresh 0e85b81f-5a29-4e2b-a46c-e024049acb07 running>
+    >>> job.wait(60)
+    True
+    >>> job.result()
+    '2015-12-07T13:42:02'
+    """
+    __slots__ = ('master', 'action', 'baseline', 'started', 'finished', 'future',
+                 'accepted', 'seen_deploying', 'last_update', 'status', 'last_error')
+
+    def __init__(self, master, action, baseline=None):
+        """Creates a job for an action the API accepted
+
+        :param master: The master the action was sent to
+        :type master: ppaas.Master
+        :param action: REFRESH or RESTART
+        :type action: str
+        :param baseline: The last update of the master before the action
+        :type baseline: str
+        """
+        self.master = master
+        self.action = action
+        self.baseline = baseline
+        self.started = time.time()
+        self.finished = None
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.accepted = True
+        self.seen_deploying = False
+        self.last_update = baseline
+        self.status = None
+        self.last_error = None
+
+    @classmethod
+    def rejected(cls, master, action, error):
+        """Returns an already failed job, for an action the API refused
+
+        :param error: The exception raised when sending the action
+        :type error: Exception
+
+        :rtype: ppaas.jobs.Job
+        """
+        job = cls(master, action)
+        job.accepted = False
+        job._finish(error=error)
+        return job
+
+    def observe(self, last_update, status=None):
+        """Updates the job with a poll of its master
+
+        :param last_update: The last update of the master
+        :type last_update: str
+        :param status: The status code of the master, None if it was not fetched
+        :type status: int
+
+        :return: Whether the job is done
+        :rtype: bool
+        """
+        self.last_update = last_update
+        if status is not None:
+            self.status = status
+            if status == DEPLOYING:
+                self.seen_deploying = True
+        if status is None or status == DEPLOYING:
+            return False
+        moved = last_update != self.baseline
+        if moved or self.seen_deploying:
+            self._finish(last_update)
+            return True
+        return False
+
+    def _finish(self, result=None, error=None):
+        self.finished = time.time()
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+    def done(self):
+        """Whether the job is finished, successfully or not
+
+        :rtype: bool
+        """
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        """Waits for the job to finish
+
+        :param timeout: Maximum number of seconds to wait, forever if empty
+        :type timeout: float
+
+        :return: Whether the job is finished
+        :rtype: bool
+        """
+        done, _ = wait_futures([self.future], timeout)
+        return bool(done)
+
+    def result(self, timeout=None):
+        """Waits for the job and returns the new last update of the master
+
+        Raises the error of the job if it failed, like JobTimeout, or
+        concurrent.futures.TimeoutError if it is not finished in time.
+
+        :rtype: str
+        """
+        return self.future.result(timeout)
+
+    @property
+    def error(self):
+        """The exception the job failed with, None if it is not finished or succeeded"""
+        if not self.future.done():
+            return None
+        return self.future.exception()
+
+    @property
+    def duration(self):
+        """Seconds the job took, or has been running for
+
+        :rtype: float
+        """
+        return (self.finished or time.time()) - self.started
+
+    def add_done_callback(self, callback):
+        """Calls `callback(job)` once the job is finished, right away if it already is"""
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def __await__(self):
+        import asyncio
+        return asyncio.wrap_future(self.future).__await__()
+
+    def __bool__(self):
+        return self.accepted
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        """String representation of the object"""
+        if not self.done():
+            state = 'running'
+        elif self.error is not None:
+            state = type(self.error).__name__
+        else:
+            state = 'done'
+        return "<Job %s %s %s>" % (self.action, self.master.uuid, state)
+
+
+class JobTracker(object):
+    """Follows the pending refresh and restart jobs of many masters.
+
+    This class has the following behavior:
+      * Jobs are polled by a single background thread, started when a job
+        is tracked and stopping once none is left. The masters due for a
+        poll are polled concurrently, and a master with several pending
+        jobs is polled once for all of them.
+      * A poll revalidates the last update of the master, a conditional
+        request costing a 304 while nothing changes. The master itself is
+        only fetched when a job needs its status.
+      * Every master is polled on its own adaptive interval, starting at
+        `min_interval`, multiplied by `backoff` after every poll where
+        nothing changed, up to `max_interval`
+      * A job still running after `max_duration` seconds fails with
+        ppaas.client.JobTimeout. Poll errors are retried on the next poll,
+        except a master which disappeared, which fails its jobs.
+
+    The tracker of a client is returned by get_job_tracker(), it is used by
+    Master.refresh() and Master.restart().
+    """
+    def __init__(self, client, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 backoff=DEFAULT_BACKOFF, max_duration=DEFAULT_MAX_DURATION, max_workers=DEFAULT_MAX_WORKERS):
+        """Creates a new tracker
+
+        :param client: The client to poll the masters with
+        :type client: ppaas.ApiClient
+        :param min_interval: Minimum delay between two polls of a master, in seconds
+        :type min_interval: float
+        :param max_interval: Maximum delay between two polls of a master, in seconds
+        :type max_interval: float
+        :param backoff: Factor applied to the interval of a master after a poll without change
+        :type backoff: float
+        :param max_duration: Seconds after which a job still running fails
+        :type max_duration: float
+        :param max_workers: Maximum number of masters polled at the same time
+        :type max_workers: int
+        """
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_duration = max_duration
+        self.max_workers = max_workers
+        self._jobs = {}
+        self._masters = {}
+        self._intervals = {}
+        self._queue = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _last_update(self, master):
+        data, _ = self.client.get('/masters/%s/last-update' % master.uuid, cache=False)
+        return data['result']
+
+    def submit(self, master, action):
+        """Sends a refresh or a restart and tracks it
+
+        :param master: The master
+        :type master: ppaas.Master
+        :param action: REFRESH or RESTART
+        :type action: str
+
+        :return: The job, already failed if the API refused the action
+        :rtype: ppaas.jobs.Job
+        """
+        try:
+            baseline = self._last_update(master)
+        except ResourceNotFoundError:
+            # Never updated yet, any last update will do
+            baseline = None
+        except Exception as error:
+            return Job.rejected(master, action, error)
+        try:
+            self.client.post('/masters/%s/%s' % (master.uuid, action))
+        except Exception as error:
+            return Job.rejected(master, action, error)
+        job = Job(master, action, baseline)
+        self.track(job)
+        return job
+
+    def track(self, job):
+        """Starts following a job
+
+        :type job: ppaas.jobs.Job
+        """
+        uuid = job.master.uuid
+        with self._lock:
+            jobs = self._jobs.get(uuid)
+            if jobs is None:
+                self._jobs[uuid] = jobs = []
+                self._masters[uuid] = job.master
+                self._intervals[uuid] = self.min_interval
+                heapq.heappush(self._queue, (time.time() + self.min_interval, uuid))
+            else:
+                # A new action restarts the fast polling of the master
+                self._intervals[uuid] = self.min_interval
+            jobs.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='ppaas-job-tracker')
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def poll(self, master, jobs):
+        """Polls a master once and updates its jobs
+
+        :param master: The master
+        :type master: ppaas.Master
+        :param jobs: Its pending jobs
+        :type jobs: list of ppaas.jobs.Job
+
+        :return: Whether anything changed since the previous poll
+        :rtype: bool
+        """
+        last_update = self._last_update(master)
+        # The status is the only trace of an action which left the last update as it was
+        data, _ = self.client.get('/masters/%s' % master.uuid, cache=False)
+        status = (data.get('status') or {}).get('code')
+        changed = False
+        for job in jobs:
+            before = (job.last_update, job.status)
+            if job.observe(last_update, status) or (job.last_update, job.status) != before:
+                changed = True
+        return changed
+
+    def run_once(self):
+        """Polls every master which is due, and reschedules those with pending jobs
+
+        :return: Number of seconds until the next master is due, None if no job is left
+        :rtype: float
+        """
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                uuid = heapq.heappop(self._queue)[1]
+                due.append((self._masters[uuid], list(self._jobs[uuid])))
+
+        changes = {}
+        polled = dict((master.uuid, jobs) for master, jobs in due)
+        for result in iter_bulk(due, lambda item: self.poll(*item),
+                                key=lambda item: item[0].uuid, max_workers=self.max_workers):
+            changes[result.key] = result.result if result.ok else False
+            if not result.ok:
+                for job in polled[result.key]:
+                    job.last_error = result.error
+                    if isinstance(result.error, ResourceNotFoundError) and not job.done():
+                        job._finish(error=result.error)
+
+        now = time.time()
+        with self._lock:
+            for master, _ in due:
+                uuid = master.uuid
+                jobs = []
+                for job in self._jobs[uuid]:
+                    if not job.done() and now - job.started > self.max_duration:
+                        job._finish(error=JobTimeout("%s of %s still running after %ds" % (
+                            job.action, uuid, self.max_duration)))
+                    if not job.done():
+                        jobs.append(job)
+                if not jobs:
+                    del self._jobs[uuid], self._masters[uuid], self._intervals[uuid]
+                    continue
+                self._jobs[uuid] = jobs
+                if changes.get(uuid):
+                    interval = self.min_interval
+                else:
+                    interval = min(self.max_interval, self._intervals[uuid] * self.backoff)
+                self._intervals[uuid] = interval
+                heapq.heappush(self._queue, (now + interval, uuid))
+            if not self._queue:
+                return None
+            return max(0, self._queue[0][0] - time.time())
+
+    def run(self):
+        """Polls the masters until no job is left"""
+        while True:
+            delay = self.run_once()
+            with self._lock:
+                if delay is None:
+                    if not self._queue:
+                        self._thread = None
+                        return
+                    # A job was tracked in the meantime
+                    delay = 0
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    @property
+    def pending(self):
+        """The jobs not finished yet
+
+        :rtype: list of ppaas.jobs.Job
+        """
+        with self._lock:
+            return [job for jobs in self._jobs.values() for job in jobs if not job.done()]
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Job Tracker %d masters>" % len(self._jobs)
+
+
+def wait_jobs(jobs, timeout=None, return_when=ALL_COMPLETED):
+    """Waits for many jobs, like concurrent.futures.wait
+
+    :param jobs: The jobs
+    :type jobs: iterable of ppaas.jobs.Job
+    :param timeout: Maximum number of seconds to wait, forever if empty
+    :type timeout: float
+    :param return_when: When to return, concurrent.futures.ALL_COMPLETED, FIRST_COMPLETED or FIRST_EXCEPTION
+    :type return_when: str
+
+    :return: The finished jobs and the pending ones
+    :rtype: tuple of (set, set)
+    """
+    jobs = dict((job.future, job) for job in jobs)
+    done, pending = wait_futures(list(jobs), timeout, return_when)
+    return set(jobs[future] for future in done), set(jobs[future] for future in pending)
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_job_tracker(client):
+    """Returns the job tracker shared by the masters of the account a client is logged on
+
+    :param client: The client
+    :type client: ppaas.ApiClient
+
+    :rtype: ppaas.jobs.JobTracker
+    """
+    key = (client.endpoint, client.user)
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = _trackers[key] = JobTracker(client)
+        return tracker
@@ -14,9 +14,19 @@
 """
 
 import json
+import threading
+import time
 
-from .client import ApiClient
+from .bulk import DEFAULT_MAX_WORKERS, BulkReport, BulkResult, run_bulk
+from .cache import copy_response
+from .client import get_default_client, ResourceNotFoundError
+from .crl import get_crl_index
 from .certificate import Certificate
+from .identity import MASTERS, get_identity_map
+from .inventory import CertificateInventory
+from .jobs import REFRESH, RESTART, get_job_tracker
+from .records import CertificateRecord, MasterRecord
+from .streaming import iter_pages
 
 
 def pretty_print(d):
@@ -31,20 +41,99 @@ def pretty_print(d):
     return json.dumps(d, sort_keys=True, indent=4, separators=(',', ': '))
 
 
-class Master(object):
+DEFAULT_INDEX_TTL = 60
+
+
+class MasterIndex(object):
+    """Index of the masters of an account by name
+
+    It holds the representation of every master as returned by the /masters
+    listing, so resolving a name costs no request while the index is fresh.
+    It is refreshed by every Master.get_masters() call and invalidated by
+    Master.create_master().
+    """
+    def __init__(self, ttl=DEFAULT_INDEX_TTL):
+        """Creates an empty index
+
+        :param ttl: Number of seconds the index is trusted after a refresh
+        :type ttl: int
+        """
+        self.ttl = ttl
+        self._by_name = {}
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    @property
+    def fresh(self):
+        """Whether the index can be trusted without listing the masters again"""
+        return time.time() < self._expires
+
+    def update(self, masters, fetched_at=None):
+        """Replaces the index content with a fresh /masters listing
+
+        :param masters: The representations of every master
+        :type masters: list of dict
+        :param fetched_at: When the listing was requested, now if empty
+        :type fetched_at: float
+        """
+        by_name = dict((master['name'], (master, fetched_at or time.time())) for master in masters)
+        with self._lock:
+            self._by_name = by_name
+            self._expires = time.time() + self.ttl
+
+    def lookup(self, name):
+        """Gets the representation of a master by name
+
+        :return: The representation, or None
+        :rtype: dict
+        """
+        return self.entry(name)[0]
+
+    def entry(self, name):
+        """Gets the representation of a master by name, with the time it was listed at
+
+        :return: The representation and the time of the listing, (None, None) if unknown
+        :rtype: tuple
+        """
+        return self._by_name.get(name, (None, None))
+
+    def invalidate(self):
+        """Forces the next lookup to list the masters again"""
+        with self._lock:
+            self._expires = 0
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_master_index(client):
+    """Returns the master index of the account a client is logged on
+
+    :param client: The client
+    :type client: ppaas.ApiClient
+
+    :rtype: ppaas.master.MasterIndex
+    """
+    key = (client.endpoint, client.user)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = MasterIndex()
+        return index
+
+
+class Master(MasterRecord):
     """Interface for the /masters/<masterId> endpoints.
 
     This class allows you to interract with your Puppet Masters
 
     This class has the following behavior:
-      * When loaded it will cache some data in self.cached_data (it will
-        cache its json representation according to the API)
-      * Everytime you want to get data from the object, like certificate.fingerprint,
-        the cache will be used, so make sure to call reload_datas if updates has been done.
-      * Dictionnary lookup is done via the __getattr__ overloaded method. It
-        is a bit hacky but it does the job. For instance to get the hostname
-        of your master, you can type `master.hostname`, this will query the
-        cached value in the object
+      * When loaded the fields of its json representation according to the API
+        are parsed once and stored in slots (see ppaas.records.MasterRecord)
+      * Everytime you want to get data from the object, like master.hostname,
+        the loaded value will be used, so make sure to call reload_data if updates has been done.
+      * Fields unknown to the record class are still readable as attributes
 
 
     An example json representation of what this class may look like :
@@ -73,13 +162,17 @@ class Master(object):
             "vars": {}
         }
     """
-    def __init__(self, uuid, cached_data=None):
+    __slots__ = ('client', 'uuid', 'inventory', 'loaded_at', '__weakref__')
+
+    def __init__(self, uuid, cached_data=None, client=None):
         """Creates a new object representing an *existing* puppet master
 
         :param uuid: UUID of the master
         :type uuid: str
         :param cached_data: Cached data to instantiate the master
         :type cached_data: dict
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
 
 
         :Example:
@@ -90,21 +183,22 @@ class Master(object):
 
         .. seealso:: get_masters()
         """
-        self.client = ApiClient()
+        self.client = client or get_default_client()
         self.uuid = uuid
+        self.inventory = None
         self.reload_data(cached_data)
 
     def reload_data(self, refreshed_datas=None):
-        """Reloads datas in the cached_data properties of the pupet master
+        """Reloads the fields of the pupet master
 
-        :param refreshed_datas: Data to use to reload cached_data property of master
+        :param refreshed_datas: Data to reload the master from, if empty it is fetched from the API
         :type refreshed_datas: dict
 
         """
-        if refreshed_datas:
-            self.cached_data = refreshed_datas
-        else:
-            self.cached_data, _ = self.client.get('/masters/%s' % self.uuid)
+        self.loaded_at = time.time()
+        if not refreshed_datas:
+            refreshed_datas, _ = self.client.get('/masters/%s' % self.uuid)
+        self.load(refreshed_datas)
 
     @staticmethod
     def create_master(name, source, deploy_key, vars={}, nb=1, type=None, hierarchy=[], hieras=[], client=None):
@@ -124,7 +218,7 @@ class Master(object):
         :type hierarchy: list
         :param hieras: Array of hiera backend
         :type hieras: list
-        :param client: A client object you want to pass, if empty a new one will be created
+        :param client: A client object you want to pass, if empty the shared one will be used
         :type client: ppaas.ApiClient
 
         :return: The newly created puppet master
@@ -143,16 +237,42 @@ class Master(object):
             payload["type"] = type
 
         if not client:
-            client = ApiClient()
+            client = get_default_client()
 
+        fetched_at = time.time()
         result, _ = client.post("/masters", data=payload)
-        return Master(result["id"], result)
+        get_master_index(client).invalidate()
+        return Master._resolve(result, client, fetched_at)
+
+    @staticmethod
+    def resolve(uuid, client=None):
+        """Returns the single Master object of an uuid
+
+        The master already known to the client is returned without any API
+        call, see ppaas.identity.IdentityMap. Otherwise it is loaded.
+
+        :param uuid: The uuid of the master
+        :type uuid: str
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
+
+        :rtype: ppaas.Master
+        """
+        if not client:
+            client = get_default_client()
+        return get_identity_map(client).resolve(MASTERS, uuid, lambda: Master(uuid, None, client))
+
+    @staticmethod
+    def _resolve(data, client, fetched_at):
+        """Returns the single Master object of a representation, see ppaas.identity.IdentityMap"""
+        return get_identity_map(client).resolve(
+            MASTERS, data['id'], lambda: Master(data['id'], data, client), data, fetched_at)
 
     @staticmethod
     def get_masters(client=None):
         """Retrieves all your puppet masters
 
-        :param client: A client object you want to pass, if empty a new one will be created
+        :param client: A client object you want to pass, if empty the shared one will be used
         :type client: ppaas.ApiClient
 
         :return: The list of your puppet masters
@@ -164,19 +284,22 @@ class Master(object):
         [<Puppet Master 0e85b81f-5a29-4e2b-a46c-e024049acb07>]
         """
         if not client:
-            client = ApiClient()
+            client = get_default_client()
+        fetched_at = time.time()
         result, status = client.get('/masters')
-        masters = []
-        for master in result['masters']:
-            masters.append(Master(master['id'], master))
-        return masters
+        get_master_index(client).update(result['masters'], fetched_at)
+        return [Master._resolve(master, client, fetched_at) for master in result['masters']]
 
     @staticmethod
     def get_master(name, client=None):
         """Gets a master by name, because who the hell can remember uuids ?
 
+        Names are resolved through an index of the masters which is refreshed
+        at most every DEFAULT_INDEX_TTL seconds, so repeated lookups do not
+        cost any request.
+
         :param name: Name of the Puppet Master you want to retrieve
-        :param client: A client object you want to pass, if empty a new one will be created
+        :param client: A client object you want to pass, if empty the shared one will be used
         :type name: str
         :type client: ppaas.ApiClient
 
@@ -189,12 +312,18 @@ class Master(object):
         <Puppet Master 0e85b81f-5a29-4e2b-a46c-e024049acb07>
         """
         if not client:
-            client = ApiClient()
-        masters = Master.get_masters(client)
-        for master in masters:
-            if master.cached_data['name'] == name:
-                return master
-        return None
+            client = get_default_client()
+        index = get_master_index(client)
+        data, fetched_at = index.entry(name) if index.fresh else (None, None)
+        if data is None:
+            fetched_at = time.time()
+            result, status = client.get('/masters')
+            index.update(result['masters'], fetched_at)
+            data = index.lookup(name)
+            if data is None:
+                return None
+        # The listing of the index is only loaded into a master reloaded before it
+        return Master._resolve(data, client, fetched_at)
 
     def get_certificates(self, status=None):
         """Returns all the certificates attached to a master
@@ -221,6 +350,122 @@ class Master(object):
         else:
             return [cert for cert in certificates if cert.status['message'] == status]
 
+    def iter_certificates(self, status=None, hostname_prefix=None):
+        """Lazily iterates over the certificates attached to a master
+
+        Unlike get_certificates(), the listing is decoded incrementally while
+        it is downloaded and the filters are applied before anything is built,
+        so memory usage does not depend on the number of agents. Breaking out
+        of the loop stops the download. Server side pagination is followed
+        when the API provides it.
+
+        :param status: Only yield the certificates with this status, like "SIGNATURE PENDING"
+        :type status: str
+        :param hostname_prefix: Only yield the certificates whose hostname starts with it
+        :type hostname_prefix: str
+
+        :return: The certificates, as lightweight records not bound to any client
+        :rtype: generator of ppaas.records.CertificateRecord
+
+        :Example:
+        >>> next(master.iter_certificates(status="SIGNATURE PENDING", hostname_prefix="web"))
+        <Certificate Record web1.maurice.fr>
+        """
+        for certificate in iter_pages(self.client, '/masters/%s/certs' % self.uuid, 'certs'):
+            if status is not None and certificate['status']['message'] != status:
+                continue
+            if hostname_prefix is not None and not certificate['hostname'].startswith(hostname_prefix):
+                continue
+            yield CertificateRecord.from_dict(certificate)
+
+    def _select_certificates(self, action, status, hostnames, predicate):
+        """Selects the certificates targeted by a bulk operation
+
+        Costs a single GET of the certificate list whatever the selection.
+
+        :return: The selected certificates, and a report holding the
+                 requested hostnames which do not exist on the master
+        :rtype: tuple(list of ppaas.Certificate, ppaas.bulk.BulkReport)
+        """
+        if callable(hostnames) and predicate is None:
+            hostnames, predicate = None, hostnames
+        report = BulkReport(action)
+        certificates = self.get_certificates(status=status if hostnames is None else None)
+        if hostnames is not None:
+            by_hostname = dict((cert.hostname, cert) for cert in certificates)
+            certificates = []
+            for hostname in hostnames:
+                if hostname in by_hostname:
+                    certificates.append(by_hostname[hostname])
+                else:
+                    report.add(BulkResult(hostname, error=ResourceNotFoundError(
+                        "No certificate for %s on master %s" % (hostname, self.uuid))))
+        if predicate is not None:
+            certificates = [cert for cert in certificates if predicate(cert)]
+        for certificate in certificates:
+            certificate.inventory = self.inventory
+        return certificates, report
+
+    def sign_certificates(self, hostnames=None, predicate=None, max_workers=DEFAULT_MAX_WORKERS, reload=False):
+        """Signs many certificates in parallel
+
+        Certificates can be selected by hostname, by a predicate taking a
+        ppaas.Certificate, or both. Without any selection every certificate
+        pending signature is signed.
+
+        :param hostnames: Hostnames of the certificates to sign, or a predicate
+        :type hostnames: list of str, or callable
+        :param predicate: Only certificates for which predicate(cert) is true are signed
+        :type predicate: callable
+        :param max_workers: Maximum number of signatures running at the same time
+        :type max_workers: int
+        :param reload: Whether to reload every certificate once signed (costs a GET each)
+        :type reload: bool
+
+        :return: The per hostname report
+        :rtype: ppaas.bulk.BulkReport
+
+        :Example:
+        >>> master.sign_certificates()
+        <Bulk sign report: 2000 succeeded, 0 failed>
+        >>> master.sign_certificates(['web1.domain.tld', 'web2.domain.tld'])
+        <Bulk sign report: 1 succeeded, 1 failed>
+        """
+        certificates, report = self._select_certificates('sign', "SIGNATURE PENDING", hostnames, predicate)
+        return run_bulk('sign', certificates, lambda cert: cert.sign(reload=reload),
+                        key=lambda cert: cert.hostname, max_workers=max_workers, report=report)
+
+    def revoke_certificates(self, hostnames=None, predicate=None, max_workers=DEFAULT_MAX_WORKERS, reload=False):
+        """Revokes many certificates in parallel
+
+        Works like sign_certificates(), without any selection every signed
+        certificate is revoked.
+
+        :return: The per hostname report
+        :rtype: ppaas.bulk.BulkReport
+
+        .. seealso:: sign_certificates()
+        """
+        certificates, report = self._select_certificates('revoke', "SIGNED", hostnames, predicate)
+        return run_bulk('revoke', certificates, lambda cert: cert.revoke(reload=reload),
+                        key=lambda cert: cert.hostname, max_workers=max_workers, report=report)
+
+    def delete_certificates(self, hostnames=None, predicate=None, max_workers=DEFAULT_MAX_WORKERS):
+        """Deletes many certificates in parallel
+
+        Works like sign_certificates(), without any selection every
+        certificate of the master is deleted.
+
+        :return: The per hostname report
+        :rtype: ppaas.bulk.BulkReport
+
+        .. seealso:: sign_certificates()
+        .. warnings:: This action is irreversible.
+        """
+        certificates, report = self._select_certificates('delete', None, hostnames, predicate)
+        return run_bulk('delete', certificates, lambda cert: cert.delete(),
+                        key=lambda cert: cert.hostname, max_workers=max_workers, report=report)
+
     def __repr__(self):
         """String representation of the object"""
         return "<Puppet Master %s>" % self.uuid
@@ -230,16 +475,14 @@ class Master(object):
 
         You usually want to do it to trigger the pull of your git repository
 
-        :return: Wether the refresh has been accepted
-        :rtype: boolean
+        :return: The job of the refresh, true if the refresh has been accepted.
+                 wait() on it to know when the master applied it.
+        :rtype: ppaas.jobs.Job
 
-        .. note:: The API can answer False if a refresh is already in progress.
+        .. note:: The API can refuse a refresh if one is already in progress,
+                  the job is then already failed with the error of the API.
         """
-        try:
-            self.client.post('/masters/%s/refresh' % self.uuid)
-            return True
-        except:
-            return False
+        return get_job_tracker(self.client).submit(self, REFRESH)
 
     def restart(self):
         """Asks the master to restart
@@ -247,52 +490,125 @@ class Master(object):
         You usually want to do it when you have edited your hiera or your
         custom puppet functions
 
-        :return: Wether the restart has been accepted
-        :rtype: boolean
+        :return: The job of the restart, true if the restart has been accepted
+        :rtype: ppaas.jobs.Job
+
+        .. seealso:: refresh()
+        """
+        return get_job_tracker(self.client).submit(self, RESTART)
+
+    def get_inventory(self, reload=False):
+        """Returns the indexed inventory of the certificates of the master
+
+        The inventory is built once per master object with a single API call,
+        and then kept up to date by the certificates it holds.
+
+        :param reload: Whether to drop the current inventory and reload it
+        :type reload: bool
+
+        :return: The inventory
+        :rtype: ppaas.CertificateInventory
         """
-        try:
-            self.client.post('/masters/%s/restart' % self.uuid)
-            return True
-        except:
-            return False
+        if self.inventory is None:
+            self.inventory = CertificateInventory(self)
+        elif reload:
+            self.inventory.invalidate()
+        return self.inventory
 
     def certificate(self, hostname):
         """Returns the certificate of a particular hostname
 
+        If the inventory of the master has been loaded (see get_inventory()),
+        the certificate is served from it without any API call.
+
         :param hostname: The hostname you want the certificate of
         :type hostname: str
 
         :return: The ppaas.Certificate object, or raises an exception
         :rtype: ppaas.Certificate
         """
-        return Certificate(self, hostname)
+        if self.inventory is not None:
+            certificate = self.inventory.get(hostname)
+            if certificate is not None:
+                return certificate
+        return Certificate.resolve(self, hostname)
+
+    @property
+    def certs(self):
+        """The certificates of the master, loaded with a single API call on first use
+
+        This is the inventory of the master (see get_inventory()), it can be
+        iterated and indexed by hostname.
+
+        :rtype: ppaas.CertificateInventory
+        """
+        return self.get_inventory()
+
+    @property
+    def deploy_key_obj(self):
+        """The deploy key of the master
+
+        Deploy keys are shared by every master of the account: the first
+        access lists them all with a single API call, see
+        ppaas.identity.IdentityMap.
+
+        :return: The deploy key, None if the master has none
+        :rtype: ppaas.DeployKey
+        """
+        if not self.deploy_key:
+            return None
+        from .deploy_key import DeployKey
+        return DeployKey.resolve(self.deploy_key, self.client)
 
     @property
     def crl(self):
         """Gets the CRL of the master
 
+        The response is cached by the client, see ppaas.ResponseCache
+
         :return: The CRL
         :rtype: str
         """
         data, result = self.client.get('/masters/%s/crl' % self.uuid)
         return data['crl']
 
+    def revocation_list(self):
+        """Gets the parsed CRL of the master
+
+        The CRL is revalidated like `crl` and only parsed again when it
+        changed, see ppaas.CrlIndex
+
+        :return: The revoked serial numbers, with their revocation dates
+        :rtype: ppaas.crl.RevocationList
+
+        :Example:
+        >>> master.revocation_list().is_revoked(master.certificate('web1.maurice.fr').serial_number)
+        False
+        """
+        return get_crl_index(self.client).refresh(self)
+
     @property
     def certificates(self):
         """Gets all the certificates of the master
 
+        The response is cached by the client, see ppaas.ResponseCache. The
+        list is a copy, it can be modified.
+
         :return: The list of the certificates
         :rtype: List of dicts !!!
 
         .. warnings:: Does not return an object, but a dict
         """
         data, result = self.client.get('/masters/%s/certs' % self.uuid)
-        return data['certs']
+        return copy_response(data['certs'])
 
     @property
     def environments(self):
         """Gets the environments
 
+        The response is cached by the client, see ppaas.ResponseCache. The
+        dictionary is a copy, it can be modified.
+
         It can look like :
         .. code-block:: json
             {
@@ -316,7 +632,7 @@ class Master(object):
         :rtype: dictionary
         """
         data, result = self.client.get('/masters/%s/environments' % self.uuid)
-        return data['environments']
+        return copy_response(data['environments'])
 
     @property
     def last_update(self):
@@ -324,41 +640,23 @@ class Master(object):
 
         Can look like: "2015-12-07T13:28:28"
 
+        The response is cached by the client, see ppaas.ResponseCache
+
         :return: Last master update
         :rtype: str
         """
         data, result = self.client.get('/masters/%s/last-update' % self.uuid)
         return data['result']
 
-    def to_dict(self):
+    def to_dict(self, reload=False):
         """Returns the JSON representation of the object"
 
+        :param reload: Whether to fetch it again from the API instead of using the loaded data
+        :type reload: bool
+
         :return: A dictionary containing the object as served by the API
         :rtype: dict
         """
-        result, status = self.client.get('/masters')
-        return result
-
-    def __getattr__(self, name):
-        """Retrieves an attribute of the class.
-
-        This is kind of a hack. We use the __getattr__ method to access fields of the
-        json representation of the class. For instance if my class is represented by
-
-        {
-            "foo": "bar",
-            "lel": true
-        }
-
-        Then obj.foo will return be "bar" eventough the property has not been defined
-        in an explicit way.
-
-        :param name: Name of the attribute you want to retrieve
-        :type name: str
-
-        :return: The value of the field
-        :rtype: Any primitive type
-        """
-        if name in self.cached_data:
-            return self.cached_data[name]
-        return super(Master, self).__getattr__(name)
+        if reload:
+            self.reload_data()
+        return super(Master, self).to_dict()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import re
+import threading
+import time
+
+from bisect import bisect_left
+
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 7.5, 10, 30, 60)
+
+# Segments following these collections are identifiers, they are replaced
+# by a placeholder in templated paths so that every master, agent or deploy
+# key shares the same metrics.
+_PATH_PARAMETERS = (
+    (re.compile(r'/masters/[^/]+'), '/masters/{id}'),
+    (re.compile(r'/certs/[^/]+'), '/certs/{host}'),
+    (re.compile(r'/deploy-keys/[^/]+'), '/deploy-keys/{name}'),
+)
+
+_templates = {}
+
+
+def template_path(path):
+    """Returns the templated form of an API path
+
+    :Example:
+    >>> template_path('/masters/0e85b81f/certs/web1.maurice.fr/sign')
+    '/masters/{id}/certs/{host}/sign'
+
+    :param path: The path, with or without the endpoint
+    :type path: str
+
+    :rtype: str
+    """
+    template = _templates.get(path)
+    if template is None:
+        template = path.split('?', 1)[0]
+        if '://' in template:
+            template = '/' + template.split('://', 1)[1].split('/', 1)[-1]
+        for regex, placeholder in _PATH_PARAMETERS:
+            template = regex.sub(placeholder, template)
+        if len(_templates) < 4096:
+            _templates[path] = template
+    return template
+
+
+class RequestInfo(object):
+    """What is known about a single HTTP request, handed to the hooks
+
+    `duration` is the total time of the request as seen by the client,
+    `elapsed` the time until the response headers were received, which
+    covers the name resolution, the connection, the TLS handshake and the
+    processing time of the server. `status` is None and `error` is set when
+    no response was received.
+    """
+    __slots__ = ('method', 'url', 'path', 'started', 'duration', 'elapsed',
+                 'status', 'bytes_sent', 'bytes_received', 'error')
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.path = template_path(url)
+        self.started = time.time()
+        self.duration = None
+        self.elapsed = None
+        self.status = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+
+    def finish(self, response=None, error=None):
+        """Records the outcome of the request"""
+        self.duration = time.time() - self.started
+        self.error = error
+        if response is None:
+            return
+        self.status = response.status_code
+        elapsed = getattr(response, 'elapsed', None)
+        if elapsed is not None:
+            self.elapsed = elapsed.total_seconds()
+        request = getattr(response, 'request', None)
+        body = getattr(request, 'body', None)
+        if body and hasattr(body, '__len__'):
+            self.bytes_sent = len(body)
+        length = response.headers.get('Content-Length')
+        if length is not None:
+            self.bytes_received = int(length)
+        elif getattr(response, '_content_consumed', True):
+            self.bytes_received = len(response.content or b'')
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Request Info %s %s %s>" % (self.method, self.path, self.status)
+
+
+class Histogram(object):
+    """Cumulative latency histogram with fixed buckets
+
+    Quantiles are estimated by linear interpolation inside the bucket they
+    fall in, so their precision is the one of the buckets.
+    """
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimates a quantile, like 0.95 for the p95
+
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                if index == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def cumulative(self):
+        """Returns the (upper bound, cumulative count) pairs, +Inf included
+
+        :rtype: list of tuple
+        """
+        pairs = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def _format_bound(bound):
+    if bound == float('inf'):
+        return '+Inf'
+    return repr(float(bound))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in sorted(labels.items()))
+
+
+class MetricsRecorder(object):
+    """Collects per endpoint metrics of the requests of ApiClient objects.
+
+    This class has the following behavior:
+      * install() registers it as an `after` hook of a client, every HTTP
+        request (retries included) is then recorded under its method and
+        templated path, like /masters/{id}/certs/{host}
+      * Latencies go to a histogram per endpoint, from which the p50, p95 and
+        p99 are estimated, requests are also counted per status and the sent
+        and received bytes are summed
+      * to_prometheus() and to_openmetrics() render the metrics in the text
+        exposition formats of Prometheus and OpenMetrics
+
+    :Example:
+    >>> metrics = ppaas.MetricsRecorder()
+    >>> metrics.install(client)
+    >>> master.certificate('web1.maurice.fr').sign()
+    >>> metrics.summary()
+    {('POST', '/masters/{id}/certs/{host}/sign'): {'count': 1, 'p50': 0.12, ...},
+     ('GET', '/masters/{id}/certs/{host}'): {'count': 1, 'p50': 0.04, ...}}
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='ppaas'):
+        """Creates a new recorder
+
+        :param buckets: Upper bounds of the latency histogram buckets, in seconds
+        :type buckets: tuple of float
+        :param prefix: Prefix of the exported metric names
+        :type prefix: str
+        """
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.histograms = {}
+        self.statuses = {}
+        self.bytes_sent = {}
+        self.bytes_received = {}
+        self._lock = threading.Lock()
+
+    def install(self, client):
+        """Records the requests of a client
+
+        :type client: ppaas.ApiClient
+        """
+        client.add_hook(after=self.record)
+
+    def uninstall(self, client):
+        """Stops recording the requests of a client
+
+        :type client: ppaas.ApiClient
+        """
+        client.remove_hook(after=self.record)
+
+    def record(self, info):
+        """Records a finished request
+
+        :type info: ppaas.metrics.RequestInfo
+        """
+        endpoint = (info.method, info.path)
+        status = str(info.status) if info.status is not None else 'error'
+        with self._lock:
+            histogram = self.histograms.get(endpoint)
+            if histogram is None:
+                histogram = self.histograms[endpoint] = Histogram(self.buckets)
+            histogram.observe(info.duration)
+            key = endpoint + (status,)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            self.bytes_sent[endpoint] = self.bytes_sent.get(endpoint, 0) + info.bytes_sent
+            self.bytes_received[endpoint] = self.bytes_received.get(endpoint, 0) + info.bytes_received
+
+    def quantile(self, q, method, path):
+        """Estimates a latency quantile of an endpoint, in seconds
+
+        :param q: The quantile, like 0.99
+        :type q: float
+        :param method: The HTTP method
+        :type method: str
+        :param path: The templated path, like /masters/{id}/certs
+        :type path: str
+
+        :rtype: float
+        """
+        with self._lock:
+            histogram = self.histograms.get((method, path))
+            return histogram.quantile(q) if histogram is not None else None
+
+    def summary(self):
+        """Returns the count, mean and p50/p95/p99 latencies per endpoint
+
+        :return: A dictionary of (method, path) -> statistics
+        :rtype: dict
+        """
+        with self._lock:
+            return dict((endpoint, {
+                'count': histogram.count,
+                'mean': histogram.sum / histogram.count,
+                'p50': histogram.quantile(0.5),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99),
+                'bytes_sent': self.bytes_sent[endpoint],
+                'bytes_received': self.bytes_received[endpoint],
+            }) for endpoint, histogram in self.histograms.items())
+
+    def reset(self):
+        """Forgets everything recorded so far"""
+        with self._lock:
+            self.histograms.clear()
+            self.statuses.clear()
+            self.bytes_sent.clear()
+            self.bytes_received.clear()
+
+    def _families(self, openmetrics):
+        # OpenMetrics names counter families without their _total suffix
+        suffix = '' if openmetrics else '_total'
+        name = self.prefix + '_requests'
+        requests = ['# HELP %s%s Number of HTTP requests sent to the API' % (name, suffix),
+                    '# TYPE %s%s counter' % (name, suffix)]
+        for (method, path, status), count in sorted(self.statuses.items()):
+            requests.append('%s_total%s %d' % (name, _labels(method=method, path=path, status=status), count))
+
+        name = self.prefix + '_request_duration_seconds'
+        durations = ['# HELP %s Duration of the HTTP requests sent to the API' % name,
+                     '# TYPE %s histogram' % name]
+        for (method, path), histogram in sorted(self.histograms.items()):
+            for bound, count in histogram.cumulative():
+                labels = _labels(method=method, path=path, le=_format_bound(bound))
+                durations.append('%s_bucket%s %d' % (name, labels, count))
+            labels = _labels(method=method, path=path)
+            durations.append('%s_sum%s %r' % (name, labels, histogram.sum))
+            durations.append('%s_count%s %d' % (name, labels, histogram.count))
+
+        transferred = []
+        for direction, totals in (('sent', self.bytes_sent), ('received', self.bytes_received)):
+            name = '%s_%s_bytes' % (self.prefix, direction)
+            transferred.extend(['# HELP %s%s Bytes %s in HTTP bodies' % (name, suffix, direction),
+                                '# TYPE %s%s counter' % (name, suffix)])
+            for (method, path), total in sorted(totals.items()):
+                transferred.append('%s_total%s %d' % (name, _labels(method=method, path=path), total))
+        return requests + durations + transferred
+
+    def to_prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format 0.0.4
+
+        :rtype: str
+        """
+        with self._lock:
+            return '\n'.join(self._families(openmetrics=False)) + '\n'
+
+    def to_openmetrics(self):
+        """Renders the metrics in the OpenMetrics text format
+
+        :rtype: str
+        """
+        with self._lock:
+            return '\n'.join(self._families(openmetrics=True) + ['# EOF']) + '\n'
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Metrics Recorder %d endpoints>" % len(self.histograms)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import io
+import json
+from datetime import datetime, timedelta
+
+from .bulk import DEFAULT_MAX_WORKERS, BulkReport, BulkResult, iter_bulk
+from .client import JobTimeout, ResourceNotFoundError, get_default_client
+from .jobs import DEPLOYING, REFRESH, RESTART, wait_jobs
+from .master import Master
+from .records import parse_timestamp
+from .registry import DeployKeyRegistry
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+CREATE_KEY = 'create_key'
+CREATE = 'create'
+DRIFT = 'drift'
+
+# Fields of a master given to Master.create_master(), and compared with the
+# existing masters
+MASTER_FIELDS = ('source', 'deploy_key', 'nb', 'type', 'vars', 'hierarchy', 'hieras')
+REQUIRED_FIELDS = ('name', 'source', 'deploy_key')
+
+
+def load_desired_state(path):
+    """Reads a desired state file, YAML or JSON
+
+    YAML files (.yml, .yaml) need PyYAML, `pip install ppaas[yaml]`. The
+    file looks like:
+
+    .. code-block:: yaml
+        deploy_keys: [github]
+        masters:
+          - name: master1
+            source: git@github.com:puppet/puppet.git
+            deploy_key: github
+            nb: 2
+            # Refreshed unless its last update is more recent
+            updated_after: 2016-03-01T12:00:00
+          - name: master2
+            source: git@github.com:puppet/hiera.git
+            deploy_key: github
+            updated_after: 2016-03-01T12:00:00
+            update: restart
+
+    :param path: Path of the file
+    :type path: str
+
+    :return: The validated desired state
+    :rtype: dict
+    """
+    with io.open(path, encoding='utf-8') as stream:
+        content = stream.read()
+    if path.endswith(('.yml', '.yaml')):
+        if yaml is None:
+            raise ImportError("PyYAML is needed to read %s, install ppaas[yaml] or use JSON" % path)
+        desired = yaml.safe_load(content)
+    else:
+        desired = json.loads(content)
+    return validate_desired_state(desired)
+
+
+def validate_desired_state(desired):
+    """Checks a desired state and fills in its defaults
+
+    :param desired: The desired state, as read from a file
+    :type desired: dict
+
+    :return: The desired state, with `deploy_keys` and `masters` always set
+    :rtype: dict
+
+    :raises ValueError: When the desired state is malformed
+    """
+    if not isinstance(desired, dict):
+        raise ValueError("The desired state must be a mapping with `masters` and `deploy_keys`")
+    masters = desired.get('masters') or []
+    names = set()
+    for spec in masters:
+        missing = [field for field in REQUIRED_FIELDS if not spec.get(field)]
+        if missing:
+            raise ValueError("Master %s has no %s" % (spec.get('name', '?'), ', '.join(missing)))
+        if spec['name'] in names:
+            raise ValueError("Master %s is declared twice" % spec['name'])
+        names.add(spec['name'])
+        if spec.get('update', REFRESH) not in (REFRESH, RESTART):
+            raise ValueError("Master %s: unknown update %r" % (spec['name'], spec['update']))
+        if spec.get('updated_after') is not None:
+            _timestamp(spec['updated_after'])
+    return {'deploy_keys': list(desired.get('deploy_keys') or []), 'masters': list(masters)}
+
+
+def _timestamp(value):
+    """Converts a timestamp of the API or of a desired state to a naive UTC datetime"""
+    if not isinstance(value, datetime):
+        text = str(value).strip().replace(' ', 'T')
+        offset = None
+        if text.endswith('Z'):
+            text, offset = text[:-1], 0
+        elif len(text) > 19 and text[-6] in '+-' and text[-3] == ':':
+            text, offset = text[:-6], (-1 if text[-6] == '-' else 1) * (int(text[-5:-3]) * 60 + int(text[-2:]))
+        # Dates and the fractional timestamps of /last-update are cut to seconds
+        value = parse_timestamp(text[:19])
+        if not isinstance(value, datetime):
+            raise ValueError("Invalid timestamp %r" % (value,))
+        if offset:
+            value -= timedelta(minutes=offset)
+    elif value.utcoffset() is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+
+class Change(object):
+    """A single step of a reconciliation plan
+
+    `action` is CREATE_KEY, CREATE, REFRESH, RESTART or DRIFT. Drifts are
+    differences the API cannot apply in place: they are reported, never
+    applied.
+    """
+    __slots__ = ('action', 'name', 'spec', 'master', 'fields')
+
+    def __init__(self, action, name, spec=None, master=None, fields=None):
+        self.action = action
+        self.name = name
+        self.spec = spec
+        self.master = master
+        self.fields = fields
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Change %s %s>" % (self.action, self.name)
+
+
+class Plan(object):
+    """Minimal set of changes bringing the account to a desired state
+
+    :Example:
+    >>> plan = reconciler.plan()
+    >>> plan
+    <Reconcile plan: 1 keys, 1 creates, 2 refreshes, 0 restarts, 0 drifts, 47 unchanged>
+    >>> plan.changes
+    [<Change create_key team-web>, <Change create web3>, <Change refresh web1>, <Change refresh web2>]
+    """
+    def __init__(self, changes, unchanged):
+        self.changes = changes
+        self.unchanged = unchanged
+
+    def of(self, action):
+        """Returns the changes of an action
+
+        :rtype: list of ppaas.reconcile.Change
+        """
+        return [change for change in self.changes if change.action == action]
+
+    @property
+    def empty(self):
+        """Whether applying the plan would not do anything"""
+        return not any(change.action != DRIFT for change in self.changes)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Reconcile plan: %d keys, %d creates, %d refreshes, %d restarts, %d drifts, %d unchanged>" % (
+            len(self.of(CREATE_KEY)), len(self.of(CREATE)), len(self.of(REFRESH)), len(self.of(RESTART)),
+            len(self.of(DRIFT)), len(self.unchanged))
+
+
+class Reconciler(object):
+    """Converges the masters and deploy keys of an account to a desired state.
+
+    This class has the following behavior:
+      * plan() lists the masters with a single GET of /masters. The last
+        update of a master is only fetched when the desired state has an
+        `updated_after` for it and the master is not deploying already,
+        through the client so cached responses are used. Deploy keys are
+        only listed when one is wanted that no existing master uses.
+      * Masters missing from the account are created, masters whose last
+        update is older than their `updated_after` are refreshed, or
+        restarted with `update: restart`. Masters of the account absent
+        from the desired state are left alone.
+      * Other differences (source, nb, vars...) cannot be changed in place
+        by the API: they are reported as drifts, and never applied
+      * apply() creates the missing deploy keys first, then creates,
+        refreshes and restarts the masters concurrently. A master whose
+        deploy key could not be created is failed without being created.
+
+    :Example:
+    >>> reconciler = ppaas.Reconciler.from_file('masters.yml')
+    >>> report = reconciler.apply(wait=True)
+    >>> report
+    <Bulk reconcile report: 4 succeeded, 0 failed>
+    """
+    def __init__(self, desired, client=None, max_workers=DEFAULT_MAX_WORKERS):
+        """Prepares a reconciliation
+
+        :param desired: The desired state, see load_desired_state()
+        :type desired: dict
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
+        :param max_workers: Maximum number of changes applied at the same time
+        :type max_workers: int
+        """
+        self.desired = validate_desired_state(desired)
+        self.client = client or get_default_client()
+        self.max_workers = max_workers
+        self.registry = DeployKeyRegistry(self.client, max_workers=max_workers)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Prepares the reconciliation of a desired state file
+
+        :param path: Path of the YAML or JSON file
+        :type path: str
+
+        :rtype: ppaas.reconcile.Reconciler
+        """
+        return cls(load_desired_state(path), **kwargs)
+
+    def plan(self):
+        """Computes the changes to apply
+
+        :rtype: ppaas.reconcile.Plan
+        """
+        masters = dict((master.name, master) for master in Master.get_masters(self.client))
+        changes = []
+        unchanged = []
+
+        # Keys used by existing masters are known to exist without listing them
+        used = set(master.deploy_key for master in masters.values())
+        wanted = list(self.desired['deploy_keys'])
+        wanted.extend(spec['deploy_key'] for spec in self.desired['masters'] if spec['name'] not in masters)
+        for name in wanted:
+            if name not in used and name not in self.registry:
+                changes.append(Change(CREATE_KEY, name))
+                used.add(name)
+
+        for spec in self.desired['masters']:
+            master = masters.get(spec['name'])
+            if master is None:
+                changes.append(Change(CREATE, spec['name'], spec))
+                continue
+            fields = dict((field, (getattr(master, field, None), spec[field]))
+                          for field in MASTER_FIELDS if field in spec and getattr(master, field, None) != spec[field])
+            if fields:
+                changes.append(Change(DRIFT, spec['name'], spec, master, fields))
+            if self._outdated(master, spec):
+                changes.append(Change(spec.get('update', REFRESH), spec['name'], spec, master))
+            elif not fields:
+                unchanged.append(master)
+        return Plan(changes, unchanged)
+
+    def _outdated(self, master, spec):
+        if spec.get('updated_after') is None:
+            return False
+        if (master.status or {}).get('code') == DEPLOYING:
+            # Already applying an update
+            return False
+        try:
+            last_update = master.last_update
+        except ResourceNotFoundError:
+            # Never updated
+            return True
+        if not last_update:
+            return True
+        return _timestamp(last_update) < _timestamp(spec['updated_after'])
+
+    def _apply_change(self, change):
+        if change.action == CREATE:
+            spec = change.spec
+            kwargs = dict((field, spec[field]) for field in MASTER_FIELDS if field in spec)
+            return Master.create_master(spec['name'], client=self.client, **kwargs)
+        job = getattr(change.master, change.action)()
+        if not job:
+            raise job.error
+        return job
+
+    def apply(self, plan=None, wait=False, timeout=None):
+        """Applies a plan
+
+        :param plan: The plan to apply, computed now if empty
+        :type plan: ppaas.reconcile.Plan
+        :param wait: Whether to wait for the refreshes and restarts to be applied by the masters
+        :type wait: bool
+        :param timeout: Maximum number of seconds to wait
+        :type timeout: float
+
+        :return: The per change report, results are the created ppaas.DeployKey and
+                 ppaas.Master, and the ppaas.jobs.Job of the refreshes and restarts
+        :rtype: ppaas.bulk.BulkReport
+        """
+        if plan is None:
+            plan = self.plan()
+        report = BulkReport('reconcile')
+
+        keys = plan.of(CREATE_KEY)
+        failed_keys = {}
+        if keys:
+            created = self.registry.create([change.name for change in keys])
+            for change in keys:
+                result = created[change.name]
+                report.add(BulkResult(change, result=result.result, error=result.error))
+                if not result.ok:
+                    failed_keys[change.name] = result.error
+
+        changes = []
+        for change in plan:
+            if change.action in (CREATE_KEY, DRIFT):
+                continue
+            if change.action == CREATE and change.spec['deploy_key'] in failed_keys:
+                report.add(BulkResult(change, error=failed_keys[change.spec['deploy_key']]))
+                continue
+            changes.append(change)
+        results = dict((result.key, result)
+                       for result in iter_bulk(changes, self._apply_change, max_workers=self.max_workers))
+
+        jobs = [result.result for change, result in results.items()
+                if result.ok and change.action in (REFRESH, RESTART)]
+        if wait and jobs:
+            # Every job is polled by the same tracker, waiting for all of them
+            # takes as long as the slowest master
+            wait_jobs(jobs, timeout)
+        for change in changes:
+            result = results[change]
+            job = result.result
+            if wait and result.ok and change.action in (REFRESH, RESTART):
+                if not job.done():
+                    result = BulkResult(change, error=JobTimeout(
+                        "%s of %s still running after %ss" % (change.action, change.master.uuid, timeout)))
+                elif job.error is not None:
+                    result = BulkResult(change, error=job.error)
+            report.add(result)
+        return report
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Reconciler of %d masters>" % len(self.desired['masters'])
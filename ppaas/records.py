@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import sys
+
+from datetime import datetime
+
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+_sys_intern = getattr(sys, 'intern', None) or intern
+
+
+def intern_string(value):
+    """Interns a string so that equal hostnames share the same object
+
+    Python 2 can only intern byte strings, unicode ones are returned as is.
+    """
+    try:
+        return _sys_intern(value)
+    except TypeError:
+        return value
+
+
+def parse_timestamp(value):
+    """Parses a timestamp of the API, like "2015-12-07T13:28:28"
+
+    Dates alone ("2015-12-07") are accepted too.
+
+    :return: The datetime, or `value` itself if it cannot be parsed
+    :rtype: datetime.datetime
+    """
+    if not value or isinstance(value, datetime):
+        return value
+    for fmt in (TIMESTAMP_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            pass
+    return value
+
+
+def format_timestamp(value):
+    """Formats a timestamp back to the representation of the API"""
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+class CertificateStatus(object):
+    """Status of an agent certificate
+
+    There is a single instance per status, which compares equal to its code,
+    its message, and its JSON representation. It can still be indexed like the
+    dictionary it replaces, and like that dictionary it is not hashable: index
+    statuses by `code` or `message` instead.
+
+    :Example:
+    >>> cert.status
+    <Certificate Status SIGNED>
+    >>> cert.status == "SIGNED", cert.status == 1, cert.status['message']
+    (True, True, 'SIGNED')
+    """
+    __slots__ = ('code', 'message')
+
+    _by_code = {}
+
+    def __init__(self, code, message):
+        self.code = code
+        self.message = message
+
+    @classmethod
+    def register(cls, code, message):
+        """Creates the unique instance of a status"""
+        status = cls._by_code[code] = cls(code, message)
+        return status
+
+    @classmethod
+    def from_dict(cls, data):
+        """Gets the status matching its JSON representation"""
+        if data is None or isinstance(data, cls):
+            return data
+        status = cls._by_code.get(data.get('code'))
+        if status is None or status.message != data.get('message'):
+            status = cls(data.get('code'), data.get('message'))
+        return status
+
+    def to_dict(self):
+        """Returns the JSON representation of the status
+
+        :rtype: dict
+        """
+        return {'code': self.code, 'message': self.message}
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __eq__(self, other):
+        if isinstance(other, CertificateStatus):
+            return self.code == other.code
+        if isinstance(other, dict):
+            return self.code == other.get('code') and self.message == other.get('message')
+        if isinstance(other, int):
+            return self.code == other
+        return self.message == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    # Equal to its code and to its message, which hash differently
+    __hash__ = None
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Certificate Status %s>" % self.message
+
+
+CertificateStatus.SIGNATURE_PENDING = CertificateStatus.register(0, "SIGNATURE PENDING")
+CertificateStatus.SIGNED = CertificateStatus.register(1, "SIGNED")
+CertificateStatus.REVOKED = CertificateStatus.register(2, "REVOKED")
+
+
+class Record(object):
+    """Base class of the compact representations of the API objects
+
+    The fields of the JSON representation listed in FIELDS are parsed once
+    and stored in slots, so reading them is a plain attribute access and
+    objects carry no per instance dictionary. Fields unknown to the class are
+    kept in `extra` and remain readable as attributes. Fields missing from the
+    JSON representation read as None but are left out of to_dict().
+    """
+    __slots__ = ('extra',)
+
+    FIELDS = ()
+    TIMESTAMPS = ()
+
+    def load(self, data):
+        """Sets the fields from a JSON representation
+
+        :param data: The representation, as served by the API
+        :type data: dict
+        """
+        for field in self.FIELDS:
+            if field in data:
+                setattr(self, field, self.parse(field, data[field]))
+            elif self.has_field(field):
+                delattr(self, field)
+        extra = dict((key, value) for key, value in data.items() if key not in self.FIELDS)
+        self.extra = extra or None
+
+    def has_field(self, field):
+        """Tells whether a field was part of the JSON representation
+
+        :param field: The name of the field
+        :type field: str
+
+        :rtype: bool
+        """
+        try:
+            object.__getattribute__(self, field)
+        except AttributeError:
+            return False
+        return True
+
+    def parse(self, field, value):
+        """Converts the JSON value of a field, override to add conversions"""
+        if field in self.TIMESTAMPS:
+            return parse_timestamp(value)
+        return value
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a record from its JSON representation"""
+        record = cls.__new__(cls)
+        record.load(data)
+        return record
+
+    def to_dict(self):
+        """Returns the JSON representation of the object
+
+        :return: A dictionary as served by the API
+        :rtype: dict
+        """
+        data = dict(self.extra or {})
+        for field in self.FIELDS:
+            if not self.has_field(field):
+                continue
+            value = getattr(self, field)
+            if field in self.TIMESTAMPS:
+                value = format_timestamp(value)
+            elif hasattr(value, 'to_dict'):
+                value = value.to_dict()
+            data[field] = value
+        return data
+
+    @property
+    def cached_data(self):
+        """The JSON representation of the object, kept for compatibility
+
+        Assigning a dictionary reloads the fields from it.
+
+        .. note:: This is rebuilt at each access, so changing the returned
+                  dictionary in place does not change the object: assign the
+                  attributes, or the whole dictionary, instead
+        """
+        return self.to_dict()
+
+    @cached_data.setter
+    def cached_data(self, data):
+        self.load(data)
+
+    def __getattr__(self, name):
+        """Retrieves a field of the JSON representation unknown to the class
+
+        :param name: Name of the attribute you want to retrieve
+        :type name: str
+
+        :return: The value of the field
+        :rtype: Any primitive type
+        """
+        if name in self.FIELDS:
+            return None
+        if name != 'extra' and self.extra and name in self.extra:
+            return self.extra[name]
+        raise AttributeError("%s has no attribute %s" % (type(self).__name__, name))
+
+
+class CertificateRecord(Record):
+    """Compact representation of an agent certificate
+
+    `hostname` is interned, `status` is a CertificateStatus and the
+    `created_at`, `signed_at`, `revoked_at` fields are datetimes.
+    """
+    FIELDS = ('hostname', 'fingerprint', 'status', 'serial_number',
+              'created_at', 'signed_at', 'revoked_at')
+    TIMESTAMPS = ('created_at', 'signed_at', 'revoked_at')
+    __slots__ = FIELDS
+
+    def parse(self, field, value):
+        if field == 'status':
+            return CertificateStatus.from_dict(value)
+        if field == 'hostname' and value is not None:
+            return intern_string(value)
+        return super(CertificateRecord, self).parse(field, value)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Certificate Record %s>" % self.hostname
+
+
+class MasterRecord(Record):
+    """Compact representation of a puppet master"""
+    FIELDS = ('id', 'name', 'hostname', 'source', 'deploy_key', 'status', 'type', 'nb',
+              'vars', 'hierarchy', 'hieras', 'servers', 'allowed_networks',
+              'ca_certificate', 'token', 'created_at')
+    TIMESTAMPS = ('created_at',)
+    __slots__ = FIELDS
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Master Record %s>" % self.id
+
+
+class DeployKeyRecord(Record):
+    """Compact representation of a deploy key"""
+    FIELDS = ('name', 'fingerprint', 'public', 'created_at')
+    TIMESTAMPS = ('created_at',)
+    __slots__ = FIELDS
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Deploy Key Record %s>" % self.name
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import time
+
+from .bulk import DEFAULT_MAX_WORKERS, BulkReport, BulkResult, run_bulk
+from .client import get_default_client
+from .deploy_key import DeployKey
+
+
+DEFAULT_REGISTRY_TTL = 60
+
+
+def normalize_public_key(public):
+    """Returns the comparable part of an OpenSSH public key, its type and base64 blob
+
+    :param public: The key, like "ssh-rsa AAAAB3NzaC1yc2E... comment"
+    :type public: str
+
+    :rtype: str
+    """
+    return u' '.join((public or u'').split()[:2])
+
+
+class DeployKeyRegistry(object):
+    """Indexed view of the deploy keys of an account, with bulk provisioning.
+
+    This class has the following behavior:
+      * It is loaded with a single GET of /deploy-keys, then lookups by
+        name, fingerprint or public key are dictionary lookups. It is
+        loaded again on the first lookup after `ttl` seconds, or after
+        invalidate().
+      * create(), delete() and sync() run on a bounded pool of workers and
+        report per key, a failure does not stop the others
+      * Successful mutations update the indexes in place, so a sync does not
+        list the keys again afterwards
+      * The keys are the ppaas.DeployKey objects of the client, the same
+        ones master.deploy_key_obj returns
+
+    :Example:
+    >>> registry = ppaas.DeployKeyRegistry()
+    >>> registry.by_fingerprint('69:2f:e1:29:82:10:66:fa:59:a7:1e:22:40:66:1a')
+    <Deploy Key github>
+    >>> registry.sync(['team-%s' % team for team in teams])
+    <Bulk sync report: 12 succeeded, 0 failed>
+    >>> registry.delete(['old-team'])
+    <Bulk delete report: 1 succeeded, 0 failed>
+    """
+    def __init__(self, client=None, ttl=DEFAULT_REGISTRY_TTL, max_workers=DEFAULT_MAX_WORKERS):
+        """Creates a registry, the keys are loaded lazily
+
+        :param client: A client object you want to pass, if empty the shared one will be used
+        :type client: ppaas.ApiClient
+        :param ttl: Number of seconds the registry is trusted after a load, None to trust it until invalidated
+        :type ttl: float
+        :param max_workers: Maximum number of mutations sent at the same time
+        :type max_workers: int
+        """
+        self.client = client or get_default_client()
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._lock = threading.RLock()
+        self._expires = None
+        self._reset()
+
+    def _reset(self):
+        self._by_name = {}
+        self._by_fingerprint = {}
+        self._by_public = {}
+
+    @property
+    def fresh(self):
+        """Whether the registry can be used without listing the keys again"""
+        if self._expires is None:
+            return False
+        return self.ttl is None or time.time() < self._expires
+
+    def load(self):
+        """(Re)loads every key with a single API call"""
+        keys = DeployKey.get_deploy_keys(self.client)
+        with self._lock:
+            self._reset()
+            for key in keys:
+                self._index(key)
+            self._expires = time.time() + (self.ttl or 0)
+
+    def invalidate(self):
+        """Forces the next lookup to list the keys again"""
+        with self._lock:
+            self._expires = None
+
+    def _ensure_loaded(self):
+        if not self.fresh:
+            self.load()
+
+    def _index(self, key):
+        self._by_name[key.name] = key
+        if key.fingerprint:
+            self._by_fingerprint[key.fingerprint] = key
+        if key.public:
+            self._by_public[normalize_public_key(key.public)] = key
+
+    def _unindex(self, name):
+        key = self._by_name.pop(name, None)
+        if key is None:
+            return
+        if self._by_fingerprint.get(key.fingerprint) is key:
+            del self._by_fingerprint[key.fingerprint]
+        public = normalize_public_key(key.public)
+        if self._by_public.get(public) is key:
+            del self._by_public[public]
+
+    def get(self, name, default=None):
+        """Gets a key by name
+
+        :return: The key, or `default`
+        :rtype: ppaas.DeployKey
+        """
+        self._ensure_loaded()
+        return self._by_name.get(name, default)
+
+    def by_fingerprint(self, fingerprint):
+        """Gets a key by fingerprint
+
+        :return: The key, or None
+        :rtype: ppaas.DeployKey
+        """
+        self._ensure_loaded()
+        return self._by_fingerprint.get(fingerprint)
+
+    def by_public_key(self, public):
+        """Gets a key by public key, the comment of the key is ignored
+
+        :param public: The OpenSSH public key, like "ssh-rsa AAAAB3NzaC1yc2E..."
+        :type public: str
+
+        :return: The key, or None
+        :rtype: ppaas.DeployKey
+        """
+        self._ensure_loaded()
+        return self._by_public.get(normalize_public_key(public))
+
+    def create(self, names):
+        """Creates many keys in parallel
+
+        Keys which already exist are not created again, they are reported
+        as succeeded with the existing key.
+
+        :param names: The names of the keys to create
+        :type names: iterable of str
+
+        :return: The per name report, results are ppaas.DeployKey
+        :rtype: ppaas.bulk.BulkReport
+        """
+        self._ensure_loaded()
+        report = BulkReport('create')
+        missing = []
+        for name in names:
+            key = self._by_name.get(name)
+            if key is not None:
+                report.add(BulkResult(name, result=key))
+            elif name not in missing:
+                missing.append(name)
+
+        def create(name):
+            key = DeployKey.create_deploy_key(name, self.client)
+            with self._lock:
+                self._index(key)
+            return key
+
+        return run_bulk('create', missing, create, max_workers=self.max_workers, report=report)
+
+    def delete(self, names):
+        """Deletes many keys in parallel
+
+        :param names: The names of the keys to delete
+        :type names: iterable of str
+
+        :return: The per name report
+        :rtype: ppaas.bulk.BulkReport
+
+        .. warnings:: This action is irreversible.
+        """
+        self._ensure_loaded()
+
+        def delete(name):
+            key = self._by_name.get(name)
+            if key is None:
+                # Unknown to the listing, the API tells whether it exists
+                result, _ = self.client.delete('/deploy-keys/%s' % name)
+            else:
+                result = key.delete()
+            with self._lock:
+                self._unindex(name)
+            return result
+
+        return run_bulk('delete', list(names), delete, max_workers=self.max_workers)
+
+    def sync(self, names, prune=False):
+        """Makes the keys of the account match a list of names
+
+        :param names: The names of the keys which must exist
+        :type names: iterable of str
+        :param prune: Whether to delete the keys which are not listed
+        :type prune: bool
+
+        :return: The per name report of the creations, and of the deletions when pruning
+        :rtype: ppaas.bulk.BulkReport
+        """
+        names = list(names)
+        report = self.create(names)
+        if prune:
+            wanted = set(names)
+            for result in self.delete([name for name in list(self._by_name) if name not in wanted]):
+                report.add(result)
+        report.action = 'sync'
+        return report
+
+    def __contains__(self, name):
+        self._ensure_loaded()
+        return name in self._by_name
+
+    def __iter__(self):
+        self._ensure_loaded()
+        return iter(list(self._by_name.values()))
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._by_name)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Deploy Key Registry %d keys>" % len(self._by_name)
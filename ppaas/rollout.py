@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import time
+
+from concurrent.futures import FIRST_COMPLETED
+
+from .bulk import BulkReport, BulkResult, iter_bulk
+from .client import JobTimeout
+from .jobs import REFRESH, RESTART, wait_jobs
+
+
+DEFAULT_CONCURRENCY = 4
+
+
+class RolloutReport(BulkReport):
+    """Per master report of a rollout
+
+    Results are the ppaas.jobs.Job of the masters, failures hold the error
+    of the job (the API refusing the action, JobTimeout...). The masters
+    never started because the rollout was aborted are in `skipped`.
+    """
+    def __init__(self, action):
+        BulkReport.__init__(self, action)
+        self.skipped = []
+        self.aborted = False
+        self.waves = 0
+        self.durations = {}
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def duration(self):
+        """Seconds the whole rollout took
+
+        :rtype: float
+        """
+        return (self.finished or time.time()) - self.started
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Rollout %s report: %d succeeded, %d failed, %d skipped%s in %.1fs>" % (
+            self.action, len(self.succeeded), len(self.failed), len(self.skipped),
+            ", aborted" if self.aborted else "", self.duration)
+
+
+class Rollout(object):
+    """Refreshes, or restarts, many masters in waves.
+
+    This class has the following behavior:
+      * Masters are taken in order, by waves of `wave_size` (all of them in
+        a single wave by default). The next wave only starts once every
+        master of the current one finished, so a first small wave acts as
+        a canary.
+      * Within a wave at most `concurrency` masters are refreshing at the
+        same time: as soon as one finishes the next one starts, so a wave
+        takes the time of its slowest masters rather than the sum of all
+      * A master fails when the API refuses the action, when its job fails,
+        or when it did not finish within `timeout` seconds. Once more than
+        `max_failures` masters failed (or more than `max_failure_ratio` of
+        all the masters of the rollout), no master is started anymore: those in flight are
+        waited for, the others are reported as skipped.
+
+    :Example:
+    >>> rollout = ppaas.Rollout.for_source('git@github.com:puppet/puppet.git', concurrency=8, wave_size=20)
+    >>> report = rollout.run()
+    >>> report
+    <Rollout refresh report: 40 succeeded, 0 failed, 0 skipped in 95.2s>
+    >>> max(report.durations.values())
+    41.3
+    """
+    def __init__(self, masters, action=REFRESH, concurrency=DEFAULT_CONCURRENCY, wave_size=None,
+                 max_failures=None, max_failure_ratio=None, timeout=None, on_result=None):
+        """Prepares a rollout
+
+        :param masters: The masters to roll out to, in order
+        :type masters: iterable of ppaas.Master
+        :param action: ppaas.jobs.REFRESH or ppaas.jobs.RESTART
+        :type action: str
+        :param concurrency: Maximum number of masters refreshing at the same time
+        :type concurrency: int
+        :param wave_size: Number of masters per wave, a single wave if empty
+        :type wave_size: int
+        :param max_failures: Number of failed masters aborting the rollout when exceeded, 0 to fail fast,
+                             never aborts if empty
+        :type max_failures: int
+        :param max_failure_ratio: Share of failed masters, out of every master of the rollout, aborting
+                                  the rollout when exceeded
+        :type max_failure_ratio: float
+        :param timeout: Seconds a master has to finish before it is considered failed
+        :type timeout: float
+        :param on_result: Called with the ppaas.bulk.BulkResult of every master once it is finished
+        :type on_result: callable
+        """
+        if action not in (REFRESH, RESTART):
+            raise ValueError("Unknown rollout action %r" % action)
+        self.masters = list(masters)
+        self.action = action
+        self.concurrency = max(1, concurrency)
+        self.wave_size = wave_size or len(self.masters) or 1
+        self.max_failures = max_failures
+        self.max_failure_ratio = max_failure_ratio
+        self.timeout = timeout
+        self.on_result = on_result
+
+    @classmethod
+    def for_source(cls, source, client=None, **kwargs):
+        """Prepares a rollout to every master pulling a repository
+
+        :param source: The git URL of the repository, as in the `source` of the masters
+        :type source: str
+        :param client: The client to list the masters with, if empty the shared one
+        :type client: ppaas.ApiClient
+
+        :rtype: ppaas.rollout.Rollout
+        """
+        from .master import Master
+        return cls([master for master in Master.get_masters(client) if master.source == source], **kwargs)
+
+    def _should_abort(self, report):
+        failed = len(report.failed)
+        if self.max_failures is not None and failed > self.max_failures:
+            return True
+        if self.max_failure_ratio is not None and failed > self.max_failure_ratio * len(self.masters):
+            return True
+        return False
+
+    def _start(self, masters):
+        action = self.action
+        return iter_bulk(masters, lambda master: getattr(master, action)(), max_workers=len(masters) or 1)
+
+    def _record(self, report, master, job=None, error=None):
+        if job is not None:
+            report.durations[master] = job.duration
+            if error is None and job.error is not None:
+                error = job.error
+        result = BulkResult(master, result=job if error is None else None, error=error)
+        report.add(result)
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def run(self):
+        """Runs the rollout, waiting for every started master
+
+        :rtype: ppaas.rollout.RolloutReport
+        """
+        report = RolloutReport(self.action)
+        for offset in range(0, len(self.masters), self.wave_size):
+            wave = self.masters[offset:offset + self.wave_size]
+            if report.aborted:
+                report.skipped.extend(wave)
+                continue
+            report.waves += 1
+            self._run_wave(wave, report)
+        report.finished = time.time()
+        return report
+
+    def _run_wave(self, masters, report):
+        waiting = list(reversed(masters))
+        running = {}
+        while running or waiting:
+            free = self.concurrency - len(running)
+            if waiting and free > 0 and not report.aborted:
+                starting = [waiting.pop() for _ in range(min(free, len(waiting)))]
+                for result in self._start(starting):
+                    job = result.result
+                    if result.ok and job:
+                        running[job] = result.key
+                    else:
+                        self._record(report, result.key, job, result.error or job.error)
+                report.aborted = report.aborted or self._should_abort(report)
+                continue
+            if report.aborted:
+                report.skipped.extend(reversed(waiting))
+                del waiting[:]
+                if not running:
+                    break
+
+            wait = None
+            if self.timeout is not None:
+                wait = max(0, min(job.started for job in running) + self.timeout - time.time())
+            done, _ = wait_jobs(running, wait, FIRST_COMPLETED)
+            for job in done:
+                self._record(report, running.pop(job), job)
+            if self.timeout is not None:
+                for job in [job for job in running if job.duration >= self.timeout]:
+                    self._record(report, running.pop(job), job, JobTimeout(
+                        "%s of %s still running after %ss" % (self.action, job.master.uuid, self.timeout)))
+            report.aborted = report.aborted or self._should_abort(report)
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Rollout %s of %d masters>" % (self.action, len(self.masters))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+from .cache import compile_endpoint
+from .transport import network_errors
+
+
+DEFAULT_TIMEOUT = 10
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class RetryPolicy(object):
+    """Decides whether and when a failed request is sent again
+
+    This class has the following behavior:
+      * Idempotent requests are retried on connection errors, timeouts and
+        429/5xx answers, non idempotent ones only on 429 (the server did not
+        process them)
+      * The delay is the Retry-After header of the answer when there is one,
+        a jittered exponential backoff otherwise ("full jitter", a random
+        delay between 0 and backoff_factor * 2 ** attempt)
+    """
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30):
+        """Creates a new policy
+
+        :param max_retries: Maximum number of retries of a request, 0 disables them
+        :type max_retries: int
+        :param backoff_factor: Base delay of the exponential backoff, in seconds
+        :type backoff_factor: float
+        :param max_backoff: Maximum delay between two attempts, in seconds
+        :type max_backoff: float
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def should_retry(self, method, attempt, response=None):
+        """Whether a failed attempt should be retried
+
+        :param method: The HTTP method
+        :type method: str
+        :param attempt: Number of the failed attempt, starting at 0
+        :type attempt: int
+        :param response: The response, None for a network error
+        :type response: requests.Response
+
+        :rtype: bool
+        """
+        if attempt >= self.max_retries:
+            return False
+        if response is None:
+            return method in IDEMPOTENT_METHODS
+        if response.status_code == 429:
+            return True
+        return response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+
+    def delay(self, attempt, response=None):
+        """Computes how long to wait before the next attempt
+
+        The Retry-After header of the response is honoured, up to max_backoff.
+
+        :return: The delay, in seconds
+        :rtype: float
+        """
+        retry_after = retry_after_delay(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+
+def retry_after_delay(response):
+    """Parses the Retry-After header of a response
+
+    :return: The delay in seconds, or None if there is no valid header
+    :rtype: float
+    """
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, email.utils.mktime_tz(date) - time.time())
+
+
+class TokenBucket(object):
+    """Thread safe token bucket rate limiter
+
+    Up to `burst` requests can be sent at once, then `rate` per second. All
+    the threads sharing a client share its bucket, and a throttling answer
+    from the server pauses all of them.
+    """
+    def __init__(self, rate, burst=None):
+        """Creates a full bucket
+
+        :param rate: Number of requests per second
+        :type rate: float
+        :param burst: Maximum number of requests sent at once, `rate` if empty
+        :type burst: int
+
+        :raises ValueError: When `rate` is not positive, do not use a rate limiter to not limit the rate
+        """
+        if not rate > 0:
+            raise ValueError("The rate of a TokenBucket must be positive, got %r" % (rate,))
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._updated = _monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request can be sent"""
+        while True:
+            with self._lock:
+                now = _monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stops handing out tokens for a while, every thread waits
+
+        :param seconds: Duration of the pause
+        :type seconds: float
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, _monotonic() + seconds)
+
+
+class Scheduler(object):
+    """Sends the requests of an ApiClient
+
+    It applies the rate limiter, the per endpoint timeouts and the retry
+    policy to every request.
+
+    :Example:
+    >>> scheduler = ppaas.Scheduler(retry=ppaas.RetryPolicy(max_retries=5),
+    ...                             rate_limiter=ppaas.TokenBucket(rate=20, burst=40),
+    ...                             timeouts={'/masters/*/certs': 60})
+    >>> client = ppaas.ApiClient(scheduler=scheduler)
+    """
+    def __init__(self, retry=None, rate_limiter=None, timeout=DEFAULT_TIMEOUT, timeouts=None):
+        """Creates a new scheduler
+
+        :param retry: The retry policy, a default one if empty
+        :type retry: ppaas.RetryPolicy
+        :param rate_limiter: The rate limiter shared by the callers, no limit if empty
+        :type rate_limiter: ppaas.TokenBucket
+        :param timeout: Default timeout of the requests, in seconds
+        :type timeout: float
+        :param timeouts: Timeouts per endpoint pattern, like {'/masters/*/certs': 60}
+        :type timeouts: dict
+        """
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.timeouts = [(compile_endpoint(pattern), value) for pattern, value in (timeouts or {}).items()]
+
+    def timeout_for(self, url):
+        """Returns the timeout of the requests to an endpoint
+
+        :rtype: float
+        """
+        path = urlparse(url).path
+        for regex, value in self.timeouts:
+            if regex.match(path):
+                return value
+        return self.timeout
+
+    def run(self, method, url, send, timeout=None):
+        """Sends a request, retrying it according to the policy
+
+        :param method: The HTTP method
+        :type method: str
+        :param url: The URL of the request
+        :type url: str
+        :param send: Callable sending the request, it takes the timeout
+        :type send: callable
+        :param timeout: Timeout of this call, the one of the endpoint if empty
+        :type timeout: float
+
+        :return: The last response received, network errors are raised once
+                 the retries are exhausted
+        :rtype: requests.Response
+        """
+        if timeout is None:
+            timeout = self.timeout_for(url)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = send(timeout)
+            except network_errors():
+                if not self.retry.should_retry(method, attempt):
+                    raise
+                time.sleep(self.retry.delay(attempt))
+            else:
+                if not self.retry.should_retry(method, attempt, response):
+                    return response
+                delay = self.retry.delay(attempt, response)
+                response.close()
+                if response.status_code == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+            attempt += 1
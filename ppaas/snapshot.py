@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+from .bulk import DEFAULT_MAX_WORKERS, BulkReport, BulkResult, iter_bulk
+from .records import CertificateRecord, DeployKeyRecord, MasterRecord
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS masters (
+    uuid TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS masters_name ON masters (name);
+CREATE TABLE IF NOT EXISTS certificates (
+    master_uuid TEXT NOT NULL,
+    hostname TEXT NOT NULL,
+    fingerprint TEXT,
+    status_code INTEGER,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (master_uuid, hostname)
+);
+CREATE INDEX IF NOT EXISTS certificates_hostname ON certificates (hostname);
+CREATE INDEX IF NOT EXISTS certificates_fingerprint ON certificates (fingerprint);
+CREATE TABLE IF NOT EXISTS deploy_keys (
+    name TEXT PRIMARY KEY,
+    fingerprint TEXT,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+def default_snapshot_path():
+    """Returns where the snapshot is stored when no path is given
+
+    :rtype: str
+    """
+    return os.path.join(os.environ.get('HOME', ""), ".ppaas.snapshot")
+
+
+def _dumps(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+class SnapshotStore(object):
+    """Local SQLite snapshot of the masters, certificates and deploy keys.
+
+    This class has the following behavior:
+      * refresh() stores the last known representation of every master,
+        certificate and deploy key of the account, with the time it was
+        fetched (for a certificate, the time it last changed). Listings
+        are fetched with conditional requests using the validators of the
+        previous refresh, so an unchanged master costs a 304 and no write,
+        and only the rows which changed are written.
+      * Queries (locate(), certificates(), masters()...) only read the local
+        file: they work offline and answer in milliseconds, even with tens
+        of thousands of certificates, thanks to the hostname and fingerprint
+        indexes
+      * get_masters() warm starts a script with ready to use ppaas.Master
+        objects, without listing the masters again
+
+    :Example:
+    >>> store = ppaas.SnapshotStore()
+    >>> store.refresh(max_age=300)
+    <Bulk refresh snapshot report: 40 succeeded, 0 failed>
+    >>> store.locate('web1.maurice.fr')
+    [(<Master Record 0e85b81f-5a29-4e2b-a46c-e024049acb07>, <Certificate Record web1.maurice.fr>)]
+    >>> store.age()
+    12.5
+    """
+    def __init__(self, path=None):
+        """Opens, or creates, a snapshot
+
+        :param path: The SQLite file, default_snapshot_path() if empty, ':memory:' for a transient one
+        :type path: str
+        """
+        self.path = path or default_snapshot_path()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the snapshot file"""
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _fetch_listing(self, client, path, key, validators):
+        headers = {}
+        if validators is not None:
+            if validators[0]:
+                headers['If-None-Match'] = validators[0]
+            if validators[1]:
+                headers['If-Modified-Since'] = validators[1]
+        response = client.request('GET', urljoin(client.endpoint, path), headers=headers)
+        if response.status_code == 304 and validators is not None:
+            return None, validators
+        result, _ = client.decode(response)
+        return result[key], (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def _validators(self):
+        rows = self._query("SELECT path, etag, last_modified FROM listings")
+        return dict((path, (etag, last_modified)) for path, etag, last_modified in rows)
+
+    def refresh(self, client=None, max_age=None, deploy_keys=True, max_workers=DEFAULT_MAX_WORKERS):
+        """Brings the snapshot up to date with the API
+
+        :param client: The ApiClient to use, if empty the shared one is used
+        :type client: ppaas.ApiClient
+        :param max_age: Do not fetch again the certificates of the masters refreshed less than this many seconds ago
+        :type max_age: float
+        :param deploy_keys: Whether to refresh the deploy keys as well
+        :type deploy_keys: bool
+        :param max_workers: Maximum number of masters fetched at the same time
+        :type max_workers: int
+
+        :return: The per master report, results are the number of certificates which changed
+        :rtype: ppaas.bulk.BulkReport
+        """
+        if client is None:
+            from .client import get_default_client
+            client = get_default_client()
+        now = time.time()
+        validators = self._validators()
+
+        # Fetched first: failing after the certificate listings would throw them away
+        keys = key_validators = None
+        if deploy_keys:
+            keys, key_validators = self._fetch_listing(client, '/deploy-keys', 'deploy_keys',
+                                                       validators.get('/deploy-keys'))
+
+        masters, _ = client.get('/masters')
+        masters = masters['masters']
+        fetched = dict(self._query("SELECT path, fetched_at FROM listings"))
+        stale = [
+            master for master in masters
+            if max_age is None or now - fetched.get('/masters/%s/certs' % master['id'], 0) >= max_age
+        ]
+
+        def fetch(master):
+            path = '/masters/%s/certs' % master['id']
+            return self._fetch_listing(client, path, 'certs', validators.get(path))
+
+        listings = dict((result.key['id'], result) for result in iter_bulk(stale, fetch, max_workers=max_workers))
+
+        report = BulkReport('refresh snapshot')
+        with self._lock:
+            with self._db:
+                db = self._db
+                uuids = [master['id'] for master in masters]
+                db.execute("DELETE FROM masters WHERE uuid NOT IN (%s)" % ','.join('?' * len(uuids)), uuids)
+                db.execute("DELETE FROM certificates WHERE master_uuid NOT IN (%s)" % ','.join('?' * len(uuids)),
+                           uuids)
+                db.executemany("INSERT OR REPLACE INTO masters VALUES (?, ?, ?, ?)",
+                               [(master['id'], master.get('name'), _dumps(master), now) for master in masters])
+                for uuid, result in listings.items():
+                    if not result.ok:
+                        report.add(BulkResult(uuid, error=result.error))
+                        continue
+                    certs, listing_validators = result.result
+                    path = '/masters/%s/certs' % uuid
+                    changes = 0
+                    if certs is not None:
+                        changes = self._store_certificates(db, uuid, certs, now)
+                    report.add(BulkResult(uuid, result=changes))
+                    db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+                               (path,) + tuple(listing_validators) + (now,))
+                if keys is not None:
+                    db.execute("DELETE FROM deploy_keys")
+                    db.executemany("INSERT INTO deploy_keys VALUES (?, ?, ?, ?)",
+                                   [(key['name'], key.get('fingerprint'), _dumps(key), now) for key in keys])
+                if deploy_keys:
+                    db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+                               ('/deploy-keys',) + tuple(key_validators) + (now,))
+        return report
+
+    def _store_certificates(self, db, uuid, certs, now):
+        known = dict(db.execute("SELECT hostname, data FROM certificates WHERE master_uuid = ?", (uuid,)))
+        rows = []
+        for cert in certs:
+            data = _dumps(cert)
+            hostname = cert['hostname']
+            if known.pop(hostname, None) != data:
+                rows.append((uuid, hostname, cert.get('fingerprint'),
+                             (cert.get('status') or {}).get('code'), data, now))
+        db.executemany("INSERT OR REPLACE INTO certificates VALUES (?, ?, ?, ?, ?, ?)", rows)
+        db.executemany("DELETE FROM certificates WHERE master_uuid = ? AND hostname = ?",
+                       [(uuid, hostname) for hostname in known])
+        return len(rows) + len(known)
+
+    def masters(self, name=None):
+        """Returns the masters of the snapshot
+
+        :param name: Only return the masters with this name
+        :type name: str
+
+        :rtype: list of ppaas.records.MasterRecord
+        """
+        if name is None:
+            rows = self._query("SELECT data FROM masters ORDER BY name")
+        else:
+            rows = self._query("SELECT data FROM masters WHERE name = ?", (name,))
+        return [MasterRecord.from_dict(json.loads(data)) for data, in rows]
+
+    def get_masters(self, client=None):
+        """Returns ready to use masters loaded from the snapshot, without any API call
+
+        :param client: The ApiClient the masters will use, if empty the shared one
+        :type client: ppaas.ApiClient
+
+        :rtype: list of ppaas.Master
+        """
+        from .master import Master
+        return [Master(data['id'], data, client) for data in
+                (json.loads(data) for data, in self._query("SELECT data FROM masters ORDER BY name"))]
+
+    def certificates(self, master_uuid=None, status=None, hostname=None, fingerprint=None):
+        """Returns certificates of the snapshot
+
+        :param master_uuid: Only return the certificates of this master
+        :type master_uuid: str
+        :param status: Only return the certificates with this status code or message
+        :type status: int or str
+        :param hostname: Only return the certificates of this agent
+        :type hostname: str
+        :param fingerprint: Only return the certificates with this fingerprint
+        :type fingerprint: str
+
+        :return: The matching certificates, with the uuid of their master
+        :rtype: list of (str, ppaas.records.CertificateRecord)
+        """
+        clauses, args = [], []
+        for column, value in (('master_uuid', master_uuid), ('hostname', hostname), ('fingerprint', fingerprint)):
+            if value is not None:
+                clauses.append('%s = ?' % column)
+                args.append(value)
+        rows = self._query("SELECT master_uuid, data FROM certificates%s" % (
+            ' WHERE ' + ' AND '.join(clauses) if clauses else ''), args)
+        certificates = [(uuid, CertificateRecord.from_dict(json.loads(data))) for uuid, data in rows]
+        if status is not None:
+            certificates = [(uuid, cert) for uuid, cert in certificates if cert.status == status]
+        return certificates
+
+    def locate(self, hostname):
+        """Finds the masters holding a certificate for an agent, and its status
+
+        :param hostname: The hostname of the agent
+        :type hostname: str
+
+        :rtype: list of (ppaas.records.MasterRecord, ppaas.records.CertificateRecord)
+        """
+        rows = self._query(
+            "SELECT masters.data, certificates.data FROM certificates "
+            "JOIN masters ON masters.uuid = certificates.master_uuid WHERE hostname = ?", (hostname,))
+        return [(MasterRecord.from_dict(json.loads(master)), CertificateRecord.from_dict(json.loads(cert)))
+                for master, cert in rows]
+
+    def deploy_keys(self):
+        """Returns the deploy keys of the snapshot
+
+        :rtype: list of ppaas.records.DeployKeyRecord
+        """
+        return [DeployKeyRecord.from_dict(json.loads(data))
+                for data, in self._query("SELECT data FROM deploy_keys ORDER BY name")]
+
+    def age(self, master_uuid=None):
+        """Seconds since the snapshot (or the certificates of a master) was last refreshed
+
+        :return: The age, None if it was never refreshed
+        :rtype: float
+        """
+        if master_uuid is None:
+            rows = self._query("SELECT MIN(fetched_at) FROM masters")
+        else:
+            rows = self._query("SELECT fetched_at FROM listings WHERE path = ?", ('/masters/%s/certs' % master_uuid,))
+        if not rows or rows[0][0] is None:
+            return None
+        return time.time() - rows[0][0]
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM certificates")[0][0]
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Snapshot Store %s>" % self.path
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import codecs
+import json
+import re
+
+from .client import InvalidResponse
+
+
+CHUNK_SIZE = 64 * 1024
+
+_whitespace = re.compile(r'[\s,]*')
+_number_tail = re.compile(r'[0-9.eE+-]*')
+
+
+def iter_json_array(chunks, key):
+    """Incrementally decodes the items of a JSON array
+
+    The document is expected to look like {"<key>": [item, item...]}, the
+    items are decoded and yielded one at a time as the chunks arrive, so only
+    the item being decoded is kept in memory.
+
+    :param chunks: The raw document, as an iterable of bytes
+    :type chunks: iterable
+    :param key: The key of the array in the top level object
+    :type key: str
+
+    :return: The decoded items
+    :rtype: generator
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    marker = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buf = u''
+    started = False
+    for chunk in chunks:
+        buf += text.decode(chunk)
+        if not started:
+            match = marker.search(buf)
+            if match is None:
+                continue
+            buf = buf[match.end():]
+            started = True
+        pos = 0
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # The item is not complete yet, wait for the next chunk
+                break
+            if buf[end - 1].isdigit() and _number_tail.match(buf, end).end() == len(buf):
+                # A number cut by the end of the chunk decodes fine, like 12
+                # of 1234 or -5 of -5.25e1: it may go on in the next one
+                break
+            pos = end
+            yield item
+        buf = buf[pos:]
+    if started:
+        raise InvalidResponse("Truncated API response")
+    raise InvalidResponse("No %s in API response" % key)
+
+
+def iter_pages(client, url, key, params=None):
+    """Streams the items of a listing, following the server pagination
+
+    Pages are followed as long as the server answers with a `Link: <...>;
+    rel="next"` header. Closing the generator closes the current response.
+
+    :param client: The client to send the requests with
+    :type client: ppaas.ApiClient
+    :param url: The path of the listing
+    :type url: str
+    :param key: The key of the array in the response
+    :type key: str
+    :param params: Query string parameters of the first page
+    :type params: dict
+
+    :return: The decoded items
+    :rtype: generator
+    """
+    while url:
+        response = client.stream(url, params=params)
+        try:
+            for item in iter_json_array(response.iter_content(CHUNK_SIZE), key):
+                yield item
+            url = response.links.get('next', {}).get('url')
+            params = None
+        finally:
+            response.close()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+
+
+DEFAULT_POOL_SIZE = 10
+
+
+class Transport(object):
+    """Pooled, keep-alive HTTP transport used by the ApiClient.
+
+    This class has the following behavior:
+      * A single connection pool (an HTTPAdapter) is shared by every thread
+        using the transport, so TCP and TLS connections to the API endpoint
+        are kept alive and reused between calls.
+      * Each thread gets its own requests.Session mounted on that shared
+        pool. Sessions carry mutable state (cookies, headers) and are not
+        meant to be shared between threads, the pool is.
+      * `pool_size` is the number of connections kept per endpoint, and
+        `pool_block` makes callers wait for a free connection instead of
+        opening throwaway ones when the pool is exhausted.
+
+    :Example:
+    >>> transport = ppaas.Transport(pool_size=20)
+    >>> client = ppaas.ApiClient(transport=transport)
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, pool_block=False):
+        """Creates a new transport
+
+        :param pool_size: Maximum number of connections kept alive per endpoint
+        :type pool_size: int
+        :param pool_block: Whether to block when no connection is available in the pool
+        :type pool_block: bool
+        """
+        # requests is only imported once a transport is needed, so that
+        # importing ppaas (and the command line) stays fast
+        from requests.adapters import HTTPAdapter
+
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=pool_block
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """Gets the requests.Session of the calling thread
+
+        :return: A session mounted on the shared connection pool
+        :rtype: requests.Session
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            from requests import Session
+            session = Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """Performs an HTTP request through the pool
+
+        Takes the same arguments as requests.request
+
+        :return: The response of the server
+        :rtype: requests.Response
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """Closes every pooled connection"""
+        self.adapter.close()
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Transport pool_size=%d>" % self.pool_size
+
+
+def network_errors():
+    """Returns the exceptions the transport raises when the network fails
+
+    Meant to be used in except clauses, which only evaluate it once an
+    exception was raised, so requests is not imported before it is needed.
+
+    :rtype: tuple
+    """
+    from requests.exceptions import ConnectionError, Timeout
+    return ConnectionError, Timeout
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """Returns the process-wide transport shared by every ApiClient
+
+    :return: The shared transport, created on first use
+    :rtype: ppaas.Transport
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import heapq
+import threading
+import time
+
+from .records import CertificateRecord
+
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_MAX_INTERVAL = 30
+DEFAULT_BACKOFF = 2
+
+
+class CertificateEvent(object):
+    """A change in the certificates of a master
+
+    :param kind: ADDED, CHANGED or REMOVED
+    :param master: The master the certificate is attached to
+    :param hostname: The hostname of the agent
+    :param certificate: The new state of the certificate, None when it was removed
+    :param previous_status: The status code before the change, None when it was added
+    """
+    __slots__ = ('kind', 'master', 'hostname', 'certificate', 'previous_status')
+
+    def __init__(self, kind, master, hostname, certificate=None, previous_status=None):
+        self.kind = kind
+        self.master = master
+        self.hostname = hostname
+        self.certificate = certificate
+        self.previous_status = previous_status
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Certificate Event %s %s@%s>" % (self.kind, self.hostname, self.master.uuid)
+
+
+class CertificateWatcher(object):
+    """Watches the certificates of many masters and reports what changes.
+
+    This class has the following behavior:
+      * Every master is polled on its own adaptive interval: right after a
+        change it is polled again after `min_interval`, and every poll
+        without change multiplies the interval by `backoff`, up to
+        `max_interval`
+      * Each poll is diffed against a hostname -> (fingerprint, status)
+        snapshot of the previous one, and only the differences are turned
+        into CertificateEvent objects for the subscribers. When the server
+        supports conditional requests an unchanged listing is not even
+        downloaded again.
+      * A single thread polls every master, run() blocks, start() runs it in
+        the background
+
+    :Example:
+    >>> watcher = ppaas.CertificateWatcher(ppaas.Master.get_masters())
+    >>> def sign_new(event):
+    ...     if event.kind == 'added' and event.certificate.status == "SIGNATURE PENDING":
+    ...         event.master.certificate(event.hostname).sign(reload=False)
+    >>> watcher.subscribe(sign_new)
+    >>> watcher.start()
+    """
+    def __init__(self, masters, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 backoff=DEFAULT_BACKOFF, initial_events=True):
+        """Creates a new watcher
+
+        :param masters: The masters to watch
+        :type masters: iterable of ppaas.Master
+        :param min_interval: Minimum delay between two polls of a master, in seconds
+        :type min_interval: float
+        :param max_interval: Maximum delay between two polls of a master, in seconds
+        :type max_interval: float
+        :param backoff: Factor applied to the interval of a master after a poll without change
+        :type backoff: float
+        :param initial_events: Whether the certificates present at the first poll are reported as added
+        :type initial_events: bool
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.initial_events = initial_events
+        self.on_error = None
+        self._subscribers = []
+        self._snapshots = {}
+        self._results = {}
+        self._intervals = {}
+        self._queue = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        for master in masters:
+            self.add_master(master)
+
+    def subscribe(self, callback):
+        """Registers a callback called with every CertificateEvent
+
+        Callbacks are called from the polling thread, exceptions they raise
+        are handed to `on_error`.
+
+        :param callback: The callback
+        :type callback: callable
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Unregisters a callback"""
+        self._subscribers.remove(callback)
+
+    def add_master(self, master):
+        """Starts watching a master, it is polled right away
+
+        :type master: ppaas.Master
+        """
+        with self._lock:
+            self._intervals[master.uuid] = self.min_interval
+            heapq.heappush(self._queue, (time.time(), master.uuid, master))
+        self._wakeup.set()
+
+    def remove_master(self, master):
+        """Stops watching a master
+
+        :type master: ppaas.Master
+        """
+        with self._lock:
+            self._queue = [entry for entry in self._queue if entry[1] != master.uuid]
+            heapq.heapify(self._queue)
+            self._intervals.pop(master.uuid, None)
+            self._snapshots.pop(master.uuid, None)
+            self._results.pop(master.uuid, None)
+
+    def poll(self, master):
+        """Polls a master once and dispatches the events
+
+        :type master: ppaas.Master
+
+        :return: The events of this poll
+        :rtype: list of CertificateEvent
+        """
+        # cache=False forces a revalidation of the cached listing, the server
+        # answers 304 and the very same result object is returned if nothing
+        # changed since the previous poll.
+        result, _ = master.client.get('/masters/%s/certs' % master.uuid, cache=False)
+        if result is self._results.get(master.uuid):
+            return []
+        self._results[master.uuid] = result
+        events = self._diff(master, result['certs'])
+        for event in events:
+            for callback in list(self._subscribers):
+                try:
+                    callback(event)
+                except Exception as error:
+                    self._error(master, error)
+        return events
+
+    def _diff(self, master, certificates):
+        previous = self._snapshots.get(master.uuid)
+        snapshot = {}
+        events = []
+        for data in certificates:
+            hostname = data['hostname']
+            state = (data.get('fingerprint'), (data.get('status') or {}).get('code'))
+            snapshot[hostname] = state
+            if previous is None:
+                if self.initial_events:
+                    events.append(CertificateEvent(ADDED, master, hostname, CertificateRecord.from_dict(data)))
+                continue
+            before = previous.get(hostname)
+            if before is None:
+                events.append(CertificateEvent(ADDED, master, hostname, CertificateRecord.from_dict(data)))
+            elif before != state:
+                events.append(CertificateEvent(CHANGED, master, hostname, CertificateRecord.from_dict(data), before[1]))
+        if previous is not None:
+            for hostname, state in previous.items():
+                if hostname not in snapshot:
+                    events.append(CertificateEvent(REMOVED, master, hostname, None, state[1]))
+        self._snapshots[master.uuid] = snapshot
+        return events
+
+    def _error(self, master, error):
+        if self.on_error is not None:
+            self.on_error(master, error)
+
+    def run_once(self):
+        """Polls every master which is due, and reschedules it
+
+        :return: Number of seconds until the next master is due
+        :rtype: float
+        """
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue)[2])
+        for master in due:
+            try:
+                changed = bool(self.poll(master))
+            except Exception as error:
+                self._error(master, error)
+                changed = False
+            with self._lock:
+                if master.uuid not in self._intervals:
+                    continue
+                if changed:
+                    interval = self.min_interval
+                else:
+                    interval = min(self.max_interval, self._intervals[master.uuid] * self.backoff)
+                self._intervals[master.uuid] = interval
+                heapq.heappush(self._queue, (time.time() + interval, master.uuid, master))
+        with self._lock:
+            if not self._queue:
+                return self.max_interval
+            return max(0, self._queue[0][0] - time.time())
+
+    def poke(self, master=None):
+        """Polls a master (or every master) as soon as possible
+
+        Useful when something outside tells you new agents are coming.
+        """
+        with self._lock:
+            entries = []
+            for due, uuid, watched in self._queue:
+                if master is None or uuid == master.uuid:
+                    self._intervals[uuid] = self.min_interval
+                    due = 0
+                entries.append((due, uuid, watched))
+            self._queue = entries
+            heapq.heapify(self._queue)
+        self._wakeup.set()
+
+    def run(self):
+        """Polls the masters until stop() is called"""
+        while not self._stop.is_set():
+            delay = self.run_once()
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+    @property
+    def running(self):
+        """Whether the watcher runs in a background thread"""
+        return self._thread is not None
+
+    def start(self):
+        """Runs the watcher in a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='ppaas-certificate-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops the watcher
+
+        :param timeout: How long to wait for the background thread, in seconds
+        :type timeout: float
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __repr__(self):
+        """String representation of the object"""
+        return "<Certificate Watcher %d masters>" % len(self._intervals)
@@ -27,6 +27,16 @@ setup(
     ],
     install_requires=[
         'requests==2.9.1',
+        'futures; python_version < "3.0"',
     ],
+    extras_require={
+        'fast': ['orjson; python_version >= "3.6"'],
+        'yaml': ['PyYAML'],
+    },
+    entry_points={
+        'console_scripts': [
+            'ppaas = ppaas.cli:main',
+        ],
+    },
     license="WTFPL",
 )
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+# The tests run offline, against the mock API of the benchmarks
+import itertools
+import os
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+if BENCHMARKS not in sys.path:
+    sys.path.insert(0, BENCHMARKS)
+
+from mock_paas import MockPaaS, MockTransport, certificate_data, crl_pem, make_client
+
+_accounts = itertools.count()
+
+
+def mock_client(paas, **kwargs):
+    """Builds a client of a mock API, on an endpoint of its own
+
+    The master index, the CRL index and the job tracker are shared per
+    endpoint and user: a distinct endpoint keeps the tests apart.
+
+    :rtype: ppaas.ApiClient
+    """
+    return make_client(MockTransport(paas), 'http://mock%d.ppaas.test' % next(_accounts), **kwargs)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import sys
+import threading
+import time
+import unittest
+
+from tests import MockPaaS, MockTransport, mock_client
+
+from ppaas.client import ResourceNotFoundError
+from ppaas.deploy_key import DeployKey
+from ppaas.master import Master
+from ppaas.watcher import CertificateWatcher
+
+if sys.version_info >= (3, 7):
+    import asyncio
+
+    from ppaas.aio import MAX_CONCURRENCY, AsyncApiClient
+
+
+class _SlowTransport(MockTransport):
+    """Takes some time to answer and records the number of requests in flight"""
+    def __init__(self, paas, delay):
+        MockTransport.__init__(self, paas)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return MockTransport.request(self, *args, **kwargs)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "ppaas.aio needs Python 3.7+")
+class AsyncApiClientTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=2, certs=4)
+        self.client = AsyncApiClient(mock_client(self.paas), concurrency=4)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.client.close()
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def call_in_loop(self, func):
+        """Calls `func` from the running event loop"""
+        future = self.loop.create_future()
+        self.loop.call_soon(lambda: future.set_result(func()))
+        return self.loop.run_until_complete(future)
+
+    def test_masters(self):
+        masters = self.run_async(self.client.get_masters())
+        self.assertEqual(sorted(master.name for master in masters), [u"master0", u"master1"])
+        self.assertTrue(all(isinstance(master, Master) for master in masters))
+        self.assertTrue(all(master.client is self.client.client for master in masters))
+        master = self.run_async(self.client.get_master(u"master1"))
+        self.assertIs(self.run_async(self.client.master(master.uuid)), master)
+        # Not known yet to another client, loaded
+        other = AsyncApiClient(mock_client(self.paas))
+        try:
+            loaded = self.run_async(other.master(master.uuid))
+        finally:
+            other.close()
+        self.assertEqual(loaded.name, u"master1")
+        self.assertIsNot(loaded, master)
+
+    def test_certificates(self):
+        master = self.run_async(self.client.get_masters())[0]
+        pending = self.run_async(self.client.get_certificates(master, "SIGNATURE PENDING"))
+        self.assertEqual(len(pending), 2)
+        self.run_async(asyncio.gather(*[self.client.sign(certificate) for certificate in pending]))
+        self.assertEqual(self.run_async(self.client.get_certificates(master, "SIGNATURE PENDING")), [])
+        certificate = self.run_async(self.client.certificate(master, pending[0].hostname))
+        self.assertIs(certificate, pending[0])
+        self.assertEqual(certificate.status['message'], u"SIGNED")
+
+    def test_deploy_keys(self):
+        self.run_async(self.client.create_deploy_key(u"web"))
+        self.assertEqual(sorted(key.name for key in self.run_async(self.client.get_deploy_keys())),
+                         [u"mock", u"web"])
+        key = self.run_async(self.client.deploy_key(u"web"))
+        self.assertEqual(key.fingerprint, u"web-fingerprint")
+        self.assertIs(key, DeployKey.resolve(u"web", self.client.client))
+        self.run_async(self.client.delete_deploy_key(key))
+        self.assertEqual([key.name for key in self.run_async(self.client.get_deploy_keys())], [u"mock"])
+
+    def test_errors_are_raised(self):
+        self.assertRaises(ResourceNotFoundError, self.run_async, self.client.get('/masters/unknown'))
+
+    def test_concurrency_is_bounded(self):
+        transport = _SlowTransport(self.paas, 0.02)
+        client = AsyncApiClient(mock_client(self.paas), concurrency=4)
+        client.client.transport = transport
+        try:
+            # Distinct query strings, identical GETs would share one request
+            results = self.run_async(asyncio.gather(*[client.get('/masters', params={'page': page})
+                                                      for page in range(20)]))
+        finally:
+            client.close()
+        self.assertEqual(len(results), 20)
+        self.assertEqual(transport.max_in_flight, 4)
+
+    def test_concurrency_is_capped(self):
+        client = AsyncApiClient(mock_client(self.paas), concurrency=10000)
+        client.close()
+        self.assertEqual(client.concurrency, MAX_CONCURRENCY)
+        self.assertRaises(ValueError, AsyncApiClient, mock_client(self.paas), 0)
+
+    def test_watch(self):
+        master = self.run_async(self.client.get_masters())[0]
+        watcher = CertificateWatcher([master], min_interval=0.01, max_interval=0.01)
+        # The events are handed to a running loop only
+        self.assertRaises(RuntimeError, self.client.watch, watcher)
+        self.assertFalse(watcher.running)
+        events = self.call_in_loop(lambda: self.client.watch(watcher))
+        try:
+            self.assertTrue(watcher.running)
+            hostnames = [self.run_async(events.__anext__()).hostname for _ in range(4)]
+        finally:
+            events.close()
+            watcher.stop(5)
+        self.assertEqual(sorted(hostnames), sorted(self.paas.certs[master.uuid]))
+
+
+if __name__ == '__main__':
+    unittest.main()
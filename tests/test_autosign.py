@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import os
+import threading
+import time
+import unittest
+
+from tests import MockPaaS, certificate_data, mock_client
+
+from ppaas.autosign import AutoSigner, FingerprintPolicy, HostnamePolicy, load_hook
+from ppaas.master import Master
+from ppaas.records import CertificateRecord
+
+
+class AutoSignerTestCase(unittest.TestCase):
+    def setUp(self):
+        # agent0 to agent5 pending, agent6 to agent9 signed
+        self.paas = MockPaaS(masters=1, certs=10, pending_ratio=0.6)
+        self.client = mock_client(self.paas)
+        self.master = Master.get_masters(self.client)[0]
+
+    def signer(self, policies=None, **kwargs):
+        if policies is None:
+            policies = [HostnamePolicy(r'^agent[0-3]\.')]
+        return AutoSigner([self.master], policies, **kwargs)
+
+    def status(self, hostname):
+        return self.paas.certs[self.master.uuid][hostname][u'status'][u'code']
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while not condition():
+            if time.time() > deadline:
+                self.fail("Timed out")
+            time.sleep(0.01)
+
+
+class PolicyTest(unittest.TestCase):
+    def test_hostname(self):
+        record = CertificateRecord.from_dict(certificate_data(u'master0', 3))
+        self.assertTrue(HostnamePolicy(r'^agent\d+\.master0\.mock$')(None, record))
+        self.assertFalse(HostnamePolicy(r'^web')(None, record))
+
+    def test_fingerprint(self):
+        record = CertificateRecord.from_dict(certificate_data(u'master0', 3))
+        self.assertTrue(FingerprintPolicy([record.fingerprint.lower() + '\n'])(None, record))
+        self.assertFalse(FingerprintPolicy([])(None, record))
+
+
+class AutoSignerTest(AutoSignerTestCase):
+    def test_signs_the_accepted_pending_certificates(self):
+        signer = self.signer(batch_window=0.01)
+        signer.watcher.min_interval = signer.watcher.max_interval = 0.01
+        signer.start()
+        try:
+            self.wait_for(lambda: signer.stats.signed == 4)
+        finally:
+            signer.stop(5)
+        self.assertEqual([self.status(u'agent%d.master0.mock' % i) for i in range(6)], [1, 1, 1, 1, 0, 0])
+        self.assertEqual(signer.stats.rejected, 2)
+        self.assertEqual(signer.stats.failed, 0)
+
+    def test_require_all(self):
+        record = CertificateRecord.from_dict(certificate_data(u'master0', 1))
+        signer = self.signer([HostnamePolicy(r'^agent1\.'), FingerprintPolicy([])], require_all=True)
+        self.assertFalse(signer.submit(self.master, record))
+        signer = self.signer([HostnamePolicy(r'^agent1\.'), FingerprintPolicy([])])
+        self.assertTrue(signer.submit(self.master, record))
+
+    def test_certificates_are_decided_once_while_pending(self):
+        signer = self.signer()
+        record = CertificateRecord.from_dict(certificate_data(u'master0', 1))
+        self.assertTrue(signer.submit(self.master, record))
+        self.assertFalse(signer.submit(self.master, record))
+        self.assertEqual(signer.stats.duplicates, 1)
+
+    def test_signed_certificates_are_forgotten(self):
+        signer = self.signer(batch_window=0.01)
+        signer.watcher.min_interval = signer.watcher.max_interval = 0.01
+        signer.start()
+        try:
+            self.wait_for(lambda: signer.stats.signed == 4)
+            # The watcher reports them signed, only the 2 rejected ones stay
+            self.wait_for(lambda: len(signer._decided) == 2)
+        finally:
+            signer.stop(5)
+
+    def test_failed_signatures_do_not_block_the_signer(self):
+        # Nothing exists on the API side: every signature fails, and is
+        # retried while the queue is kept full
+        signer = self.signer([lambda master, certificate: True], queue_size=2, batch_size=2,
+                             batch_window=0.01, max_attempts=3, retry_delay=0.01)
+        thread = threading.Thread(target=signer.run)
+        thread.daemon = True
+        thread.start()
+        records = [CertificateRecord.from_dict(certificate_data(u'ghost', i)) for i in range(20)]
+        producer = threading.Thread(target=lambda: [signer.submit(self.master, record) for record in records])
+        producer.daemon = True
+        producer.start()
+        try:
+            producer.join(10)
+            self.assertFalse(producer.is_alive())
+            self.wait_for(lambda: signer.stats.failed == 20, timeout=10)
+        finally:
+            signer._stop.set()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(signer.stats.signed, 0)
+
+    def test_retried_signature(self):
+        signer = self.signer(retry_delay=0.01)
+        record = CertificateRecord.from_dict(certificate_data(u'master0', 2))
+        pending = self.paas.certs[self.master.uuid].pop(record.hostname)
+        report = signer.sign_batch([(self.master, record, time.time(), 1)])
+        self.assertEqual(len(report.failed), 1)
+        # Back on the API before the retry
+        self.paas.certs[self.master.uuid][record.hostname] = pending
+        time.sleep(0.02)
+        signer.sign_batch(signer._next_batch())
+        self.assertEqual(signer.stats.signed, 1)
+        self.assertEqual(self.status(record.hostname), 1)
+
+    def test_signatures_fail_after_max_attempts(self):
+        signer = self.signer(max_attempts=2, retry_delay=0.01)
+        record = CertificateRecord.from_dict(certificate_data(u'ghost', 0))
+        signer.sign_batch([(self.master, record, time.time(), 1)])
+        time.sleep(0.02)
+        signer.sign_batch(signer._next_batch())
+        self.assertEqual(signer.stats.failed, 1)
+        self.assertTrue(signer.queue.empty())
+        self.assertEqual(signer.stats.to_dict()['failed'], 1)
+
+
+class LoadHookTest(unittest.TestCase):
+    def test_load_hook(self):
+        self.assertIs(load_hook('os.path:join'), os.path.join)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import time
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.bulk import BulkReport, run_bulk
+from ppaas.client import ResourceNotFoundError
+from ppaas.master import Master
+
+
+class BulkTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=1, certs=10, pending_ratio=0.6)
+        self.master = Master.get_masters(mock_client(self.paas))[0]
+        self.certs = self.paas.certs[self.master.uuid]
+        self.paas.reset_calls()
+
+    def statuses(self):
+        return sorted(cert[u"status"][u"message"] for cert in self.certs.values())
+
+    def test_sign_every_pending_certificate(self):
+        report = self.master.sign_certificates()
+        self.assertEqual(len(report.succeeded), 6)
+        self.assertEqual(report.failed, {})
+        self.assertEqual(self.statuses(), [u"SIGNED"] * 10)
+        calls = self.paas.reset_calls()
+        self.assertEqual([call for call in calls if call[0] == 'GET'],
+                         [('GET', '/masters/%s/certs' % self.master.uuid)])
+
+    def test_select_by_hostname(self):
+        report = self.master.revoke_certificates([u"agent9.master0.mock", u"unknown.mock"])
+        self.assertEqual(report.succeeded, [u"agent9.master0.mock"])
+        self.assertEqual(list(report.failed), [u"unknown.mock"])
+        self.assertIsInstance(report.failed[u"unknown.mock"], ResourceNotFoundError)
+        self.assertEqual(self.certs[u"agent9.master0.mock"][u"status"][u"message"], u"REVOKED")
+
+    def test_select_by_predicate(self):
+        report = self.master.delete_certificates(lambda cert: cert.hostname.startswith(u"agent1"))
+        self.assertEqual(report.succeeded, [u"agent1.master0.mock"])
+        self.assertEqual(len(self.certs), 9)
+
+    def test_reload(self):
+        report = self.master.sign_certificates(predicate=lambda cert: cert.hostname == u"agent0.master0.mock",
+                                               reload=True)
+        self.assertEqual(report[u"agent0.master0.mock"].result, None)
+        self.assertEqual(len([call for call in self.paas.reset_calls() if call[0] == 'GET']), 2)
+
+    def test_nothing_selected(self):
+        report = self.master.revoke_certificates(lambda cert: False)
+        self.assertEqual(len(report), 0)
+        self.assertEqual(repr(report), "<Bulk revoke report: 0 succeeded, 0 failed>")
+
+
+class RunBulkTest(unittest.TestCase):
+    def test_errors_do_not_stop_the_other_items(self):
+        def operation(item):
+            if item % 3 == 0:
+                raise ValueError(item)
+            return item * 2
+
+        report = run_bulk('double', range(10), operation)
+        self.assertEqual(sorted(report.succeeded), [1, 2, 4, 5, 7, 8])
+        self.assertEqual(sorted(report.failed), [0, 3, 6, 9])
+        self.assertEqual(report[4].result, 8)
+        self.assertFalse(report[3].ok)
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def operation(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        run_bulk('wait', range(20), operation, max_workers=3)
+        self.assertEqual(running[1], 3)
+
+    def test_given_report_is_completed(self):
+        report = BulkReport('sign')
+        self.assertIs(run_bulk('sign', [1], lambda item: item, key=str, report=report), report)
+        self.assertEqual(report.succeeded, ['1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
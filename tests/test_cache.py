@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+
+from tests import MockPaaS, MockTransport, mock_client
+
+from ppaas.cache import ResponseCache, copy_response
+from ppaas.master import Master
+
+
+class _MutatingTransport(MockTransport):
+    """Runs `mutation` while the next GET is in flight, after the server answered"""
+    mutation = None
+
+    def request(self, method, url, **kwargs):
+        response = MockTransport.request(self, method, url, **kwargs)
+        mutation, self.mutation = self.mutation, None
+        if method == 'GET' and mutation is not None:
+            mutation()
+        return response
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=1, certs=4)
+        self.uuid = sorted(self.paas.masters)[0]
+        self.path = '/masters/%s/certs' % self.uuid
+
+    def client(self, ttls=None):
+        return mock_client(self.paas, cache=ResponseCache(ttls=ttls))
+
+    def test_fresh_entry_is_served_without_request(self):
+        client = self.client()
+        first, _ = client.get(self.path)
+        second, _ = client.get(self.path)
+        self.assertIs(first, second)
+        self.assertEqual(self.paas.reset_calls(), [('GET', self.path)])
+
+    def test_expired_entry_is_revalidated_with_its_etag(self):
+        client = self.client(ttls={})
+        first, _ = client.get(self.path)
+        second, _ = client.get(self.path)
+        # The mock answers 304 to the second request, the body is not sent again
+        self.assertIs(first, second)
+        self.assertEqual(len(self.paas.reset_calls()), 2)
+
+    def test_changed_resource_is_fetched_again(self):
+        client = self.client(ttls={})
+        first, _ = client.get(self.path)
+        self.paas.certificate_action('POST', {}, None, self.uuid, u'agent0.master0.mock', 'sign')
+        second, _ = client.get(self.path)
+        self.assertIsNot(first, second)
+        statuses = dict((cert['hostname'], cert['status']['code']) for cert in second['certs'])
+        self.assertEqual(statuses[u'agent0.master0.mock'], 1)
+
+    def test_bypass(self):
+        client = self.client()
+        client.get(self.path)
+        client.get(self.path, cache=False)
+        self.assertEqual(len(self.paas.reset_calls()), 2)
+
+    def test_mutation_invalidates_the_master(self):
+        client = self.client()
+        client.get(self.path)
+        client.post('/masters/%s/certs/agent0.master0.mock/sign' % self.uuid)
+        client.get(self.path)
+        self.assertEqual([call[1] for call in self.paas.reset_calls()].count(self.path), 2)
+
+    def test_mutation_during_a_fetch(self):
+        client = self.client()
+        client.transport = transport = _MutatingTransport(self.paas)
+        hostname = u'agent0.master0.mock'
+        transport.mutation = lambda: client.post('/masters/%s/certs/%s/sign' % (self.uuid, hostname))
+        first, _ = client.get(self.path)
+        # Answered before the signature, the listing was not cached
+        statuses = dict((cert['hostname'], cert['status']['code']) for cert in first['certs'])
+        self.assertEqual(statuses[hostname], 0)
+        second, _ = client.get(self.path)
+        statuses = dict((cert['hostname'], cert['status']['code']) for cert in second['certs'])
+        self.assertEqual(statuses[hostname], 1)
+
+    def test_generations(self):
+        cache = ResponseCache()
+        key = cache.key(self.path)
+        generation = cache.generation(self.path)
+        self.assertEqual(cache.generation(self.path), generation)
+        cache.invalidate('/masters/%s' % self.uuid)
+        cache.store(key, {'certs': []}, 200, generation=generation)
+        self.assertIsNone(cache.get(key))
+        cache.store(key, {'certs': []}, 200, generation=cache.generation(self.path))
+        self.assertIsNotNone(cache.get(key))
+
+        generation = cache.generation(self.path)
+        cache.invalidate()
+        cache.store(key, {'certs': []}, 200, generation=generation)
+        self.assertIsNone(cache.get(key))
+
+        generation = cache.generation('/masters')
+        cache.invalidate_related(self.path + '/agent0/sign')
+        self.assertNotEqual(cache.generation('/masters'), generation)
+        generation = cache.generation('/deploy-keys')
+        cache.invalidate('/masters')
+        self.assertEqual(cache.generation('/deploy-keys'), generation)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(ttls={'/a/*': 60}, max_entries=2)
+        for name in ('x', 'y', 'z'):
+            cache.store(cache.key('/a/%s' % name), {'name': name}, 200)
+        self.assertIsNone(cache.get(cache.key('/a/x')))
+        self.assertEqual(cache.get(cache.key('/a/z')).result, {'name': 'z'})
+
+    def test_master_certificates_are_copies(self):
+        client = self.client()
+        master = Master.get_masters(client)[0]
+        certificates = master.certificates
+        certificates.pop()
+        certificates[0]['hostname'] = 'changed'
+        again = master.certificates
+        self.assertEqual(len(again), 4)
+        self.assertNotEqual(again[0]['hostname'], 'changed')
+
+    def test_copy_response(self):
+        data = {'certs': [{'status': {'code': 0}}], 'count': 1}
+        copy = copy_response(data)
+        copy['certs'][0]['status']['code'] = 1
+        self.assertEqual(data['certs'][0]['status']['code'], 0)
+        self.assertEqual(copy_response('text'), 'text')
+
+
+if __name__ == '__main__':
+    unittest.main()
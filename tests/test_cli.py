@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import errno
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+from ppaas.cli import Daemon, build_parser, forward, main, run
+
+
+class _Output(object):
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix sockets are needed")
+class ForwardTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'sock')
+        self.stdout, self.stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = _Output(), _Output()
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        shutil.rmtree(self.directory)
+
+    def serve_once(self, answer):
+        """Serves a single connection of a fake daemon, answering `answer`"""
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(1)
+        requests = []
+
+        def serve():
+            connection, _ = server.accept()
+            requests.append(connection.recv(65536))
+            connection.sendall(answer)
+            connection.close()
+            server.close()
+
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+        return thread, requests
+
+    def test_no_daemon(self):
+        self.assertIsNone(forward(self.path, ['list']))
+
+    def test_broken_answer_is_not_run_again(self):
+        thread, requests = self.serve_once(b'')
+        # None would make main() run the command a second time, locally
+        self.assertEqual(forward(self.path, ['sign', 'master1']), 1)
+        thread.join(5)
+        self.assertEqual(len(requests), 1)
+        self.assertIn('may or may not have run', sys.stderr.getvalue())
+
+    def test_truncated_answer(self):
+        thread, _ = self.serve_once(b'{"status": 0, "stdo')
+        self.assertEqual(forward(self.path, ['revoke', 'master1', 'agent']), 1)
+        thread.join(5)
+
+    def test_refused_command_runs_locally(self):
+        thread, _ = self.serve_once(b'{"status": null}\n')
+        self.assertIsNone(forward(self.path, ['list']))
+        thread.join(5)
+
+    def test_daemon(self):
+        daemon = Daemon(self.path)
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            self.assertEqual(forward(self.path, ['--help']), 0)
+            self.assertIn('usage: ppaas', sys.stdout.getvalue())
+            self.assertEqual(forward(self.path, ['bogus']), 2)
+        finally:
+            daemon.shutdown()
+            daemon.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_daemon_replaces_a_stale_socket(self):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+        daemon = Daemon(self.path)
+        daemon.close()
+
+    def test_daemon_keeps_a_live_socket(self):
+        daemon = Daemon(self.path)
+        try:
+            with self.assertRaises(socket.error) as raised:
+                Daemon(self.path)
+            self.assertEqual(raised.exception.errno, errno.EADDRINUSE)
+            self.assertTrue(os.path.exists(self.path))
+        finally:
+            daemon.close()
+
+    def test_daemon_keeps_other_files(self):
+        with open(self.path, 'w') as output:
+            output.write('data')
+        with self.assertRaises(socket.error) as raised:
+            Daemon(self.path)
+        self.assertEqual(raised.exception.errno, errno.EEXIST)
+        self.assertTrue(os.path.isfile(self.path))
+
+    def test_main_forwards_with_socket_equals(self):
+        thread, requests = self.serve_once(b'{"status": 0, "stdout": "forwarded\\n", "stderr": ""}\n')
+        self.assertEqual(main(['--socket=%s' % self.path, 'list']), 0)
+        thread.join(5)
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(sys.stdout.getvalue(), 'forwarded\n')
+
+
+class RunTest(unittest.TestCase):
+    def test_usage_errors(self):
+        stdout, stderr = _Output(), _Output()
+        self.assertEqual(run(['bogus'], stdout, stderr), 2)
+        self.assertEqual(run(['deploy-keys', 'delete'], stdout, stderr), 2)
+        self.assertIn('a name is required', stderr.getvalue())
+        self.assertEqual(run(['revoke', 'master1'], stdout, stderr), 2)
+        self.assertEqual(run(['rollout'], stdout, stderr), 2)
+        self.assertIn('--source', stderr.getvalue())
+
+    def test_daemon_needs_a_socket(self):
+        stdout, stderr = _Output(), _Output()
+        environment = os.environ.pop('PPAAS_SOCKET', None)
+        try:
+            self.assertEqual(run(['daemon'], stdout, stderr), 2)
+        finally:
+            if environment is not None:
+                os.environ['PPAAS_SOCKET'] = environment
+        self.assertIn('--socket', stderr.getvalue())
+
+    def test_help(self):
+        stdout, stderr = _Output(), _Output()
+        self.assertEqual(run(['--help'], stdout, stderr), 0)
+        self.assertIn('usage: ppaas', stdout.getvalue())
+
+    def test_options_after_the_command(self):
+        parser = build_parser()
+        self.assertTrue(parser.parse_args(['list', '--json']).json)
+        self.assertTrue(parser.parse_args(['--json', 'deploy-keys']).json)
+        self.assertTrue(parser.parse_args(['deploy-keys', 'list', '--json']).json)
+        self.assertFalse(parser.parse_args(['list']).json)
+        self.assertEqual(parser.parse_args(['daemon', '--socket', 'sock']).socket, 'sock')
+        self.assertEqual(parser.parse_args(['--socket', 'sock', 'daemon']).socket, 'sock')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.client import ConfigurationNotFoundException, get_default_client, load_config
+from ppaas.deploy_key import DeployKey
+from ppaas.master import Master
+
+
+class ConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.home = os.environ.get('HOME')
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'cwd'))
+        os.makedirs(os.path.join(self.directory, 'home'))
+        os.chdir(os.path.join(self.directory, 'cwd'))
+        os.environ['HOME'] = os.path.join(self.directory, 'home')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        if self.home is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = self.home
+        shutil.rmtree(self.directory)
+
+    def write_config(self, path, endpoint, mtime=None):
+        with open(path, 'w') as conf:
+            conf.write("[auth]\nuser = user\npass = pass\n[api]\nendpoint = %s\n" % endpoint)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_configuration_is_parsed_once(self):
+        self.write_config('ppaas.conf', 'http://one')
+        self.assertIs(load_config(), load_config())
+
+    def test_changed_configuration_is_parsed_again(self):
+        self.write_config('ppaas.conf', 'http://one', 1000000000)
+        conf = load_config()
+        self.write_config('ppaas.conf', 'http://two', 1000000010)
+        self.assertIsNot(load_config(), conf)
+        self.assertEqual(load_config().get('api', 'endpoint'), 'http://two')
+
+    def test_lookup_order(self):
+        self.write_config(os.path.join(os.environ['HOME'], '.ppaas.conf'), 'http://home')
+        self.write_config('ppaas.conf', 'http://cwd')
+        self.assertEqual(load_config().get('api', 'endpoint'), 'http://cwd')
+        os.remove('ppaas.conf')
+        self.assertEqual(load_config().get('api', 'endpoint'), 'http://home')
+
+    @unittest.skipIf(os.path.exists('/etc/ppaas.conf'), "/etc/ppaas.conf exists")
+    def test_no_configuration(self):
+        self.assertRaises(ConfigurationNotFoundException, load_config)
+
+    def test_default_client(self):
+        self.write_config('ppaas.conf', 'http://one', 1000000000)
+        client = get_default_client()
+        self.assertIs(get_default_client(), client)
+        self.assertEqual(client.endpoint, 'http://one')
+        self.write_config('ppaas.conf', 'http://two', 1000000010)
+        self.assertIsNot(get_default_client(), client)
+        self.assertEqual(get_default_client().endpoint, 'http://two')
+
+
+class SharedClientTest(unittest.TestCase):
+    def test_objects_use_the_client_they_come_from(self):
+        client = mock_client(MockPaaS(masters=2, certs=4))
+        masters = Master.get_masters(client)
+        self.assertEqual(len(masters), 2)
+        self.assertTrue(all(master.client is client for master in masters))
+        certificates = masters[0].get_certificates()
+        self.assertEqual(len(certificates), 4)
+        self.assertTrue(all(certificate.client is client for certificate in certificates))
+        self.assertTrue(all(key.client is client for key in DeployKey.get_deploy_keys(client)))
+
+
+if __name__ == '__main__':
+    unittest.main()
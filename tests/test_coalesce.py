@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import time
+import unittest
+
+from tests import MockPaaS, MockTransport, mock_client
+
+from ppaas.coalesce import SingleFlight
+from ppaas.master import Master
+
+
+class _BlockingTransport(MockTransport):
+    """Holds the first GET of `path` until released, once the server answered it"""
+    def __init__(self, paas, path):
+        MockTransport.__init__(self, paas)
+        self.path = path
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def request(self, method, url, **kwargs):
+        response = MockTransport.request(self, method, url, **kwargs)
+        if method == 'GET' and url.endswith(self.path) and not self.started.is_set():
+            self.started.set()
+            self.release.wait(5)
+        return response
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def call():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do('key', call)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do('key', call))) for _ in range(4)]
+        for follower in followers:
+            follower.start()
+        # Let the followers join the flight before it lands
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(len(flights), 0)
+
+    def test_errors_are_shared_and_not_remembered(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise KeyError('boom')
+
+        self.assertRaises(KeyError, flights.do, 'key', fail)
+        self.assertEqual(flights.do('key', lambda: 'ok'), 'ok')
+
+    def test_detach(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def call():
+            started.set()
+            release.wait(5)
+            return 'old'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do(('/a', ()), call)))
+        leader.start()
+        started.wait(5)
+        flights.detach(lambda key: key[0] == '/a')
+        self.assertEqual(len(flights), 0)
+        # Not joined, and the old flight does not remove the new one when it lands
+        follower = threading.Thread(target=lambda: results.append(flights.do(('/a', ()), lambda: 'new')))
+        follower.start()
+        follower.join(5)
+        release.set()
+        leader.join(5)
+        self.assertEqual(results, ['new', 'old'])
+
+
+class CoalescingTest(unittest.TestCase):
+    def test_concurrent_gets_send_one_request(self):
+        paas = MockPaaS(masters=1, certs=10, latency=0.05)
+        client = mock_client(paas)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.get('/masters')[0])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertLess(len(paas.reset_calls()), 8)
+
+    def blocked_get(self, client, path):
+        """Starts a GET of `path` held by the transport once answered"""
+        client.transport = transport = _BlockingTransport(client.transport.paas, path)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(client.get(path)[0]))
+        thread.start()
+        self.assertTrue(transport.started.wait(5))
+        return transport, thread, results
+
+    def test_bypass_does_not_join_a_flight(self):
+        paas = MockPaaS(masters=1, certs=2, pending_ratio=1)
+        client = mock_client(paas)
+        uuid = sorted(paas.masters)[0]
+        path = '/masters/%s/certs' % uuid
+        transport, thread, results = self.blocked_get(client, path)
+        paas.certificate_action('POST', {}, None, uuid, u'agent0.master0.mock', 'sign')
+        try:
+            fresh, _ = client.get(path, cache=False)
+        finally:
+            transport.release.set()
+            thread.join(5)
+        self.assertEqual(set(cert['status']['code'] for cert in fresh['certs']), set([0, 1]))
+        self.assertEqual(set(cert['status']['code'] for cert in results[0]['certs']), set([0]))
+
+    def test_reload_after_a_mutation_does_not_join_an_older_flight(self):
+        paas = MockPaaS(masters=1, certs=2, pending_ratio=1)
+        client = mock_client(paas)
+        uuid = sorted(paas.masters)[0]
+        hostname = u'agent0.master0.mock'
+        certificate = Master(uuid, client=client).certificate(hostname)
+        transport, thread, results = self.blocked_get(client, '/masters/%s/certs/%s' % (uuid, hostname))
+        try:
+            certificate.sign()
+            self.assertEqual(certificate.status, 1)
+        finally:
+            transport.release.set()
+            thread.join(5)
+        self.assertEqual(results[0]['status']['code'], 0)
+
+    def test_batched_signatures(self):
+        paas = MockPaaS(masters=1, certs=20, pending_ratio=1)
+        client = mock_client(paas, batch_window=0.05)
+        master = Master.get_masters(client)[0]
+        report = master.sign_certificates()
+        self.assertEqual(len(report.succeeded), 20)
+        self.assertFalse(report.failed)
+        statuses = set(cert['status']['code'] for cert in paas.certs[master.uuid].values())
+        self.assertEqual(statuses, set([1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+import gzip
+import io
+import unittest
+
+from tests import MockPaaS, MockTransport, mock_client
+
+from ppaas import codec
+from ppaas.codec import Body, dumps, gzip_compress, loads
+from ppaas.deploy_key import DeployKey
+from ppaas.scheduler import RetryPolicy, Scheduler
+
+
+class _RecordingTransport(MockTransport):
+    """Keeps the headers and the body of every request"""
+    def __init__(self, paas):
+        MockTransport.__init__(self, paas)
+        self.sent = []
+
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        if hasattr(data, 'read'):
+            data = data.read()
+        self.sent.append((dict(headers or {}), data))
+        return MockTransport.request(self, method, url, data=data, headers=headers, **kwargs)
+
+
+class _ThrottledPaaS(MockPaaS):
+    """Answers the first request with a 429"""
+    throttled = False
+
+    def handle(self, method, path, query=None, headers=None, body=None):
+        if not self.throttled:
+            self.throttled = True
+            return 429, {'Retry-After': '0'}, {u"message": u"Slow down"}
+        return MockPaaS.handle(self, method, path, query, headers, body)
+
+
+class CodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = {u'name': u'caf\xe9', u'nb': 2, u'vars': [None, True]}
+        self.assertEqual(loads(dumps(data)), data)
+        self.assertEqual(loads(dumps(data).decode('utf-8')), data)
+        self.assertNotIn(b', ', dumps(data))
+        self.assertRaises(ValueError, loads, b'{"name": ')
+
+    def test_without_orjson(self):
+        backend = codec.orjson
+        codec.orjson = None
+        try:
+            self.assertEqual(codec.json_backend(), 'json')
+            self.assertEqual(dumps({u'name': u'caf\xe9'}), u'{"name":"caf\xe9"}'.encode('utf-8'))
+            self.assertEqual(loads(b'{"certs":[]}'), {u'certs': []})
+        finally:
+            codec.orjson = backend
+        self.assertEqual(codec.json_backend(), 'json' if backend is None else 'orjson')
+
+    def test_gzip(self):
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(gzip_compress(b'x' * 100))).read(), b'x' * 100)
+
+
+class BodyTest(unittest.TestCase):
+    def test_small_body(self):
+        body = Body({u'name': u'web'}, compress_threshold=4096)
+        self.assertEqual(body.headers, {'Content-Type': 'application/json'})
+        self.assertFalse(body.streamed)
+        self.assertEqual(body.data(), dumps({u'name': u'web'}))
+
+    def test_compressed_body(self):
+        data = {u'hierarchy': [u'node/%d' % i for i in range(1000)]}
+        body = Body(data, compress_threshold=4096)
+        self.assertEqual(body.headers['Content-Encoding'], 'gzip')
+        self.assertLess(len(body), len(dumps(data)))
+        self.assertEqual(loads(gzip.GzipFile(fileobj=io.BytesIO(body.data())).read()), data)
+        self.assertNotIn('Content-Encoding', Body(data).headers)
+
+    def test_streamed_body(self):
+        body = Body([u'x' * 1024] * 1100)
+        self.assertTrue(body.streamed)
+        first, second = body.data(), body.data()
+        self.assertEqual(first.read(), body.content)
+        # Every attempt reads a file object of its own
+        self.assertEqual(second.read(), body.content)
+
+
+class RequestBodyTest(unittest.TestCase):
+    def test_bodies_are_sent(self):
+        paas = MockPaaS(masters=1, certs=0)
+        client = mock_client(paas)
+        client.transport = transport = _RecordingTransport(paas)
+        key = DeployKey.create_deploy_key(u'web', client)
+        self.assertEqual(key.name, u'web')
+        self.assertIn(u'web', paas.deploy_keys)
+        headers, data = transport.sent[-1]
+        self.assertEqual(headers['Content-Type'], 'application/json')
+        self.assertEqual(loads(data), {u'name': u'web'})
+
+    def test_compressed_bodies_are_sent(self):
+        paas = MockPaaS(masters=1, certs=0)
+        client = mock_client(paas, compress_threshold=8)
+        client.transport = transport = _RecordingTransport(paas)
+        DeployKey.create_deploy_key(u'a-long-enough-name', client)
+        self.assertIn(u'a-long-enough-name', paas.deploy_keys)
+        self.assertEqual(transport.sent[-1][0]['Content-Encoding'], 'gzip')
+
+    def test_retries_send_the_same_body(self):
+        paas = _ThrottledPaaS(masters=1, certs=0)
+        client = mock_client(paas, scheduler=Scheduler(retry=RetryPolicy(backoff_factor=0.001)))
+        client.transport = transport = _RecordingTransport(paas)
+        client.post('/deploy-keys', {u'name': u'web'})
+        self.assertEqual(len(transport.sent), 2)
+        self.assertEqual(transport.sent[0][1], transport.sent[1][1])
+        self.assertIn(u'web', paas.deploy_keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
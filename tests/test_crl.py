@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import datetime
+import unittest
+
+from tests import MockPaaS, crl_pem, mock_client
+
+from ppaas.cache import ResponseCache
+from ppaas.client import InvalidResponse
+from ppaas.crl import CrlIndex, RevocationList, decode_crl
+from ppaas.master import Master
+
+
+class RevocationListTest(unittest.TestCase):
+    def test_parse(self):
+        pem = crl_pem([(5, u"2015-12-08T09:00:00"), (300, u"2016-01-02T03:04:05")], 7)
+        revocations = RevocationList.parse(pem)
+        self.assertEqual(revocations.serials, frozenset([5, 300]))
+        self.assertEqual(revocations.revoked_at[300], datetime.datetime(2016, 1, 2, 3, 4, 5))
+        self.assertEqual(revocations.number, 7)
+        self.assertEqual(revocations.this_update, datetime.datetime(2016, 1, 1))
+        self.assertTrue(revocations.is_revoked(5))
+        self.assertFalse(revocations.is_revoked(6))
+        self.assertIn(300, revocations)
+        self.assertEqual(len(revocations), 2)
+
+    def test_parse_der_and_empty(self):
+        der = decode_crl(crl_pem([], 1))
+        revocations = RevocationList.parse(der)
+        self.assertEqual(len(revocations), 0)
+        self.assertEqual(revocations.number, 1)
+
+    def test_garbage_is_refused(self):
+        self.assertRaises(InvalidResponse, RevocationList.parse, b'\x30\x03\x02\x01')
+
+
+class CrlIndexTest(unittest.TestCase):
+    def setUp(self):
+        # 2 pending, 3 signed certificates
+        self.paas = MockPaaS(masters=1, certs=5, pending_ratio=0.4)
+        self.client = mock_client(self.paas, cache=ResponseCache())
+        self.master = Master.get_masters(self.client)[0]
+
+    def test_revocations_follow_the_api(self):
+        index = CrlIndex()
+        certificate = self.master.certificate(u'agent3.master0.mock')
+        self.assertFalse(index.is_revoked(self.master, certificate.serial_number))
+        certificate.revoke()
+        index.invalidate(self.master)
+        self.assertTrue(index.is_revoked(self.master, certificate.serial_number))
+
+    def test_unchanged_crl_is_not_parsed_again(self):
+        index = CrlIndex()
+        first = index.refresh(self.master)
+        self.assertIs(index.refresh(self.master), first)
+
+    def test_cross_check(self):
+        index = CrlIndex()
+        self.assertEqual(index.cross_check(self.master), [])
+        # Revoked behind the back of the CRL
+        self.paas.certs[self.master.uuid][u'agent4.master0.mock'][u'status'] = {u"code": 2, u"message": u"REVOKED"}
+        self.client.cache.invalidate()
+        mismatches = index.cross_check(self.master, Master.get_masters(self.client)[0].get_certificates())
+        self.assertEqual([(certificate.hostname, reason) for certificate, reason in mismatches],
+                         [(u'agent4.master0.mock', 'revoked but not in the CRL')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.bulk import iter_bulk
+from ppaas.client import ResourceNotFoundError
+from ppaas.fleet import Fleet
+
+
+class FleetTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=4, certs=3)
+        self.client = mock_client(self.paas)
+        self.fleet = Fleet(client=self.client, max_workers=2)
+        self.paas.reset_calls()
+
+    def names(self, masters):
+        return sorted(master.name for master in masters)
+
+    def test_every_master(self):
+        self.assertEqual(len(self.fleet), 4)
+        self.assertEqual(repr(self.fleet), "<Fleet of 4 masters>")
+        self.assertEqual(self.names(self.fleet), [u"master0", u"master1", u"master2", u"master3"])
+
+    def test_filter(self):
+        fleet = self.fleet.filter(name=u"master2")
+        self.assertEqual(self.names(fleet), [u"master2"])
+        fleet = self.fleet.filter(lambda master: master.name != u"master0", type=u"standard")
+        self.assertEqual(self.names(fleet), [u"master1", u"master2", u"master3"])
+        self.assertEqual(len(self.fleet.filter(type=u"other")), 0)
+        self.assertEqual(self.paas.reset_calls(), [])
+
+    def test_failures_do_not_stop_the_other_masters(self):
+        broken = [master for master in self.fleet if master.name == u"master1"][0]
+        del self.paas.masters[broken.uuid]
+        report = self.fleet.environments()
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertEqual(list(report.failed), [broken])
+        self.assertIsInstance(report.failed[broken], ResourceNotFoundError)
+
+    def test_helpers(self):
+        self.assertEqual(len(self.fleet.refresh().succeeded), 4)
+        self.assertEqual(len(self.fleet.restart().succeeded), 4)
+        report = self.fleet.get_certificates(status="SIGNED")
+        self.assertEqual(sorted(len(result.result) for result in report), [2, 2, 2, 2])
+        refreshes = [call for call in self.paas.reset_calls() if call[1].endswith('/refresh')]
+        self.assertEqual(len(refreshes), 4)
+
+    def test_find_certificate(self):
+        certificate = self.fleet.find_certificate(u"agent1.master2.mock")
+        self.assertEqual(certificate.master.name, u"master2")
+        self.assertTrue(all(call[1].endswith('/certs/agent1.master2.mock') for call in self.paas.reset_calls()))
+        self.assertIsNone(self.fleet.find_certificate(u"unknown.mock"))
+
+    def test_imap(self):
+        results = list(self.fleet.imap(lambda master: master.name))
+        self.assertEqual(sorted(result.result for result in results), self.names(self.fleet))
+        self.assertEqual(set(result.key for result in results), set(self.fleet))
+
+
+class IterBulkTest(unittest.TestCase):
+    def test_closing_cancels_the_pending_operations(self):
+        started = []
+        release = threading.Event()
+
+        def operation(item):
+            started.append(item)
+            if item:
+                release.wait(5)
+            return item
+
+        results = iter_bulk(range(10), operation, max_workers=2)
+        first = next(results)
+        results.close()
+        release.set()
+        self.assertEqual(first.result, 0)
+        self.assertLessEqual(len(started), 3)
+
+    def test_nothing_to_do(self):
+        self.assertEqual(list(iter_bulk([], lambda item: item)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
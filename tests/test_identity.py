@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import gc
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.deploy_key import DeployKey
+from ppaas.identity import CERTIFICATES, get_identity_map
+from ppaas.master import Master, get_master_index
+
+
+class IdentityMapTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=2, certs=3)
+        self.client = mock_client(self.paas)
+
+    def test_one_object_per_master(self):
+        masters = Master.get_masters(self.client)
+        self.assertIs(Master.get_master(masters[0].name, self.client), masters[0])
+        self.assertIs(Master.get_masters(self.client)[1], masters[1])
+
+    def test_listing_updates_the_shared_object(self):
+        master = Master.get_masters(self.client)[0]
+        self.paas.masters[master.uuid][u'source'] = u'git@github.com:mock/moved.git'
+        Master.get_masters(self.client)
+        self.assertEqual(master.source, u'git@github.com:mock/moved.git')
+
+    def test_stale_index_does_not_overwrite_a_reload(self):
+        master = Master.get_master(u'master0', self.client)
+        self.assertTrue(get_master_index(self.client).fresh)
+        self.paas.masters[master.uuid][u'source'] = u'git@github.com:mock/moved.git'
+        master.reload_data()
+        self.paas.reset_calls()
+        # Served from the index, listed before the reload
+        self.assertIs(Master.get_master(u'master0', self.client), master)
+        self.assertEqual(self.paas.reset_calls(), [])
+        self.assertEqual(master.source, u'git@github.com:mock/moved.git')
+
+    def test_one_object_per_certificate(self):
+        master = Master.get_masters(self.client)[0]
+        certificates = master.get_certificates()
+        self.assertIs(master.certificate(certificates[0].hostname), certificates[0])
+        self.assertIs(master.get_certificates()[1], certificates[1])
+
+    def test_certificates_are_not_kept_alive(self):
+        master = Master.get_masters(self.client)[0]
+        certificates = master.get_certificates()
+        hostname = certificates[0].hostname
+        identity = get_identity_map(self.client)
+        self.assertIsNotNone(identity.get(CERTIFICATES, (master.uuid, hostname)))
+        del certificates
+        gc.collect()
+        self.assertIsNone(identity.get(CERTIFICATES, (master.uuid, hostname)))
+
+    def test_deploy_keys(self):
+        master = Master.get_masters(self.client)[0]
+        key = master.deploy_key_obj
+        self.assertIs(DeployKey.resolve(u'mock', self.client), key)
+        self.assertIs(DeployKey.get_deploy_keys(self.client)[0], key)
+        key.delete()
+        self.assertIsNone(get_identity_map(self.client).get('deploy_keys', u'mock'))
+
+    def test_clients_do_not_share_objects(self):
+        other = mock_client(self.paas)
+        self.assertIsNot(Master.get_masters(self.client)[0], Master.get_masters(other)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
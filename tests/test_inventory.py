@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import datetime
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.master import Master
+
+
+class InventoryTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=1, certs=6, pending_ratio=0.5)
+        self.master = Master.get_masters(mock_client(self.paas))[0]
+        for i, cert in enumerate(sorted(self.paas.certs[self.master.uuid].values(), key=lambda c: c[u"hostname"])):
+            cert[u"created_at"] = u"2016-01-%02dT12:00:00" % (i + 1)
+        self.inventory = self.master.get_inventory()
+        self.paas.reset_calls()
+
+    def hostnames(self, certificates):
+        return sorted(cert.hostname for cert in certificates)
+
+    def test_lookups_cost_one_listing(self):
+        self.assertIn(u"agent0.master0.mock", self.inventory)
+        self.assertNotIn(u"unknown.mock", self.inventory)
+        self.assertEqual(len(self.inventory), 6)
+        self.assertEqual(self.inventory[u"agent4.master0.mock"].hostname, u"agent4.master0.mock")
+        self.assertIsNone(self.inventory.get(u"unknown.mock"))
+        self.assertEqual(self.hostnames(self.inventory.by_status(0)),
+                         [u"agent0.master0.mock", u"agent1.master0.mock", u"agent2.master0.mock"])
+        self.assertEqual(self.hostnames(self.inventory.by_status(u"SIGNED")),
+                         [u"agent3.master0.mock", u"agent4.master0.mock", u"agent5.master0.mock"])
+        fingerprint = self.paas.certs[self.master.uuid][u"agent2.master0.mock"][u"fingerprint"]
+        self.assertEqual(self.inventory.by_fingerprint(fingerprint).hostname, u"agent2.master0.mock")
+        self.assertIs(self.master.certificate(u"agent2.master0.mock"), self.inventory[u"agent2.master0.mock"])
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/masters/%s/certs' % self.master.uuid)])
+
+    def test_ranges_include_their_bounds(self):
+        self.assertEqual(self.hostnames(self.inventory.created_between(u"2016-01-02T12:00:00", u"2016-01-04T12:00:00")),
+                         [u"agent1.master0.mock", u"agent2.master0.mock", u"agent3.master0.mock"])
+        self.assertEqual(self.hostnames(self.inventory.created_between(end=datetime.datetime(2016, 1, 1, 12))),
+                         [u"agent0.master0.mock"])
+        self.assertEqual(len(self.inventory.created_between(start=u"2016-01-06T12:00:00")), 1)
+        self.assertEqual(len(self.inventory.created_between()), 6)
+        self.assertEqual(len(self.inventory.signed_between(end=u"2016-01-01T00:00:00")), 3)
+
+    def test_a_date_alone_covers_the_whole_day(self):
+        self.assertEqual(self.hostnames(self.inventory.created_between(u"2016-01-02", u"2016-01-04")),
+                         [u"agent1.master0.mock", u"agent2.master0.mock", u"agent3.master0.mock"])
+        self.assertEqual(self.hostnames(self.inventory.created_between(end=datetime.date(2016, 1, 1))),
+                         [u"agent0.master0.mock"])
+        self.assertEqual(self.inventory.created_between(u"2016-01-02T12:00:01", u"2016-01-02"), [])
+
+    def test_invalid_bounds(self):
+        self.assertRaises(ValueError, self.inventory.created_between, u"yesterday")
+        self.assertRaises(ValueError, self.inventory.signed_between, None, u"2016-13-01")
+
+    def test_updated_by_its_certificates(self):
+        pending = self.inventory.by_status(0)
+        pending[0].sign(reload=False)
+        self.assertEqual(len(self.inventory.by_status(0)), 2)
+        self.assertEqual(len(self.inventory.by_status(1)), 4)
+        self.inventory[u"agent5.master0.mock"].delete()
+        self.assertNotIn(u"agent5.master0.mock", self.inventory)
+        self.assertEqual(len(self.inventory.by_status(1)), 3)
+        self.master.sign_certificates()
+        self.assertEqual(self.inventory.by_status(0), [])
+
+    def test_invalidate(self):
+        self.assertEqual(len(self.inventory), 6)
+        # Deleted by another client, this one keeps its listing cached for a few seconds
+        del self.paas.certs[self.master.uuid][u"agent0.master0.mock"]
+        self.master.client.cache.invalidate()
+        self.assertIn(u"agent0.master0.mock", self.inventory)
+        self.assertIs(self.master.get_inventory(reload=True), self.inventory)
+        self.assertNotIn(u"agent0.master0.mock", self.inventory)
+
+
+if __name__ == '__main__':
+    unittest.main()
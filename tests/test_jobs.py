@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.client import ResourceNotFoundError
+from ppaas.fleet import Fleet
+from ppaas.jobs import RESTART, get_job_tracker, wait_jobs
+from ppaas.master import Master
+
+
+class UpToDatePaaS(MockPaaS):
+    """Deploys without moving the last update, like a refresh finding no new commit"""
+    def _settle(self, uuid):
+        last_update = self.last_updates[uuid]
+        MockPaaS._settle(self, uuid)
+        self.last_updates[uuid] = last_update
+
+
+class JobTestCase(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=10, certs=0, action_duration=0.05)
+        self.client = mock_client(self.paas)
+        tracker = get_job_tracker(self.client)
+        tracker.min_interval = tracker.max_interval = 0.01
+        self.masters = sorted(Master.get_masters(self.client), key=lambda master: master.name)
+
+    def break_master(self, master):
+        """Makes the refreshes of a master fail"""
+        del self.paas.masters[master.uuid]
+
+
+class JobTest(JobTestCase):
+    def test_refresh_is_tracked_until_applied(self):
+        job = self.masters[0].refresh()
+        self.assertTrue(job)
+        self.assertTrue(job.wait(5))
+        self.assertIsNone(job.error)
+        self.assertGreaterEqual(job.duration, 0.04)
+
+    def test_restart(self):
+        job = self.masters[0].restart()
+        self.assertEqual(job.action, RESTART)
+        self.assertTrue(job.wait(5))
+
+    def test_refresh_leaving_the_last_update(self):
+        paas = UpToDatePaaS(masters=1, certs=0, action_duration=0.05)
+        client = mock_client(paas)
+        tracker = get_job_tracker(client)
+        tracker.min_interval = tracker.max_interval = 0.01
+        master = Master.get_masters(client)[0]
+        job = master.refresh()
+        self.assertTrue(job.wait(5))
+        self.assertIsNone(job.error)
+        self.assertEqual(job.result(), paas.last_updates[master.uuid])
+        self.assertGreaterEqual(job.duration, 0.04)
+
+    def test_refused_refresh(self):
+        self.break_master(self.masters[0])
+        job = self.masters[0].refresh()
+        self.assertFalse(job)
+        self.assertIsInstance(job.error, ResourceNotFoundError)
+
+    def test_wait_jobs(self):
+        jobs = [master.refresh() for master in self.masters[:4]]
+        done, pending = wait_jobs(jobs, 5)
+        self.assertEqual(len(done), 4)
+        self.assertFalse(pending)
+
+
+class FleetJobsTest(JobTestCase):
+    def test_refresh_and_wait(self):
+        report = Fleet(self.masters[:3], self.client).refresh(wait=True, timeout=5)
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertFalse(report.failed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+
+from tests import MockPaaS, MockTransport, make_client, mock_client
+
+from ppaas.master import Master, get_master_index
+
+
+class MasterTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=3, certs=0)
+        self.client = mock_client(self.paas)
+        self.uuid = sorted(self.paas.masters)[1]
+
+    def test_to_dict_is_the_data_of_the_master(self):
+        master = Master(self.uuid, client=self.client)
+        self.paas.reset_calls()
+        self.assertEqual(master.to_dict(), self.paas.masters[self.uuid])
+        self.assertEqual(self.paas.reset_calls(), [])
+        self.paas.masters[self.uuid][u"nb"] = 2
+        self.assertEqual(master.to_dict(reload=True)[u"nb"], 2)
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/masters/%s' % self.uuid)])
+
+    def test_get_master_by_name(self):
+        master = Master.get_master(u"master1", self.client)
+        self.assertEqual(master.uuid, self.uuid)
+        self.assertEqual(Master.get_master(u"master2", self.client).name, u"master2")
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/masters')])
+
+    def test_unknown_name(self):
+        self.assertIsNone(Master.get_master(u"unknown", self.client))
+
+    def test_listing_refreshes_the_index(self):
+        Master.get_masters(self.client)
+        self.paas.reset_calls()
+        self.assertEqual(Master.get_master(u"master0", self.client).name, u"master0")
+        self.assertEqual(self.paas.reset_calls(), [])
+
+    def test_invalidated_index_lists_the_masters_again(self):
+        Master.get_masters(self.client)
+        get_master_index(self.client).invalidate()
+        self.paas.reset_calls()
+        Master.get_master(u"master0", self.client)
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/masters')])
+
+    def test_index_per_account(self):
+        index = get_master_index(self.client)
+        self.assertIs(get_master_index(make_client(MockTransport(self.paas), self.client.endpoint)), index)
+        self.assertIsNot(get_master_index(mock_client(self.paas)), index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+
+from requests.exceptions import ConnectionError
+
+from tests import MockPaaS, MockTransport, mock_client
+
+from ppaas.client import NetworkError, ResourceNotFoundError
+from ppaas.metrics import Histogram, MetricsRecorder, template_path
+from ppaas.scheduler import RetryPolicy, Scheduler
+
+
+class _BrokenTransport(MockTransport):
+    def request(self, *args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+
+class TemplatePathTest(unittest.TestCase):
+    def test_template_path(self):
+        self.assertEqual(template_path('/masters/0e85b81f/certs/web1.maurice.fr/sign'),
+                         '/masters/{id}/certs/{host}/sign')
+        self.assertEqual(template_path('https://api.puppet.com/masters/0e85b81f/crl?x=1'),
+                         '/masters/{id}/crl')
+        self.assertEqual(template_path('/deploy-keys/key'), '/deploy-keys/{name}')
+        self.assertEqual(template_path('/masters'), '/masters')
+
+
+class HistogramTest(unittest.TestCase):
+    def test_quantiles(self):
+        histogram = Histogram((0.1, 0.2, 0.4))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.05, 0.05, 0.15, 0.3):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.1)
+        self.assertAlmostEqual(histogram.quantile(1), 0.4)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (0.2, 3), (0.4, 4), (float('inf'), 4)])
+
+    def test_overflow(self):
+        histogram = Histogram((0.1,))
+        histogram.observe(5)
+        self.assertEqual(histogram.quantile(0.99), 0.1)
+
+
+class HooksTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=2, certs=2)
+        self.client = mock_client(self.paas)
+
+    def test_before_and_after(self):
+        before, after = [], []
+        self.client.add_hook(before=before.append, after=after.append)
+        self.client.get('/masters')
+        self.assertEqual(len(before), 1)
+        self.assertIs(before[0], after[0])
+        info = after[0]
+        self.assertEqual((info.method, info.path, info.status), ('GET', '/masters', 200))
+        self.assertGreater(info.bytes_received, 0)
+        self.assertIsNotNone(info.duration)
+
+        self.client.remove_hook(before=before.append, after=after.append)
+        self.client.get('/masters', cache=False)
+        self.assertEqual(len(after), 1)
+
+    def test_retries_are_recorded(self):
+        paas = MockPaaS(masters=1, certs=0)
+        client = mock_client(paas, scheduler=Scheduler(retry=RetryPolicy(max_retries=1, backoff_factor=0.001)))
+        client.transport = _BrokenTransport(paas)
+        infos = []
+        client.add_hook(after=infos.append)
+        self.assertRaises(NetworkError, client.get, '/masters')
+        self.assertEqual(len(infos), 2)
+        self.assertIsNone(infos[0].status)
+        self.assertIsInstance(infos[0].error, ConnectionError)
+
+
+class MetricsRecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=2, certs=2)
+        self.client = mock_client(self.paas)
+        self.uuids = sorted(self.paas.masters)
+        self.metrics = MetricsRecorder()
+        self.metrics.install(self.client)
+
+    def test_per_endpoint(self):
+        for uuid in self.uuids:
+            self.client.get('/masters/%s/environments' % uuid)
+        self.assertRaises(ResourceNotFoundError, self.client.get, '/masters/%s/nothing' % self.uuids[0])
+        summary = self.metrics.summary()
+        self.assertEqual(summary[('GET', '/masters/{id}/environments')]['count'], 2)
+        self.assertEqual(summary[('GET', '/masters/{id}/nothing')]['count'], 1)
+        self.assertEqual(self.metrics.statuses[('GET', '/masters/{id}/nothing', '404')], 1)
+        self.assertIsNotNone(self.metrics.quantile(0.99, 'GET', '/masters/{id}/environments'))
+        self.assertIsNone(self.metrics.quantile(0.99, 'GET', '/masters'))
+
+    def test_uninstall(self):
+        self.metrics.uninstall(self.client)
+        self.client.get('/masters')
+        self.assertEqual(self.metrics.summary(), {})
+
+    def test_reset(self):
+        self.client.get('/masters')
+        self.metrics.reset()
+        self.assertEqual(self.metrics.summary(), {})
+
+    def test_prometheus(self):
+        self.client.get('/masters')
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE ppaas_requests_total counter', text)
+        self.assertIn('ppaas_requests_total{method="GET",path="/masters",status="200"} 1', text)
+        self.assertIn('ppaas_request_duration_seconds_bucket{le="+Inf",method="GET",path="/masters"} 1', text)
+        self.assertIn('ppaas_request_duration_seconds_count{method="GET",path="/masters"} 1', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_openmetrics(self):
+        self.client.get('/masters')
+        text = self.metrics.to_openmetrics()
+        self.assertIn('# TYPE ppaas_requests counter', text)
+        self.assertIn('ppaas_requests_total{method="GET",path="/masters",status="200"} 1', text)
+        self.assertTrue(text.endswith('# EOF\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.jobs import get_job_tracker
+from ppaas.reconcile import CREATE, CREATE_KEY, DRIFT, REFRESH, RESTART, Reconciler, load_desired_state
+
+
+class UTC(datetime.tzinfo):
+    def __init__(self, hours):
+        self.offset = datetime.timedelta(hours=hours)
+
+    def utcoffset(self, date):
+        return self.offset
+
+    def dst(self, date):
+        return datetime.timedelta(0)
+
+
+class ReconcilerTest(unittest.TestCase):
+    def setUp(self):
+        # Every master was last updated on 2015-12-07T13:28:28
+        self.paas = MockPaaS(masters=50, certs=0, action_duration=0.05)
+        self.client = mock_client(self.paas)
+        tracker = get_job_tracker(self.client)
+        tracker.min_interval = tracker.max_interval = 0.01
+        self.masters = [{'name': u'master%d' % i, 'source': u'git@github.com:mock/master%d.git' % i,
+                         'deploy_key': u'mock'} for i in range(50)]
+
+    def plan(self, masters=None, deploy_keys=()):
+        desired = {'masters': self.masters if masters is None else masters, 'deploy_keys': list(deploy_keys)}
+        return Reconciler(desired, self.client).plan()
+
+    def test_unchanged_masters_cost_one_request(self):
+        self.paas.reset_calls()
+        plan = self.plan(deploy_keys=[u'mock'])
+        self.assertTrue(plan.empty)
+        self.assertEqual(len(plan.unchanged), 50)
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/masters')])
+
+    def test_plan(self):
+        self.masters[1]['updated_after'] = u'2016-01-01T00:00:00'
+        self.masters[2].update(updated_after=u'2015-01-01', nb=3)
+        self.masters[3].update(updated_after=u'2016-01-01', update=RESTART)
+        self.masters.append({'name': u'web', 'source': u'git@github.com:mock/web.git', 'deploy_key': u'web'})
+        plan = self.plan(deploy_keys=[u'mock', u'ops'])
+        self.assertEqual(sorted((change.action, change.name) for change in plan), [
+            (CREATE, u'web'), (CREATE_KEY, u'ops'), (CREATE_KEY, u'web'), (DRIFT, u'master2'),
+            (REFRESH, u'master1'), (RESTART, u'master3')])
+        self.assertEqual(plan.of(DRIFT)[0].fields, {'nb': (1, 3)})
+        self.assertEqual(len(plan.unchanged), 47)
+
+    def test_timezones(self):
+        self.masters[0]['updated_after'] = datetime.datetime(2015, 12, 7, 15, 0, tzinfo=UTC(2))
+        self.masters[1]['updated_after'] = datetime.datetime(2015, 12, 7, 15, 0, tzinfo=UTC(1))
+        self.masters[2]['updated_after'] = u'2015-12-07T14:00:00Z'
+        self.masters[3]['updated_after'] = u'2015-12-07T14:00:00+01:00'
+        self.assertEqual(sorted(change.name for change in self.plan()), [u'master1', u'master2'])
+
+    def test_never_updated_master_is_outdated(self):
+        uuid = sorted(self.paas.masters)[0]
+        del self.paas.last_updates[uuid]
+        self.masters[0]['updated_after'] = u'2015-01-01'
+        self.assertEqual([(change.action, change.name) for change in self.plan()], [(REFRESH, u'master0')])
+
+    def test_deploying_master_is_not_refreshed_again(self):
+        uuid = sorted(self.paas.masters)[0]
+        self.paas.masters[uuid][u'status'] = {u'code': 0, u'msg': u'Deploying server'}
+        self.masters[0]['updated_after'] = u'2020-01-01'
+        self.assertTrue(self.plan().empty)
+
+    def test_apply(self):
+        self.masters[1]['updated_after'] = u'2016-01-01'
+        self.masters.append({'name': u'web', 'source': u'git@github.com:mock/web.git', 'deploy_key': u'web',
+                             'nb': 2})
+        reconciler = Reconciler({'masters': self.masters}, self.client)
+        report = reconciler.apply(wait=True, timeout=5)
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertIn(u'web', self.paas.deploy_keys)
+        created = [master for master in self.paas.masters.values() if master[u'name'] == u'web'][0]
+        self.assertEqual((created[u'deploy_key'], created[u'nb']), (u'web', 2))
+        self.assertTrue(Reconciler({'masters': self.masters}, self.client).plan().empty)
+
+    def test_master_of_a_failed_key_is_not_created(self):
+        keys = self.paas.deploy_keys_collection
+
+        def refuse_creations(method, headers, body):
+            if method == 'POST':
+                return 500, {}, {u'message': u'Down'}
+            return keys(method, headers, body)
+
+        self.paas.routes = [(regex, refuse_creations if handler == keys else handler)
+                            for regex, handler in self.paas.routes]
+        self.masters.append({'name': u'web', 'source': u'git@github.com:mock/web.git', 'deploy_key': u'web'})
+        report = Reconciler({'masters': self.masters}, self.client).apply()
+        self.assertEqual(sorted(change.action for change in report.failed), [CREATE, CREATE_KEY])
+        self.assertNotIn(u'web', [master[u'name'] for master in self.paas.masters.values()])
+
+    def test_invalid_desired_states(self):
+        for desired in ([], {'masters': [{'name': u'x'}]},
+                        {'masters': [dict(self.masters[0]), dict(self.masters[0])]},
+                        {'masters': [dict(self.masters[0], update='reboot')]},
+                        {'masters': [dict(self.masters[0], updated_after='yesterday')]}):
+            self.assertRaises(ValueError, Reconciler, desired, self.client)
+
+
+class LoadDesiredStateTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_json(self):
+        path = os.path.join(self.directory, 'masters.json')
+        with open(path, 'w') as stream:
+            json.dump({'masters': [{'name': 'a', 'source': 'git@x', 'deploy_key': 'k'}]}, stream)
+        self.assertEqual(load_desired_state(path)['deploy_keys'], [])
+
+    def test_yaml(self):
+        try:
+            import yaml
+        except ImportError:
+            raise unittest.SkipTest("PyYAML is not installed")
+        path = os.path.join(self.directory, 'masters.yml')
+        with open(path, 'w') as stream:
+            stream.write("masters:\n"
+                         "  - {name: a, source: git@x, deploy_key: k, updated_after: 2016-03-01T12:00:00+02:00}\n")
+        desired = load_desired_state(path)
+        self.assertEqual(desired['masters'][0]['name'], 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import datetime
+import unittest
+
+from tests import MockPaaS, certificate_data, mock_client
+
+from ppaas.master import Master
+from ppaas.records import (CertificateRecord, CertificateStatus, DeployKeyRecord, MasterRecord,
+                           format_timestamp, parse_timestamp)
+
+
+class TimestampTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_timestamp(u"2015-12-07T13:28:28"), datetime.datetime(2015, 12, 7, 13, 28, 28))
+        self.assertEqual(parse_timestamp(u"2015-12-07"), datetime.datetime(2015, 12, 7))
+        self.assertIsNone(parse_timestamp(None))
+        self.assertEqual(parse_timestamp(u"yesterday"), u"yesterday")
+
+    def test_round_trip(self):
+        self.assertEqual(format_timestamp(parse_timestamp(u"2015-12-07T13:28:28")), u"2015-12-07T13:28:28")
+        self.assertIsNone(format_timestamp(None))
+
+
+class CertificateStatusTest(unittest.TestCase):
+    def test_one_instance_per_status(self):
+        status = CertificateStatus.from_dict({u"code": 1, u"message": u"SIGNED"})
+        self.assertIs(status, CertificateStatus.SIGNED)
+        self.assertIs(CertificateStatus.from_dict(status), status)
+        self.assertIsNone(CertificateStatus.from_dict(None))
+
+    def test_unknown_status(self):
+        status = CertificateStatus.from_dict({u"code": 7, u"message": u"LOST"})
+        self.assertEqual((status.code, status.message), (7, u"LOST"))
+        self.assertEqual(status.to_dict(), {'code': 7, 'message': u"LOST"})
+
+    def test_comparisons(self):
+        status = CertificateStatus.SIGNATURE_PENDING
+        self.assertEqual(status, u"SIGNATURE PENDING")
+        self.assertEqual(status, 0)
+        self.assertEqual(status, {u"code": 0, u"message": u"SIGNATURE PENDING"})
+        self.assertNotEqual(status, CertificateStatus.SIGNED)
+        self.assertNotEqual(status, u"SIGNED")
+        self.assertEqual(status['message'], u"SIGNATURE PENDING")
+        self.assertEqual(status['code'], 0)
+        self.assertRaises(KeyError, lambda: status['msg'])
+
+    def test_not_hashable(self):
+        # Equal to both 0 and "SIGNATURE PENDING", which hash differently
+        self.assertRaises(TypeError, hash, CertificateStatus.SIGNATURE_PENDING)
+
+
+class RecordTest(unittest.TestCase):
+    def test_certificate(self):
+        data = certificate_data(u"master0", 3, status=2)
+        record = CertificateRecord.from_dict(data)
+        self.assertEqual(record.hostname, u"agent3.master0.mock")
+        self.assertIs(record.status, CertificateStatus.REVOKED)
+        self.assertEqual(record.revoked_at, datetime.datetime(2015, 12, 8, 9, 0))
+        self.assertEqual(record.to_dict(), data)
+        self.assertEqual(repr(record), "<Certificate Record agent3.master0.mock>")
+
+    def test_unknown_fields_stay_readable(self):
+        record = DeployKeyRecord.from_dict({u"name": u"github", u"comment": u"ci"})
+        self.assertEqual(record.comment, u"ci")
+        self.assertEqual(record.to_dict()[u"comment"], u"ci")
+        self.assertRaises(AttributeError, getattr, record, 'unknown')
+
+    def test_no_instance_dictionary(self):
+        record = MasterRecord.from_dict({u"id": u"x", u"name": u"master"})
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertRaises(AttributeError, setattr, record, 'unknown', 1)
+
+    def test_missing_fields(self):
+        record = DeployKeyRecord.from_dict({u"name": u"github", u"fingerprint": None})
+        self.assertIsNone(record.public)
+        self.assertIsNone(record.created_at)
+        self.assertEqual(record.to_dict(), {u"name": u"github", u"fingerprint": None})
+        # A field gone from a newer representation is dropped as well
+        record.load({u"name": u"github"})
+        self.assertIsNone(record.fingerprint)
+        self.assertEqual(record.to_dict(), {u"name": u"github"})
+        # Assigned fields are serialized
+        record.public = u"ssh-rsa AAAA"
+        self.assertEqual(record.to_dict(), {u"name": u"github", u"public": u"ssh-rsa AAAA"})
+
+    def test_cached_data(self):
+        record = DeployKeyRecord.from_dict({u"name": u"github", u"fingerprint": u"aa"})
+        # A copy, changing it does not change the record
+        record.cached_data[u"fingerprint"] = u"bb"
+        self.assertEqual(record.fingerprint, u"aa")
+        record.cached_data = {u"name": u"github", u"fingerprint": u"bb"}
+        self.assertEqual(record.fingerprint, u"bb")
+        self.assertEqual(record.cached_data, {u"name": u"github", u"fingerprint": u"bb"})
+
+    def test_api_objects_are_records(self):
+        paas = MockPaaS(masters=1, certs=2)
+        master = Master.get_masters(mock_client(paas))[0]
+        self.assertEqual(master.name, u"master0")
+        self.assertEqual(master.to_dict(), paas.masters[master.uuid])
+        certificate = master.get_certificates()[0]
+        self.assertIsInstance(certificate, CertificateRecord)
+        self.assertEqual(certificate.to_dict(), paas.certs[master.uuid][certificate.hostname])
+        self.assertEqual(certificate.cached_data, certificate.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.deploy_key import DeployKey
+from ppaas.registry import DeployKeyRegistry, normalize_public_key
+
+
+class DeployKeyRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=1, certs=0)
+        self.client = mock_client(self.paas)
+        self.registry = DeployKeyRegistry(self.client)
+
+    def test_normalize_public_key(self):
+        self.assertEqual(normalize_public_key(u'ssh-rsa  AAAA comment'), u'ssh-rsa AAAA')
+        self.assertEqual(normalize_public_key(None), u'')
+
+    def test_lookups_cost_one_listing(self):
+        self.paas.reset_calls()
+        self.assertEqual(self.registry.get(u'mock').name, u'mock')
+        self.assertEqual(self.registry.by_fingerprint(u'mock-fingerprint').name, u'mock')
+        self.assertEqual(self.registry.by_public_key(u'ssh-rsa  AAAA mock other-comment').name, u'mock')
+        self.assertIsNone(self.registry.get(u'nope'))
+        self.assertIn(u'mock', self.registry)
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/deploy-keys')])
+
+    def test_ttl(self):
+        registry = DeployKeyRegistry(self.client, ttl=0)
+        self.paas.reset_calls()
+        registry.get(u'mock')
+        registry.get(u'mock')
+        self.assertEqual(len(self.paas.reset_calls()), 2)
+
+    def test_invalidate(self):
+        self.registry.get(u'mock')
+        self.paas.reset_calls()
+        self.registry.invalidate()
+        self.registry.get(u'mock')
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/deploy-keys')])
+
+    def test_keys_are_shared(self):
+        self.assertIs(self.registry.get(u'mock'), DeployKey.resolve(u'mock', self.client))
+
+    def test_create(self):
+        report = self.registry.create([u'a', u'b', u'a', u'mock'])
+        self.assertEqual(sorted(report.succeeded), [u'a', u'b', u'mock'])
+        self.assertEqual(sorted(self.paas.deploy_keys), [u'a', u'b', u'mock'])
+        # Indexed in place, without listing the keys again
+        self.paas.reset_calls()
+        self.assertEqual(self.registry.by_fingerprint(u'a-fingerprint').name, u'a')
+        self.assertEqual(self.paas.reset_calls(), [])
+
+    def test_sync(self):
+        report = self.registry.sync([u'a', u'b', u'mock'], prune=False)
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertEqual(sorted(self.paas.deploy_keys), [u'a', u'b', u'mock'])
+        report = self.registry.sync([u'a'], prune=True)
+        self.assertFalse(report.failed)
+        self.assertEqual(sorted(self.paas.deploy_keys), [u'a'])
+        self.assertEqual(sorted(key.name for key in self.registry), [u'a'])
+        self.assertIsNone(self.registry.by_fingerprint(u'mock-fingerprint'))
+
+    def test_delete_unknown_key(self):
+        report = self.registry.delete([u'nope'])
+        self.assertEqual(list(report.failed), [u'nope'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.client import JobTimeout
+from ppaas.jobs import get_job_tracker
+from ppaas.master import Master
+from ppaas.rollout import Rollout
+
+
+class RolloutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=10, certs=0, action_duration=0.05)
+        self.client = mock_client(self.paas)
+        tracker = get_job_tracker(self.client)
+        tracker.min_interval = tracker.max_interval = 0.01
+        self.masters = sorted(Master.get_masters(self.client), key=lambda master: master.name)
+
+    def break_master(self, master):
+        """Makes the refreshes of a master fail"""
+        del self.paas.masters[master.uuid]
+
+
+class RolloutTest(RolloutTestCase):
+    def test_every_master_is_refreshed(self):
+        report = Rollout(self.masters, concurrency=3, wave_size=4).run()
+        self.assertEqual(len(report.succeeded), 10)
+        self.assertEqual(report.waves, 3)
+        self.assertFalse(report.aborted)
+        self.assertEqual(len(report.durations), 10)
+
+    def test_max_failures_aborts(self):
+        self.break_master(self.masters[0])
+        self.break_master(self.masters[1])
+        report = Rollout(self.masters, concurrency=1, wave_size=2, max_failures=1).run()
+        self.assertTrue(report.aborted)
+        self.assertEqual(len(report.failed), 2)
+        self.assertEqual(report.skipped, self.masters[2:])
+
+    def test_fail_fast(self):
+        self.break_master(self.masters[0])
+        report = Rollout(self.masters, concurrency=1, max_failures=0).run()
+        self.assertTrue(report.aborted)
+        self.assertEqual(len(report.skipped), 9)
+
+    def test_failure_ratio_is_against_the_whole_rollout(self):
+        self.break_master(self.masters[0])
+        report = Rollout(self.masters, concurrency=1, wave_size=2, max_failure_ratio=0.5).run()
+        self.assertFalse(report.aborted)
+        self.assertEqual(len(report.failed), 1)
+        self.assertEqual(len(report.succeeded), 9)
+        self.assertEqual(report.skipped, [])
+
+    def test_failure_ratio_exceeded(self):
+        for master in self.masters[:3]:
+            self.break_master(master)
+        report = Rollout(self.masters, concurrency=1, max_failure_ratio=0.2).run()
+        self.assertTrue(report.aborted)
+        self.assertEqual(len(report.failed), 3)
+
+    def test_timeout(self):
+        self.paas.action_duration = 5
+        report = Rollout(self.masters[:2], timeout=0.1).run()
+        self.assertEqual(len(report.failed), 2)
+        self.assertTrue(all(isinstance(error, JobTimeout) for error in report.failed.values()))
+
+    def test_unknown_action(self):
+        self.assertRaises(ValueError, Rollout, self.masters, action='reboot')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import time
+import unittest
+
+from requests.exceptions import ConnectionError
+
+from tests import MockPaaS, MockTransport, make_client, mock_client
+
+from ppaas.client import APIError, NetworkError, scheduler_from_config
+from ppaas.scheduler import DEFAULT_TIMEOUT, RetryPolicy, Scheduler, TokenBucket, retry_after_delay
+
+
+class FlakyPaaS(MockPaaS):
+    """Answers the first `failures` requests with `status`"""
+    def __init__(self, failures, status=503, headers=None, **kwargs):
+        MockPaaS.__init__(self, **kwargs)
+        self.failures = failures
+        self.status = status
+        self.headers = headers or {}
+
+    def handle(self, method, path, query=None, headers=None, body=None):
+        with self.lock:
+            if self.failures > 0:
+                self.failures -= 1
+                self.calls.append((method, path))
+                return self.status, self.headers, {u"message": u"Flaky"}
+        return MockPaaS.handle(self, method, path, query, headers, body)
+
+
+class _BrokenTransport(MockTransport):
+    """Fails the first `failures` requests with a connection error"""
+    def __init__(self, paas, failures):
+        MockTransport.__init__(self, paas)
+        self.failures = failures
+
+    def request(self, *args, **kwargs):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Connection refused")
+        return MockTransport.request(self, *args, **kwargs)
+
+
+class RetryTest(unittest.TestCase):
+    def client(self, paas, max_retries=3, rate_limiter=None):
+        scheduler = Scheduler(retry=RetryPolicy(max_retries=max_retries, backoff_factor=0.001),
+                              rate_limiter=rate_limiter)
+        return mock_client(paas, scheduler=scheduler)
+
+    def test_get_is_retried_on_5xx(self):
+        paas = FlakyPaaS(2, masters=1, certs=0)
+        result, status = self.client(paas).get('/masters')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(paas.reset_calls()), 3)
+
+    def test_retries_are_bounded(self):
+        paas = FlakyPaaS(10, masters=1, certs=0)
+        self.assertRaises(APIError, self.client(paas, max_retries=2).get, '/masters')
+        self.assertEqual(len(paas.reset_calls()), 3)
+
+    def test_post_is_not_retried_on_5xx(self):
+        paas = FlakyPaaS(1, masters=1, certs=0)
+        path = '/masters/%s/refresh' % list(paas.masters)[0]
+        self.assertRaises(APIError, self.client(paas).post, path)
+        self.assertEqual(len(paas.reset_calls()), 1)
+
+    def test_post_is_retried_on_429(self):
+        paas = FlakyPaaS(1, status=429, headers={'Retry-After': '0'}, masters=1, certs=0)
+        path = '/masters/%s/refresh' % list(paas.masters)[0]
+        self.assertEqual(self.client(paas, rate_limiter=TokenBucket(100)).post(path), (None, 200))
+        self.assertEqual(len(paas.reset_calls()), 2)
+
+    def test_network_errors(self):
+        paas = MockPaaS(masters=1, certs=0)
+        client = self.client(paas, max_retries=2)
+        client.transport = _BrokenTransport(paas, 2)
+        self.assertEqual(client.get('/masters')[1], 200)
+        client.transport = _BrokenTransport(paas, 3)
+        self.assertRaises(NetworkError, client.get, '/masters')
+        client.transport = _BrokenTransport(paas, 1)
+        self.assertRaises(NetworkError, client.post, '/masters/%s/refresh' % list(paas.masters)[0])
+
+    def test_retry_after(self):
+        class Response(object):
+            def __init__(self, value):
+                self.headers = {'Retry-After': value} if value is not None else {}
+
+        self.assertEqual(retry_after_delay(Response('3')), 3)
+        self.assertEqual(retry_after_delay(Response('-1')), 0)
+        self.assertIsNone(retry_after_delay(Response(None)))
+        self.assertIsNone(retry_after_delay(Response('soon')))
+        self.assertEqual(retry_after_delay(Response('Thu, 01 Jan 1970 00:00:00 GMT')), 0)
+
+    def test_retry_after_is_capped(self):
+        class Response(object):
+            headers = {'Retry-After': '86400'}
+
+        policy = RetryPolicy(max_backoff=10)
+        self.assertEqual(policy.delay(0, Response()), 10)
+        Response.headers = {'Retry-After': '2'}
+        self.assertEqual(policy.delay(0, Response()), 2)
+
+    def test_timeout_per_endpoint(self):
+        scheduler = Scheduler(timeout=5, timeouts={'/masters/*/certs': 60})
+        self.assertEqual(scheduler.timeout_for('http://api/masters/x/certs'), 60)
+        self.assertEqual(scheduler.timeout_for('http://api/masters'), 5)
+
+
+class ConfigTest(unittest.TestCase):
+    def test_scheduler_from_config(self):
+        client = make_client(MockTransport(MockPaaS()))
+        client.conf.set('api', 'timeout', '30')
+        client.conf.set('api', 'max_retries', '5')
+        client.conf.set('api', 'rate_limit', '20')
+        client.conf.set('api', 'burst', '40')
+        scheduler = scheduler_from_config(client.conf)
+        self.assertEqual(scheduler.timeout, 30)
+        self.assertEqual(scheduler.retry.max_retries, 5)
+        self.assertEqual((scheduler.rate_limiter.rate, scheduler.rate_limiter.burst), (20, 40))
+
+    def test_defaults(self):
+        scheduler = make_client(MockTransport(MockPaaS())).scheduler
+        self.assertEqual(scheduler.timeout, DEFAULT_TIMEOUT)
+        self.assertEqual(scheduler.retry.max_retries, 3)
+        self.assertIsNone(scheduler.rate_limiter)
+
+    def test_no_rate_limit(self):
+        client = make_client(MockTransport(MockPaaS()))
+        client.conf.set('api', 'rate_limit', '0')
+        self.assertIsNone(scheduler_from_config(client.conf).rate_limiter)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=50, burst=2)
+        started = time.time()
+        for _ in range(5):
+            bucket.acquire()
+        # 2 tokens at once, then 3 at 50 per second
+        self.assertGreaterEqual(time.time() - started, 0.05)
+
+    def test_shared_between_threads(self):
+        bucket = TokenBucket(rate=100, burst=1)
+        started = time.time()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.time() - started, 0.04)
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=1000, burst=10)
+        bucket.pause(0.05)
+        started = time.time()
+        bucket.acquire()
+        self.assertGreaterEqual(time.time() - started, 0.04)
+
+    def test_rate_must_be_positive(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+        self.assertRaises(ValueError, TokenBucket, -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import re
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.client import APIError
+from ppaas.records import CertificateRecord, MasterRecord
+from ppaas.snapshot import SnapshotStore
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=2, certs=4)
+        self.client = mock_client(self.paas)
+        self.uuids = sorted(self.paas.masters)
+        self.store = SnapshotStore(':memory:')
+        self.report = self.store.refresh(self.client)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_refresh(self):
+        self.assertEqual(sorted(self.report.succeeded), self.uuids)
+        self.assertEqual([self.report[uuid].result for uuid in self.uuids], [4, 4])
+        self.assertEqual(len(self.store), 8)
+        self.assertEqual([master.name for master in self.store.masters()], [u'master0', u'master1'])
+        self.assertEqual([key.name for key in self.store.deploy_keys()], [u'mock'])
+        self.assertLess(self.store.age(), 60)
+        self.assertLess(self.store.age(self.uuids[0]), 60)
+
+    def test_unchanged_listings_cost_a_304(self):
+        self.paas.reset_calls()
+        report = self.store.refresh(self.client)
+        self.assertEqual([report[uuid].result for uuid in self.uuids], [0, 0])
+        self.assertEqual(len(self.paas.reset_calls()), 4)
+        self.assertEqual(len(self.store), 8)
+
+    def test_only_changes_are_written(self):
+        hostname = u'agent0.master0.mock'
+        self.paas.certificate_action('POST', {}, None, self.uuids[0], hostname, 'sign')
+        del self.paas.certs[self.uuids[1]][u'agent3.master1.mock']
+        self.paas._touch(self.uuids[1])
+        report = self.store.refresh(self.client)
+        self.assertEqual([report[uuid].result for uuid in self.uuids], [1, 1])
+        self.assertEqual(len(self.store), 7)
+        self.assertEqual(self.store.certificates(hostname=hostname)[0][1].status, 1)
+
+    def test_max_age(self):
+        self.paas.reset_calls()
+        report = self.store.refresh(self.client, max_age=300)
+        self.assertEqual(len(report), 0)
+        self.assertNotIn(('GET', '/masters/%s/certs' % self.uuids[0]), self.paas.reset_calls())
+
+    def test_deleted_masters_are_forgotten(self):
+        del self.paas.masters[self.uuids[1]]
+        self.store.refresh(self.client)
+        self.assertEqual([master.id for master in self.store.masters()], [self.uuids[0]])
+        self.assertEqual(len(self.store), 4)
+
+    def test_failed_listing(self):
+        del self.paas.certs[self.uuids[1]]
+        self.paas._touch(self.uuids[1])
+        report = self.store.refresh(self.client)
+        self.assertEqual(list(report.failed), [self.uuids[1]])
+        # The last known certificates are kept
+        self.assertEqual(len(self.store.certificates(master_uuid=self.uuids[1])), 4)
+
+    def test_failed_deploy_keys(self):
+        hostname = u'agent0.master0.mock'
+        self.paas.certificate_action('POST', {}, None, self.uuids[0], hostname, 'sign')
+        self.paas.routes.insert(0, (re.compile(r'^/deploy-keys/?$'),
+                                    lambda *args: (403, {}, {u"message": u"Forbidden"})))
+        self.paas.reset_calls()
+        self.assertRaises(APIError, self.store.refresh, self.client)
+        # Given up before listing any certificate
+        self.assertEqual(self.paas.reset_calls(), [('GET', '/deploy-keys')])
+        report = self.store.refresh(self.client, deploy_keys=False)
+        self.assertEqual([report[uuid].result for uuid in self.uuids], [1, 0])
+        self.assertEqual(self.store.certificates(hostname=hostname)[0][1].status, 1)
+        self.assertEqual([key.name for key in self.store.deploy_keys()], [u'mock'])
+
+    def test_queries(self):
+        located = self.store.locate(u'agent1.master1.mock')
+        self.assertEqual(len(located), 1)
+        master, cert = located[0]
+        self.assertIsInstance(master, MasterRecord)
+        self.assertIsInstance(cert, CertificateRecord)
+        self.assertEqual(master.id, self.uuids[1])
+        self.assertEqual(self.store.locate(u'unknown'), [])
+
+        self.assertEqual(len(self.store.certificates(master_uuid=self.uuids[0])), 4)
+        self.assertEqual(len(self.store.certificates(status=0)), 4)
+        self.assertEqual(len(self.store.certificates(status=u"SIGNED")), 4)
+        fingerprint = self.paas.certs[self.uuids[0]][u'agent2.master0.mock'][u'fingerprint']
+        self.assertEqual([cert.hostname for _, cert in self.store.certificates(fingerprint=fingerprint)],
+                         [u'agent2.master0.mock', u'agent2.master1.mock'])
+        self.assertEqual(self.store.masters(name=u'master1')[0].id, self.uuids[1])
+
+    def test_warm_start(self):
+        self.paas.reset_calls()
+        masters = self.store.get_masters(self.client)
+        self.assertEqual([master.uuid for master in masters], self.uuids)
+        self.assertIs(masters[0].client, self.client)
+        self.assertEqual(self.paas.reset_calls(), [])
+
+    def test_empty(self):
+        store = SnapshotStore(':memory:')
+        self.assertIsNone(store.age())
+        self.assertEqual(len(store), 0)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import json
+import unittest
+
+from tests import MockPaaS, mock_client
+
+from ppaas.client import InvalidResponse
+from ppaas.master import Master
+from ppaas.records import CertificateRecord
+from ppaas.streaming import iter_json_array
+
+DOCUMENT = u"""{"total": 3, "certs": [
+    {"hostname": "café.mock", "serial_number": -1234.5e-2, "status": {"code": 0, "message": "SIGNATURE PENDING"}},
+    {"hostname": "quote\\"back\\\\slash\\u00e9\\n", "serial_number": 123456789, "tags": ["a", "]", "}"]},
+    {"hostname": "last", "revoked_at": null, "ok": true}
+], "next": null}"""
+
+
+def split(data, *positions):
+    """Cuts bytes at the given positions"""
+    bounds = (0,) + positions + (len(data),)
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.data = DOCUMENT.encode('utf-8')
+        self.expected = json.loads(DOCUMENT)['certs']
+
+    def test_whole_document(self):
+        self.assertEqual(list(iter_json_array([self.data], 'certs')), self.expected)
+
+    def test_every_split(self):
+        # Inside strings, escapes, multibyte characters, numbers and keywords
+        for position in range(len(self.data) + 1):
+            self.assertEqual(list(iter_json_array(split(self.data, position), 'certs')), self.expected,
+                             "split at %d" % position)
+
+    def test_single_bytes(self):
+        chunks = [self.data[i:i + 1] for i in range(len(self.data))]
+        self.assertEqual(list(iter_json_array(chunks, 'certs')), self.expected)
+
+    def test_numbers_split_between_chunks(self):
+        for chunks in ([b'{"ids": [12', b'34, -5', b'.25e', b'1]}'], [b'{"ids": [1', b'2', b'34, -5.25e1', b']}']):
+            self.assertEqual(list(iter_json_array(chunks, 'ids')), [1234, -52.5])
+        self.assertRaises(InvalidResponse, list, iter_json_array([b'{"ids": [1', b'2'], 'ids'))
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b'{"certs": []}'], 'certs')), [])
+        self.assertEqual(list(iter_json_array(split(b'{"certs" :\n[ \n] }', 10), 'certs')), [])
+
+    def test_truncated(self):
+        for end in (self.data.index(b'tru'), self.data.index(b'"last"'), self.data.index(b'[') + 1):
+            self.assertRaises(InvalidResponse, list, iter_json_array([self.data[:end]], 'certs'))
+
+    def test_items_before_the_truncation_are_yielded(self):
+        items = iter_json_array(split(self.data, len(self.data) - 20)[:1], 'certs')
+        self.assertEqual(next(items), self.expected[0])
+        self.assertEqual(next(items), self.expected[1])
+        self.assertRaises(InvalidResponse, next, items)
+
+    def test_missing_key(self):
+        self.assertRaises(InvalidResponse, list, iter_json_array([b'{"masters": []}'], 'certs'))
+        self.assertRaises(InvalidResponse, list, iter_json_array([], 'certs'))
+
+
+class _PagedPaaS(MockPaaS):
+    """Serves the certificates two by two, with a Link header to the next page"""
+    def handle(self, method, path, query=None, headers=None, body=None):
+        self.page = int((query or {}).get('page', 1))
+        return MockPaaS.handle(self, method, path, query, headers, body)
+
+    def certs_collection(self, method, headers, body, uuid):
+        certs = sorted(self.certs[uuid].values(), key=lambda cert: cert[u"hostname"])
+        page = certs[(self.page - 1) * 2:self.page * 2]
+        headers = {}
+        if self.page * 2 < len(certs):
+            headers['Link'] = '<http://mock.ppaas.test/masters/%s/certs?page=%d>; rel="next"' % (uuid, self.page + 1)
+        return 200, headers, {u"certs": page}
+
+
+class IterCertificatesTest(unittest.TestCase):
+    def test_filters(self):
+        paas = MockPaaS(masters=1, certs=12, pending_ratio=0.5)
+        master = Master.get_masters(mock_client(paas))[0]
+        certificates = list(master.iter_certificates())
+        self.assertTrue(all(isinstance(cert, CertificateRecord) for cert in certificates))
+        self.assertEqual(sorted((cert.to_dict() for cert in certificates), key=lambda cert: cert['hostname']),
+                         sorted(master.certificates, key=lambda cert: cert['hostname']))
+        pending = list(master.iter_certificates(status="SIGNATURE PENDING"))
+        self.assertEqual(len(pending), 6)
+        self.assertEqual(sorted(cert.hostname for cert in master.iter_certificates(
+            status="SIGNATURE PENDING", hostname_prefix="agent1")), [u"agent1.master0.mock"])
+        self.assertEqual([cert.hostname for cert in master.iter_certificates(hostname_prefix="agent11")],
+                         [u"agent11.master0.mock"])
+
+    def test_pagination(self):
+        paas = _PagedPaaS(masters=1, certs=5)
+        master = Master.get_masters(mock_client(paas))[0]
+        paas.reset_calls()
+        self.assertEqual(len(list(master.iter_certificates())), 5)
+        self.assertEqual(len(paas.reset_calls()), 3)
+
+    def test_errors(self):
+        paas = MockPaaS(masters=1, certs=1)
+        master = Master.get_masters(mock_client(paas))[0]
+        del paas.masters[master.uuid], paas.certs[master.uuid]
+        self.assertRaises(Exception, list, master.iter_certificates())
+
+
+if __name__ == '__main__':
+    unittest.main()
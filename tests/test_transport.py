@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from ppaas.client import ApiClient
+from ppaas.transport import Transport, get_default_transport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        content = json.dumps({'path': self.path}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TransportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.connections = 0
+        self.server.lock = threading.Lock()
+        self.endpoint = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TransportTest(TransportTestCase):
+    def test_connections_are_kept_alive(self):
+        transport = Transport()
+        for i in range(10):
+            self.assertEqual(transport.request('GET', '%s/%d' % (self.endpoint, i)).json(), {'path': '/%d' % i})
+        transport.close()
+        self.assertEqual(self.server.connections, 1)
+
+    def test_threads_share_the_pool(self):
+        transport = Transport(pool_size=2, pool_block=True)
+        sessions = []
+
+        def work():
+            sessions.append(transport.session)
+            for i in range(10):
+                transport.request('GET', self.endpoint + '/').close()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        transport.close()
+        self.assertEqual(len(set(id(session) for session in sessions)), 8)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_default_transport_is_shared(self):
+        self.assertIs(get_default_transport(), get_default_transport())
+
+
+class ApiClientTest(TransportTestCase):
+    def setUp(self):
+        TransportTestCase.setUp(self)
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+        get_default_transport().close()
+        TransportTestCase.tearDown(self)
+
+    def write_config(self, extra=''):
+        with open('ppaas.conf', 'w') as conf:
+            conf.write("[auth]\nuser = user\npass = pass\n[api]\nendpoint = %s\n%s" % (self.endpoint, extra))
+
+    def test_default_transport(self):
+        self.write_config()
+        client = ApiClient()
+        self.assertIs(client.transport, get_default_transport())
+        self.assertEqual(client.get('/masters'), ({'path': '/masters'}, 200))
+
+    def test_pool_size(self):
+        self.write_config("pool_size = 3\n")
+        client = ApiClient()
+        self.assertEqual(client.transport.pool_size, 3)
+        self.assertIsNot(client.transport, get_default_transport())
+
+    def test_given_transport(self):
+        self.write_config("pool_size = 3\n")
+        transport = Transport()
+        client = ApiClient(transport=transport)
+        for _ in range(5):
+            client.get('/masters')
+        transport.close()
+        self.assertIs(client.transport, transport)
+        self.assertEqual(self.server.connections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
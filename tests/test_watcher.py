@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+         DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+                Version 2, December 2004
+ Copyright (C) 2015 Thomas Maurice <thomas@maurice.fr>
+ Everyone is permitted to copy and distribute verbatim or modified
+ copies of this license document, and changing it is allowed as long
+ as the name is changed.
+            DO WHAT THE FUCK YOU WANT TO PUBLIC LICENSE
+   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+  0. You just DO WHAT THE FUCK YOU WANT TO.
+"""
+
+import threading
+import unittest
+
+from tests import MockPaaS, certificate_data, mock_client
+
+from ppaas.master import Master
+from ppaas.records import CertificateRecord
+from ppaas.watcher import ADDED, CHANGED, REMOVED, CertificateWatcher
+
+
+class WatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.paas = MockPaaS(masters=2, certs=3, pending_ratio=1)
+        self.masters = sorted(Master.get_masters(mock_client(self.paas)), key=lambda master: master.name)
+        self.master = self.masters[0]
+        self.certs = self.paas.certs[self.master.uuid]
+
+    def events(self, watcher, master=None):
+        return sorted((event.kind, event.hostname) for event in watcher.poll(master or self.master))
+
+    def test_initial_events(self):
+        watcher = CertificateWatcher(self.masters)
+        events = watcher.poll(self.master)
+        self.assertEqual(sorted(event.hostname for event in events), sorted(self.certs))
+        self.assertTrue(all(event.kind == ADDED for event in events))
+        self.assertTrue(all(isinstance(event.certificate, CertificateRecord) for event in events))
+        self.assertEqual(watcher.poll(self.master), [])
+        self.assertEqual(CertificateWatcher(self.masters, initial_events=False).poll(self.master), [])
+
+    def test_changes(self):
+        watcher = CertificateWatcher(self.masters, initial_events=False)
+        watcher.poll(self.master)
+        self.paas.certificate_action('POST', {}, None, self.master.uuid, u"agent0.master0.mock", 'sign')
+        self.paas.certificate('DELETE', {}, None, self.master.uuid, u"agent1.master0.mock")
+        self.certs[u"agent9.master0.mock"] = certificate_data(u"master0", 9)
+        events = watcher.poll(self.master)
+        self.assertEqual(sorted((event.kind, event.hostname) for event in events), [
+            (ADDED, u"agent9.master0.mock"), (CHANGED, u"agent0.master0.mock"), (REMOVED, u"agent1.master0.mock")])
+        changed = [event for event in events if event.kind == CHANGED][0]
+        self.assertEqual(changed.previous_status, 0)
+        self.assertEqual(changed.certificate.status, u"SIGNED")
+        self.assertIsNone([event for event in events if event.kind == REMOVED][0].certificate)
+
+    def test_unchanged_listing_is_revalidated(self):
+        watcher = CertificateWatcher(self.masters)
+        watcher.poll(self.master)
+        self.paas.reset_calls()
+        watcher.poll(self.master)
+        watcher.poll(self.master)
+        self.assertEqual(len(self.paas.reset_calls()), 2)
+
+    def test_subscribers(self):
+        watcher = CertificateWatcher(self.masters)
+        received, errors = [], []
+
+        def broken(event):
+            raise ValueError(event.hostname)
+
+        watcher.on_error = lambda master, error: errors.append(error)
+        watcher.subscribe(broken)
+        watcher.subscribe(received.append)
+        watcher.poll(self.master)
+        self.assertEqual(len(received), 3)
+        self.assertEqual(len(errors), 3)
+        watcher.unsubscribe(broken)
+        watcher.unsubscribe(received.append)
+        watcher.poll(self.masters[1])
+        self.assertEqual(len(received), 3)
+
+    def test_adaptive_intervals(self):
+        watcher = CertificateWatcher(self.masters, min_interval=1, max_interval=3, backoff=2)
+        self.assertLessEqual(watcher.run_once(), 1)
+        self.paas.reset_calls()
+        watcher.poke()
+        self.assertGreater(watcher.run_once(), 1)
+        self.assertEqual(len(self.paas.reset_calls()), 2)
+        watcher.poke(self.master)
+        self.assertGreater(watcher.run_once(), 1)
+        self.assertEqual(len(self.paas.reset_calls()), 1)
+
+    def test_remove_master(self):
+        watcher = CertificateWatcher(self.masters, min_interval=0)
+        watcher.remove_master(self.masters[1])
+        self.paas.reset_calls()
+        watcher.run_once()
+        self.assertEqual(set(call[1] for call in self.paas.reset_calls()), set(['/masters/%s/certs' % self.master.uuid]))
+        self.assertEqual(repr(watcher), "<Certificate Watcher 1 masters>")
+
+    def test_background_thread(self):
+        watcher = CertificateWatcher([self.master], min_interval=0.01, max_interval=0.01, initial_events=False)
+        changed = threading.Event()
+        watcher.poll(self.master)
+        watcher.subscribe(lambda event: changed.set())
+        watcher.start()
+        try:
+            self.assertTrue(watcher.running)
+            self.paas.certificate_action('POST', {}, None, self.master.uuid, u"agent2.master0.mock", 'sign')
+            self.assertTrue(changed.wait(5))
+        finally:
+            watcher.stop(5)
+        self.assertFalse(watcher.running)
+
+
+if __name__ == '__main__':
+    unittest.main()